@@ -117,7 +117,7 @@ def main():
     original_data = load_original_data(ORIGINAL_PATH)
 
     data = original_data.loc[
-        :, ["qSpecies", "qAddress", "SiteOrder", "qSiteInfo"]
+        :, ["qSpecies", "qAddress", "SiteOrder", "qSiteInfo", "Latitude", "Longitude"]
     ].dropna(subset="qAddress")
 
     data[["SiteOrder"]] = data[["SiteOrder"]].fillna(1)
@@ -131,6 +131,8 @@ def main():
             "qAddress": "string",
             "SiteOrder": "int8",
             "qSiteInfo": "category",
+            "Latitude": "float64",
+            "Longitude": "float64",
         }
     )
     data = remove_non_species_categories(data, NON_SPECIES_CATEGORIES)
@@ -140,7 +142,8 @@ def main():
 
     data = remove_stair_addresses(data)
     data = clean_addresses(data)
-    data = data.dropna()
+    # trees without coordinates are kept for address lookups
+    data = data.dropna(subset=["qSpecies", "qAddress", "SiteOrder", "qSiteInfo"])
 
     data.to_csv(CLEANED_PATH)
     print(f"Cleaned Street Tree list saved at {os.path.abspath(CLEANED_PATH)}")
@@ -1,13 +1,31 @@
 import sqlite3
 import pandas as pd
 import os
+import sys
 import logging
 import time
-
-os.chdir(os.path.dirname(__file__))
-TREE_LIST_PATH = os.path.join("..", "Cleaned_Street_Tree_List.csv")
-MAPPED_SPECIES_PATH = os.path.join("..", "mapped_species.csv")
-DB_PATH = os.path.join("..", "SF_trees.db")
+from contextlib import contextmanager
+
+# paths are relative to this file, so the build functions can be imported from anywhere (i.e. by the tests)
+BUILD_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(BUILD_DIR, "..", "..", "src"))
+from SF_Tree_Identifier import answer_store, db_versions, existence_index, snapshot, species_dimension
+
+TREE_LIST_PATH = os.path.join(BUILD_DIR, "..", "Cleaned_Street_Tree_List.csv")
+MAPPED_SPECIES_PATH = os.path.join(BUILD_DIR, "..", "mapped_species.csv")
+DB_PATH = os.path.join(BUILD_DIR, "..", "SF_trees.db")
+# published versions of the db kept next to it, for processes still serving an older one
+KEEP_VERSIONS = 2
+
+# the db is rebuilt from scratch into a temporary file, so nothing needs to survive a crash during the build
+BUILD_PRAGMAS = {
+    "journal_mode": "OFF",
+    "synchronous": "OFF",
+    "locking_mode": "EXCLUSIVE",
+    "temp_store": "MEMORY",
+    "cache_size": -256_000,  # KiB, enough to build the indexes in memory
+}
+INSERT_BATCH_SIZE = 50_000
 
 
 def load_original_data(path: str) -> pd.DataFrame:
@@ -25,6 +43,29 @@ def species_difference(species_list_1: list, species_list_2: list) -> set:
     return address_species_set.difference(mapped_species_set)
 
 
+@contextmanager
+def connect_for_build(db_path: str):
+    """Opens a connection to the db with BUILD_PRAGMAS applied. Commits and closes it when the block exits."""
+    con = sqlite3.connect(db_path)
+    try:
+        for pragma, value in BUILD_PRAGMAS.items():
+            con.execute(f"PRAGMA {pragma}={value}")
+        yield con
+        con.commit()
+    finally:
+        con.close()
+
+
+@contextmanager
+def timed_phase(name: str, timings: dict):
+    """Records the time taken by the block in timings[name]."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = time.perf_counter() - start
+
+
 def get_db_tables(db_path: str) -> list[str]:
     """Returns a list of every table in the given db."""
     with sqlite3.connect(db_path) as con:
@@ -59,27 +100,57 @@ def get_db_indicies(db_path: str) -> list[str]:
     return result_list
 
 
+def dataframe_rows(df: pd.DataFrame) -> list[tuple]:
+    """Returns the rows of the df (index first) as tuples of python values with NaN/NA as None, ready for executemany."""
+    df = df.reset_index()
+    return list(df.astype(object).where(df.notna(), None).itertuples(index=False, name=None))
+
+
+def bulk_insert(con: sqlite3.Connection, table_name: str, columns: list[str], rows: list[tuple]) -> None:
+    """Inserts the rows into the table with executemany in one transaction, INSERT_BATCH_SIZE rows per call."""
+    column_names = ", ".join(f'"{column}"' for column in columns)
+    placeholders = ", ".join("?" * len(columns))
+    query = f'INSERT INTO "{table_name}" ({column_names}) VALUES ({placeholders})'
+
+    with con:
+        for start in range(0, len(rows), INSERT_BATCH_SIZE):
+            con.executemany(query, rows[start : start + INSERT_BATCH_SIZE])
+
+
 def make_table(
     df: pd.DataFrame, schema: str, table_name: str, db_path: str, overwrite: bool = False
 ) -> None:
-    """Generic function to create a new table in the given db. If overwrite is True, the function will overwrite the table if it already exists. Else, the function will not overwrite the table."""
-    if table_name in get_db_tables(db_path) and not overwrite:
-        logging.warning(
-            f"Table {table_name} already exists in {db_path} and overwrite is False; skipping table creation."
-        )
-        return None
+    """Generic function to create a new table in the given db. If overwrite is True, the function will overwrite the table if it already exists. Else, the function will not overwrite the table.
+    The df (index first) is bulk inserted in the order of its rows."""
+    if table_name in get_db_tables(db_path):
+        if not overwrite:
+            logging.warning(
+                f"Table {table_name} already exists in {db_path} and overwrite is False; skipping table creation."
+            )
+            return None
 
-    elif table_name in get_db_tables(db_path):
         logging.warning(
             f"Table {table_name} already exists in {db_path} but is being overwritten."
         )
 
-    with sqlite3.connect(db_path) as con:
-
-        cur = con.cursor()
-        result = cur.execute(schema)
-
-        df.to_sql(table_name, con, if_exists="append")
+    with connect_for_build(db_path) as con:
+        if overwrite:
+            con.execute(f'DROP TABLE IF EXISTS "{table_name}"')
+        con.execute(schema)
+        columns = [df.index.name or "index", *df.columns]
+        bulk_insert(con, table_name, columns, dataframe_rows(df))
+
+def add_species_display_columns(species_df: pd.DataFrame) -> pd.DataFrame:
+    """Returns the species df with the scientific and common name, the display name and the SelecTree url
+    of every species as columns (see species_dimension.display_fields), so lookups don't derive them."""
+    fields = [
+        species_dimension.display_fields(qSpecies, urlPath)
+        for qSpecies, urlPath in zip(species_df.qSpecies, species_df.urlPath)
+    ]
+    display_columns = pd.DataFrame(
+        fields, columns=list(species_dimension.DISPLAY_COLUMNS), index=species_df.index
+    )
+    return pd.concat([species_df[["qSpecies", "urlPath"]], display_columns], axis=1)
 
 def make_species_table(species_df: pd.DataFrame, db_path: str) -> None:
     """Creates the species table in the sqlite3 database and saves the species df to it.
@@ -91,17 +162,22 @@ def make_species_table(species_df: pd.DataFrame, db_path: str) -> None:
     CREATE TABLE "{table_name}" (
     "index" INTEGER PRIMARY KEY NOT NULL,
       "qSpecies" TEXT NOT NULL,
-      "urlPath" INTEGER(0) NOT NULL 
+      "urlPath" INTEGER(0) NOT NULL,
+      "scientific_name" TEXT NOT NULL,
+      "common_name" TEXT NOT NULL,
+      "display_name" TEXT NOT NULL,
+      "url" TEXT NOT NULL
     )
     """
 
-    make_table(species_df, schema, table_name, db_path)
+    make_table(add_species_display_columns(species_df), schema, table_name, db_path)
 
 def make_address_table(address_df: pd.DataFrame, db_path: str, sort: bool = True) -> None:
-    """Makes the address table containing all trees and their corresponding address and species_key"""
+    """Makes the address table containing all trees and their corresponding address and species_key.
+    If sort, the trees are inserted in TreeID (rowid) order so every insert appends to the table's b-tree."""
 
     if sort:
-        address_df = address_df.sort_values('qAddress')
+        address_df = address_df.sort_index()
 
     table_name = 'addresses'
     schema = f"""
@@ -109,23 +185,167 @@ def make_address_table(address_df: pd.DataFrame, db_path: str, sort: bool = True
     "TreeID" INTEGER PRIMARY KEY,
     "qAddress" TEXT,
     "qSpecies" INTEGER,
-    "SiteOrder" INTEGER
+    "SiteOrder" INTEGER,
+    "Latitude" REAL,
+    "Longitude" REAL,
+    "street_number" INTEGER,
+    "street_name" TEXT
 )
     """
 
     make_table(address_df, schema, table_name,db_path)
 
+def make_index(db_path: str, index_name: str, table_name: str, columns: list[str]) -> None:
+    """Makes an index named index_name of the columns (in order) of the table."""
+    column_names = ", ".join(f'"{column}"' for column in columns)
+    query = f"""
+    CREATE INDEX "{index_name}"
+    ON "{table_name}" ({column_names})
+    """
+
+    with connect_for_build(db_path) as con:
+        con.execute(query)
+
 def make_address_index(db_path: str) -> None:
     """Makes an index of the qAddress column of the address table."""
+    make_index(db_path, "qAddress_index", "addresses", ["qAddress"])
+
+def make_species_location_index(db_path: str) -> None:
+    """Makes the inverted species -> location index of the address table (sorted by street name and number)."""
+    make_index(
+        db_path, "species_location_index", "addresses", ["qSpecies", "street_name", "street_number"]
+    )
+
+def make_street_number_index(db_path: str) -> None:
+    """Makes an index of the address table sorted by street name and number for street number range scans."""
+    make_index(db_path, "street_number_index", "addresses", ["street_name", "street_number"])
+
+def make_species_street_counts_table(db_path: str) -> None:
+    """Makes the species_street_counts table with the number of trees of each species on each street."""
+    schema = """
+    CREATE TABLE "species_street_counts" (
+    "qSpecies" INTEGER NOT NULL,
+    "street_name" TEXT NOT NULL,
+    "count" INTEGER NOT NULL,
+    PRIMARY KEY ("qSpecies", "street_name")
+) WITHOUT ROWID
+    """
     query = """
-    CREATE INDEX "qAddress_index"
-    ON "addresses" ("qAddress")
+    INSERT INTO "species_street_counts"
+    SELECT qSpecies, street_name, COUNT(*)
+    FROM addresses
+    GROUP BY qSpecies, street_name
     """
 
-    with sqlite3.connect(db_path) as con:
+    index_query = """
+    CREATE INDEX "street_species_counts_index"
+    ON "species_street_counts" ("street_name", "count")
+    """
+
+    with connect_for_build(db_path) as con:
 
         cur = con.cursor()
-        result = cur.execute(query)
+        cur.execute(schema)
+        cur.execute(query)
+        cur.execute(index_query)
+
+def make_block_species_counts_table(db_path: str) -> None:
+    """Makes the block_species_counts table with the number of trees of each species on each block
+    (hundred of street numbers, i.e. 1468 valencia st is on the 1400 block of valencia st)."""
+    schema = """
+    CREATE TABLE "block_species_counts" (
+    "street_name" TEXT NOT NULL,
+    "block" INTEGER NOT NULL,
+    "qSpecies" INTEGER NOT NULL,
+    "count" INTEGER NOT NULL,
+    PRIMARY KEY ("street_name", "block", "qSpecies")
+) WITHOUT ROWID
+    """
+    query = """
+    INSERT INTO "block_species_counts"
+    SELECT street_name, street_number / 100 * 100 AS block, qSpecies, COUNT(*)
+    FROM addresses
+    GROUP BY street_name, block, qSpecies
+    """
+
+    with connect_for_build(db_path) as con:
+
+        cur = con.cursor()
+        cur.execute(schema)
+        cur.execute(query)
+
+def make_nearest_addresses_table(db_path: str) -> None:
+    """Makes the nearest_addresses table of interval records: for every street and side (odd or even street numbers),
+    each run of street numbers without trees from start_number to end_number (NULL past the last number with trees)
+    and the nearest numbers with trees below (lower_number) and above it (higher_number) on the same side, if any."""
+    schema = """
+    CREATE TABLE "nearest_addresses" (
+    "street_name" TEXT NOT NULL,
+    "side" INTEGER NOT NULL,
+    "start_number" INTEGER NOT NULL,
+    "end_number" INTEGER,
+    "lower_number" INTEGER,
+    "higher_number" INTEGER,
+    PRIMARY KEY ("street_name", "side", "start_number")
+) WITHOUT ROWID
+    """
+    query = """
+    INSERT INTO "nearest_addresses"
+    WITH numbers AS (
+        SELECT DISTINCT street_name, street_number % 2 AS side, street_number
+        FROM addresses
+        WHERE street_name IS NOT NULL AND street_number IS NOT NULL
+    ), gaps AS (
+        SELECT street_name, side,
+            LAG(street_number) OVER (
+                PARTITION BY street_name, side ORDER BY street_number
+            ) AS lower_number,
+            street_number AS higher_number
+        FROM numbers
+    )
+    SELECT street_name, side, COALESCE(lower_number + 1, 0), higher_number - 1, lower_number, higher_number
+    FROM gaps
+    WHERE COALESCE(lower_number + 1, 0) <= higher_number - 1
+    UNION ALL
+    SELECT street_name, side, MAX(street_number) + 1, NULL, MAX(street_number), NULL
+    FROM numbers
+    GROUP BY street_name, side
+    """
+
+    with connect_for_build(db_path) as con:
+
+        cur = con.cursor()
+        cur.execute(schema)
+        cur.execute(query)
+
+def optimize_db(db_path: str) -> None:
+    """Gathers the query planner statistics (ANALYZE) and rewrites the db without free pages (VACUUM)."""
+    with connect_for_build(db_path) as con:
+        con.execute("ANALYZE")
+    # VACUUM can't run in a transaction
+    con = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        con.execute("VACUUM")
+    finally:
+        con.close()
+
+def make_existence_index(db_path: str, bloom_filter_path: str) -> None:
+    """Builds the bloom filter of addresses with trees from the db and saves it next to the db."""
+    bloom_filter = existence_index.build_address_bloom_filter(db_path)
+    bloom_filter.save(bloom_filter_path)
+    print(
+        f"Existence index of {len(bloom_filter)} addresses saved at {os.path.abspath(bloom_filter_path)}"
+    )
+
+def make_answer_store(db_path: str, answer_store_path: str) -> None:
+    """Precomputes the get_trees answer of every address with trees in the db and saves them next to the db,
+    so exact address lookups skip the db (see answer_store)."""
+    count = answer_store.write_answer_store(
+        answer_store_path, answer_store.build_answers(db_path)
+    )
+    print(
+        f"Answer store of {count} addresses saved at {os.path.abspath(answer_store_path)}"
+    )
 
 def make_db(
     address_df: pd.DataFrame, species_df: pd.DataFrame, db_path: str, address_table_func
@@ -152,10 +372,10 @@ def main():
             f"{species_difference} is in the tree list but not in the mapped species"
         )
 
-    # select qAddress and qSpecies
-    addresses = addresses.loc[:, ["qAddress", "qSpecies"]].astype(
-        {"qAddress": "string"}
-    )
+    # select qAddress, qSpecies and the tree coordinates
+    addresses = addresses.loc[
+        :, ["qAddress", "qSpecies", "Latitude", "Longitude"]
+    ].astype({"qAddress": "string"})
 
     # create dict mapping qSpecies to species key and replace qSpecies with the key
     species_dict = (
@@ -168,15 +388,70 @@ def main():
 
     # clean up addresses
     addresses = addresses.astype({"qSpecies": "uint16"})
+    addresses[["street_number", "street_name"]] = addresses.qAddress.str.split(
+        " ", n=1, expand=True
+    )
+    addresses = addresses.astype({"street_number": "int64"})
 
-    addresses.to_csv('table_making.csv')
+    addresses.to_csv(os.path.join(BUILD_DIR, 'table_making.csv'))
 
-    make_species_table(species, DB_PATH)
-    make_address_table(addresses, DB_PATH)
-    # make_address_index(DB_PATH)
+    build_db(addresses, species, DB_PATH)
+
+
+def make_tables(
+    addresses: pd.DataFrame, species: pd.DataFrame, db_path: str, timings: dict | None = None
+) -> None:
+    """Makes every table and index of the db at db_path from the addresses (indexed by TreeID) and species dfs.
+    The tables are loaded before any index is made. Records the time taken by each phase in timings {phase: seconds}."""
+    timings = {} if timings is None else timings
+    with timed_phase("load", timings):
+        make_species_table(species, db_path)
+        make_address_table(addresses, db_path)
+    with timed_phase("indexes", timings):
+        make_address_index(db_path)
+        make_species_location_index(db_path)
+        make_street_number_index(db_path)
+    with timed_phase("aggregates", timings):
+        make_species_street_counts_table(db_path)
+        make_block_species_counts_table(db_path)
+        make_nearest_addresses_table(db_path)
+
+
+def build_db(
+    addresses: pd.DataFrame, species: pd.DataFrame, db_path: str, keep: int = KEEP_VERSIONS
+) -> dict:
+    """Builds the db from scratch into a temporary file and publishes it as a new version of the db at db_path
+    once complete (see db_versions.publish); running lookups switch to it without a restart.
+    The tables are loaded before any index is made. Prints and returns the time taken by each phase {phase: seconds}."""
+    version = db_versions.new_version()
+    db_location = db_versions.get_version_location(db_path, version)
+    build_path = f"{db_location}.build"
+    bloom_filter_path = existence_index.get_bloom_filter_location(db_location)
+    answer_store_path = answer_store.get_answer_store_location(db_location)
+
+    timings = {}
+    make_tables(addresses, species, build_path, timings)
+    with timed_phase("analyze_vacuum", timings):
+        optimize_db(build_path)
+    with timed_phase("existence_index", timings):
+        make_existence_index(build_path, bloom_filter_path)
+    with timed_phase("answer_store", timings):
+        make_answer_store(build_path, answer_store_path)
+    with timed_phase("fingerprint", timings):
+        # hashed once here, so starting processes validate the reference data snapshot without reading the db
+        snapshot.write_file_fingerprint(build_path, snapshot.get_fingerprint_location(db_location))
+    with timed_phase("publish", timings):
+        db_versions.publish(build_path, db_path, version, keep)
+    print(f"Published {os.path.abspath(db_location)}")
+
+    for phase, seconds in timings.items():
+        print(f"{phase}: {seconds: .2f}s")
+    print(f"Total: {sum(timings.values()): .2f}s")
+    return timings
 
 
 if __name__ == "__main__":
     main()
-    print(get_db_tables(DB_PATH))
-    print(get_db_indicies(DB_PATH))
+    current_db = db_versions.read_pointer(db_versions.get_pointer_location(DB_PATH))
+    print(get_db_tables(current_db))
+    print(get_db_indicies(current_db))
@@ -0,0 +1,167 @@
+import argparse
+import os
+import pstats
+import re
+import sys
+
+# adds python module to path
+path_to_append = os.path.join('.', 'src')
+sys.path.append(path_to_append)
+from SF_Tree_Identifier import profiler
+
+# directories after which the module path starts, last match wins
+module_roots = ['lib', 'Lib', 'site-packages', 'src']
+version_dir = re.compile(r'python\d+(\.\d+)?$')
+# modules renamed between versions, old name -> current name (extend with --alias old=new)
+module_aliases = {
+    'SF_Tree_Identifier.SF_Tree_Identifier': 'SF_Tree_Identifier.identify_trees',
+}
+
+
+def normalize_module(filename):
+    """Returns the dotted module name for a profiled file name, independent of the machine and python
+    install it was profiled on, i.e. 'C:\\Users\\x\\venv\\lib\\site-packages\\pandas\\core\\frame.py' -> 'pandas.core.frame'."""
+    if filename == '~' or filename.startswith('<'):
+        return filename
+    parts = [part for part in re.split(r'[\\/]', filename) if part not in ('', '.')]
+    start = 0
+    for i, part in enumerate(parts[:-1]):
+        if part in module_roots or version_dir.match(part):
+            start = i + 1
+    parts = parts[start:]
+    parts[-1] = os.path.splitext(parts[-1])[0]
+    if parts[-1] == '__init__' and len(parts) > 1:
+        parts.pop()
+    module = '.'.join(parts)
+    return module_aliases.get(module, module)
+
+
+def normalize_function(func):
+    """Returns (module, function name) for a pstats (filename, line, function name) key. Line numbers
+    are dropped as they change between versions."""
+    filename, _, name = func
+    return normalize_module(filename), name
+
+
+def function_label(function):
+    module, name = function
+    return name if module == '~' else f'{module}:{name}'
+
+
+def load_profile(path):
+    """Returns ({(module, function): [calls, own time, cumulative time]}, total time, {stage: cumulative time}) for the .prof file.
+    Functions with the same normalized identity (i.e. two lambdas of a module) are summed."""
+    stats = pstats.Stats(path).stats
+    functions = {}
+    for func, (_, calls, own_time, cumulative_time, _) in stats.items():
+        totals = functions.setdefault(normalize_function(func), [0, 0.0, 0.0])
+        totals[0] += calls
+        totals[1] += own_time
+        totals[2] += cumulative_time
+    total_time = sum(own_time for _, own_time, _ in functions.values())
+    return functions, total_time, stage_times(stats)
+
+
+def function_stage(function):
+    module, name = function
+    return profiler.STAGES.get((module.rsplit('.', 1)[-1], name))
+
+
+def stage_times(stats):
+    """Returns {stage: cumulative time} of the lookup stages (see profiler.STAGES). Only the outermost
+    calls of a stage count, so stage functions calling each other aren't counted twice."""
+    stages = {}
+    for func, (_, _, _, cumulative_time, callers) in stats.items():
+        stage = function_stage(normalize_function(func))
+        if stage is None:
+            continue
+        if any(function_stage(normalize_function(caller)) == stage for caller in callers):
+            continue
+        stages[stage] = stages.get(stage, 0.0) + cumulative_time
+    return stages
+
+
+def change(before, after):
+    if not before:
+        return 'new' if after else ''
+    return f'{(after - before) / before:+.0%}'
+
+
+def is_regression(before, after, threshold, min_seconds):
+    """New functions and stages aren't flagged, they are mostly renames."""
+    return before > 0 and after - before > min_seconds and (after - before) / before > threshold
+
+
+def compare(before_path, after_path, top, threshold, min_seconds):
+    """Prints the total, per stage and per function differences between two profiles. Returns the regressions."""
+    before, before_total, before_stages = load_profile(before_path)
+    after, after_total, after_stages = load_profile(after_path)
+    regressions = []
+
+    print(f'== {os.path.basename(before_path)} -> {os.path.basename(after_path)}')
+    print(f'total: {before_total * 1000: .3f}ms -> {after_total * 1000: .3f}ms ({change(before_total, after_total)})')
+    if is_regression(before_total, after_total, threshold, min_seconds):
+        regressions.append('total')
+
+    print('stages (cumulative):')
+    for stage in sorted(set(before_stages) | set(after_stages)):
+        stage_before, stage_after = before_stages.get(stage, 0.0), after_stages.get(stage, 0.0)
+        flag = ''
+        if is_regression(stage_before, stage_after, threshold, min_seconds):
+            regressions.append(f'stage {stage}')
+            flag = '  REGRESSION'
+        print(f'  {stage:<22}{stage_before * 1000: 9.3f}ms -> {stage_after * 1000: 9.3f}ms ({change(stage_before, stage_after)}){flag}')
+
+    empty = [0, 0.0, 0.0]
+    deltas = sorted(
+        set(before) | set(after),
+        key=lambda function: abs(after.get(function, empty)[2] - before.get(function, empty)[2]),
+        reverse=True,
+    )
+    print('functions (largest cumulative time changes):')
+    print(f'  {"function":<60}{"calls":>15}{"own ms":>22}{"cumulative ms":>22}')
+    for function in deltas[:top]:
+        calls_before, own_before, cumulative_before = before.get(function, empty)
+        calls_after, own_after, cumulative_after = after.get(function, empty)
+        flag = ''
+        if is_regression(cumulative_before, cumulative_after, threshold, min_seconds):
+            regressions.append(function_label(function))
+            flag = '  REGRESSION'
+        print(
+            f'  {function_label(function)[:59]:<60}'
+            f'{f"{calls_before} -> {calls_after}":>15}'
+            f'{f"{own_before * 1000:.3f} -> {own_after * 1000:.3f}":>22}'
+            f'{f"{cumulative_before * 1000:.3f} -> {cumulative_after * 1000:.3f}":>22}'
+            f'  {change(cumulative_before, cumulative_after)}{flag}'
+        )
+    print()
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compares .prof files (i.e. from performance/profiles) per function and per lookup stage.')
+    parser.add_argument('profiles', nargs='+', help='two or more .prof files, oldest first')
+    parser.add_argument('--baseline', choices=['previous', 'first'], default='previous', help='compare each profile to the previous one or to the first')
+    parser.add_argument('--top', type=int, default=15, help='functions listed per comparison')
+    parser.add_argument('--threshold', type=float, default=0.2, help='relative cumulative time increase flagged as a regression')
+    parser.add_argument('--min-ms', type=float, default=0.1, help='smallest absolute increase flagged as a regression')
+    parser.add_argument('--alias', action='append', default=[], metavar='OLD=NEW', help='treat module OLD as the renamed module NEW')
+    args = parser.parse_args()
+    if len(args.profiles) < 2:
+        parser.error('at least two profiles are needed')
+    for alias in args.alias:
+        old, _, new = alias.partition('=')
+        module_aliases[old] = new
+
+    regressions = []
+    for i, after_path in enumerate(args.profiles[1:], start=1):
+        before_path = args.profiles[0] if args.baseline == 'first' else args.profiles[i - 1]
+        regressions += compare(before_path, after_path, args.top, args.threshold, args.min_ms / 1000)
+
+    if regressions:
+        print(f'{len(regressions)} regressions flagged')
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+import argparse
+import bisect
+import logging
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+# adds python module to path
+path_to_append = os.path.join('.', 'src')
+sys.path.append(path_to_append)
+from SF_Tree_Identifier import identify_trees, profiler
+
+logging.basicConfig(level=logging.ERROR)
+
+percentiles = [50, 90, 99, 99.9]
+city_suffixes = [', San Francisco', ', San Francisco, CA', ' San Francisco CA 94110', ', SF, California']
+street_types = {'st': 'Street', 'ave': 'Avenue', 'blvd': 'Boulevard', 'way': 'Way', 'dr': 'Drive'}
+
+
+class AddressSampler:
+    """Samples addresses from the addresses table with Zipf skew: the address of rank r (in a seeded
+    shuffle) is drawn with probability proportional to 1 / r ** skew. A share of the samples is
+    turned into misses (street numbers without trees), gets a typo in the street name, a city suffix
+    or a spelled out street type, like user input does."""
+
+    def __init__(self, addresses, skew=1.1, typo_rate=0.1, city_rate=0.2, miss_rate=0.2, seed=0):
+        self.random = random.Random(seed)
+        self.addresses = list(addresses)
+        self.random.shuffle(self.addresses)
+        self.known = set(self.addresses)
+        self.cum_weights = []
+        total = 0.0
+        for rank in range(1, len(self.addresses) + 1):
+            total += 1 / rank ** skew
+            self.cum_weights.append(total)
+        self.typo_rate = typo_rate
+        self.city_rate = city_rate
+        self.miss_rate = miss_rate
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_db(cls, db_path, **kwargs):
+        con = sqlite3.connect(db_path)
+        try:
+            addresses = [row[0] for row in con.execute('SELECT DISTINCT qAddress FROM addresses ORDER BY qAddress')]
+        finally:
+            con.close()
+        return cls(addresses, **kwargs)
+
+    def _typo(self, street_name):
+        i = self.random.randrange(len(street_name))
+        kind = self.random.choice(['delete', 'replace', 'swap'])
+        if kind == 'delete':
+            return street_name[:i] + street_name[i + 1:]
+        if kind == 'replace':
+            return street_name[:i] + self.random.choice('abcdefghijklmnopqrstuvwxyz') + street_name[i + 1:]
+        i = min(i, len(street_name) - 2)
+        return street_name[:i] + street_name[i + 1] + street_name[i] + street_name[i + 2:]
+
+    def sample(self):
+        """Returns (user input, kind) where kind is 'hit', 'miss', 'typo' or 'miss+typo'."""
+        with self._lock:
+            r = self.random.random
+            address = self.addresses[bisect.bisect(self.cum_weights, r() * self.cum_weights[-1])]
+            street_number, street_name = address.split(' ', 1)
+            kinds = []
+
+            if r() < self.miss_rate:
+                for _ in range(10):
+                    street_number = str(int(street_number) + self.random.choice([-3, -1, 1, 3, 51]))
+                    if f'{street_number} {street_name}' not in self.known:
+                        break
+                kinds.append('miss')
+
+            *name_tokens, street_type = street_name.split()
+            if name_tokens and r() < 0.3:
+                street_type = street_types.get(street_type, street_type)
+            street_name = ' '.join([*name_tokens, street_type])
+            if r() < self.typo_rate and len(street_name) > 4:
+                street_name = self._typo(street_name)
+                kinds.append('typo')
+
+            user_input = f'{street_number} {street_name}'.title()
+            if r() < self.city_rate:
+                user_input += self.random.choice(city_suffixes)
+        return user_input, '+'.join(kinds) or 'hit'
+
+
+def lookup_in_process(user_input):
+    identify_trees.get_trees(user_input)
+
+
+def make_http_lookup(url):
+    """Returns a lookup function requesting url, where {address} is replaced by the quoted user input."""
+    def lookup_http(user_input):
+        with urllib.request.urlopen(url.format(address=urllib.parse.quote(user_input))) as response:
+            response.read()
+    return lookup_http
+
+
+class Recorder:
+    """Collects (completion time, latency, outcome, input kind) of every request."""
+
+    def __init__(self):
+        self.samples = []
+        self._lock = threading.Lock()
+
+    def record(self, lookup, user_input, kind, scheduled):
+        """Runs the lookup and records its latency from the scheduled start (so queueing delay is included)."""
+        try:
+            lookup(user_input)
+            outcome = 'ok'
+        except Exception as err:
+            outcome = type(err).__name__
+        end = time.perf_counter()
+        with self._lock:
+            self.samples.append((end, end - scheduled, outcome, kind))
+
+
+def run_closed_loop(lookup, sampler, concurrency, duration):
+    """Each of concurrency workers sends its next request as soon as the previous one returns."""
+    recorder = Recorder()
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        while time.perf_counter() < deadline:
+            user_input, kind = sampler.sample()
+            recorder.record(lookup, user_input, kind, time.perf_counter())
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return start, recorder.samples
+
+
+def run_open_loop(lookup, sampler, rate, duration, max_workers):
+    """Requests arrive at rate per second (poisson arrivals) whether or not earlier ones have finished."""
+    recorder = Recorder()
+    arrivals = random.Random(1)
+    start = time.perf_counter()
+    scheduled = start
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while scheduled < start + duration:
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            user_input, kind = sampler.sample()
+            executor.submit(recorder.record, lookup, user_input, kind, scheduled)
+            scheduled += arrivals.expovariate(rate)
+    return start, recorder.samples
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return float('nan')
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * p / 100))]
+
+
+def format_latencies(latencies):
+    latencies = sorted(latencies)
+    columns = [f'p{p}: {percentile(latencies, p) * 1000: 8.2f}ms' for p in percentiles]
+    columns.append(f'max: {latencies[-1] * 1000 if latencies else float("nan"): 8.2f}ms')
+    return '  '.join(columns)
+
+
+def report(start, samples, interval):
+    """Prints latency percentiles per interval of the run and overall, and the throughput."""
+    samples = sorted(samples)
+    windows = {}
+    for end, latency, _, _ in samples:
+        windows.setdefault(int((end - start) // interval), []).append(latency)
+    for window, latencies in sorted(windows.items()):
+        print(f'{window * interval: 6.1f}s  {len(latencies) / interval: 8.1f} req/s  {format_latencies(latencies)}')
+
+    elapsed = samples[-1][0] - start if samples else 0
+    print(f'total   {len(samples)} requests in {elapsed: .1f}s: {len(samples) / elapsed if elapsed else 0: .1f} req/s')
+    print(f'        {format_latencies([latency for _, latency, _, _ in samples])}')
+    for outcome, count in Counter(outcome for _, _, outcome, _ in samples).most_common():
+        print(f'        {outcome}: {count / len(samples): .1%}')
+
+    by_kind = {}
+    for _, latency, _, kind in samples:
+        by_kind.setdefault(kind, []).append(latency)
+    for kind, latencies in sorted(by_kind.items()):
+        print(f'{kind: >9}  {len(latencies): 8} req  {format_latencies(latencies)}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Drives tree lookups with production like traffic and reports latency percentiles over time.')
+    parser.add_argument('mode', choices=['closed', 'open'], help='closed: fixed number of concurrent clients (saturation throughput), open: fixed arrival rate')
+    parser.add_argument('--db', default=identify_trees.DB_LOCATION, help='tree database to sample addresses from and query')
+    parser.add_argument('--url', help='query a local server instead, i.e. http://localhost:8000/trees?address={address}')
+    parser.add_argument('--duration', type=float, default=30, help='seconds to run for')
+    parser.add_argument('--interval', type=float, default=5, help='seconds per reported window')
+    parser.add_argument('--concurrency', type=int, default=4, help='clients in closed loop mode')
+    parser.add_argument('--rate', type=float, default=100, help='requests per second in open loop mode')
+    parser.add_argument('--max-workers', type=int, default=32, help='threads serving requests in open loop mode')
+    parser.add_argument('--skew', type=float, default=1.1, help='zipf exponent of the address popularity')
+    parser.add_argument('--typo-rate', type=float, default=0.1)
+    parser.add_argument('--city-rate', type=float, default=0.2)
+    parser.add_argument('--miss-rate', type=float, default=0.2)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--profile', help='sample the run with the sampling profiler and write collapsed stacks to this path')
+    args = parser.parse_args()
+
+    identify_trees.DB_LOCATION = args.db
+    sampler = AddressSampler.from_db(
+        args.db, skew=args.skew, typo_rate=args.typo_rate, city_rate=args.city_rate, miss_rate=args.miss_rate, seed=args.seed
+    )
+    lookup = make_http_lookup(args.url) if args.url else lookup_in_process
+
+    sampling_profiler = profiler.profile(args.profile)
+    if args.profile:
+        sampling_profiler.start()
+    if args.mode == 'closed':
+        start, samples = run_closed_loop(lookup, sampler, args.concurrency, args.duration)
+    else:
+        start, samples = run_open_loop(lookup, sampler, args.rate, args.duration, args.max_workers)
+    sampling_profiler.stop()
+    report(start, samples, args.interval)
+    if args.profile:
+        print(f'lookup stages ({args.profile}):')
+        print(sampling_profiler.format_stage_summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import os
+import sys
+
+def rss_mb():
+    """Returns the resident set size of this process in MB."""
+    try:
+        with open('/proc/self/statm') as fp:
+            return int(fp.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except OSError:
+        # peak instead of current RSS where /proc isn't available (kB on linux, bytes on macOS)
+        import resource
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss / 2**20 if sys.platform == 'darwin' else maxrss / 2**10
+
+# measured before anything else is imported
+base_rss = rss_mb()
+
+import argparse
+import logging
+import random
+import sqlite3
+import tracemalloc
+from array import array
+from datetime import datetime
+
+# adds python module to path
+path_to_append = os.path.join('.', 'src')
+sys.path.append(path_to_append)
+from SF_Tree_Identifier import identify_trees, Address
+
+import_rss = rss_mb()
+
+import pandas as pd
+
+logging.basicConfig(level=logging.ERROR)
+
+test_addresses = ['1470 Valencia St', '1470 valenci street', '1468 Valencia St', '900 Brotherhood Way', '1204 19th St']
+# regressions fail the run: absolute limits in MB and the allowed growth over the last recorded run
+thresholds = {
+    'import_rss_mb': 150,
+    'steady_rss_mb': 250,
+    'peak_lookup_mb': 5,
+    'peak_batch_mb': 25,
+}
+max_growth = 1.10
+# growth below this is noise for the small metrics
+min_growth_mb = 1
+
+
+def deep_sizeof(obj, seen=None):
+    """Returns the size in bytes of obj and everything it references (containers, attributes and slots)."""
+    seen = set() if seen is None else seen
+    stack = [obj]
+    size = 0
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        size += sys.getsizeof(current)
+
+        if isinstance(current, (str, bytes, bytearray, array, int, float, memoryview)):
+            continue
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (list, tuple, set, frozenset)):
+            stack.extend(current)
+        if hasattr(current, '__dict__'):
+            stack.append(current.__dict__)
+        for cls in type(current).__mro__:
+            for slot in cls.__dict__.get('__slots__', ()):
+                if hasattr(current, slot):
+                    stack.append(getattr(current, slot))
+    return size
+
+
+def load_structures():
+    """Loads every reference structure derived from the db."""
+    identify_trees.get_existence_index()
+    identify_trees.complete_street_name('a')
+    identify_trees.get_db_cached('species_name_choices', identify_trees._load_species_name_choices)
+    try:
+        identify_trees.get_spatial_index()
+    except sqlite3.OperationalError:
+        logging.error('db built without coordinates, spatial index not measured')
+
+
+def structure_sizes():
+    """Returns {name: MB} of every reference structure loaded for the db."""
+    structures = {
+        'street_names': Address.get_street_names(),
+        'street_types': Address.get_street_type_abbreviations(),
+    }
+    for (name, db_location), value in identify_trees._db_caches.items():
+        if db_location == identify_trees.DB_LOCATION:
+            structures[name] = value
+    return {name: deep_sizeof(value) / 2**20 for name, value in structures.items()}
+
+
+def top_modules(before, after, limit=10):
+    """Returns [(module file, MB)] of the memory allocated between the snapshots and still held, grouped by module, largest first."""
+    statistics = after.compare_to(before, 'filename')
+    return [(os.path.relpath(stat.traceback[0].filename), stat.size_diff / 2**20) for stat in statistics[:limit]]
+
+
+def peak_mb(function):
+    """Returns the peak traced allocation in MB while calling function."""
+    tracemalloc.reset_peak()
+    start, _ = tracemalloc.get_traced_memory()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    return (peak - start) / 2**20
+
+
+def sample_addresses(limit, seed=0):
+    """Returns limit distinct addresses with trees drawn from the db, so the batch lookups aren't deduplicated away."""
+    addresses = [row[0] for row in identify_trees.query_db('SELECT DISTINCT qAddress FROM addresses WHERE qAddress IS NOT NULL')]
+    return random.Random(seed).sample(addresses, min(limit, len(addresses)))
+
+
+def lookup(address):
+    try:
+        identify_trees.main(address)
+    except (Address.AddressError, Address.NoCloseMatchError, identify_trees.NoTreeFoundError):
+        pass
+
+
+def check_regressions(results, filename):
+    """Returns the metrics over their threshold or grown more than max_growth since the last recorded run."""
+    regressions = []
+    for metric, limit in thresholds.items():
+        if results[metric] > limit:
+            regressions.append(f'{metric}: {results[metric]: .2f} MB > limit {limit} MB')
+
+    if os.path.exists(filename):
+        previous = pd.read_csv(filename).iloc[-1]
+        for metric in thresholds:
+            # runs recorded before the metric was added have no value for it
+            if metric not in previous or pd.isna(previous[metric]):
+                continue
+            growth = results[metric] - previous[metric]
+            if growth > min_growth_mb and results[metric] > previous[metric] * max_growth:
+                regressions.append(f'{metric}: {results[metric]: .2f} MB > {max_growth} x previous {previous[metric]: .2f} MB')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measures the memory footprint of tree lookups.')
+    parser.add_argument('--db', default=identify_trees.DB_LOCATION, help='tree database to query')
+    parser.add_argument('--lookups', type=int, default=500, help='lookups made before the steady state RSS is read')
+    args = parser.parse_args()
+    identify_trees.DB_LOCATION = args.db
+    file_dir = os.path.dirname(__file__)
+
+    results = {'datetime': datetime.now().isoformat(), 'import_rss_mb': import_rss - base_rss}
+
+    for address in test_addresses:
+        lookup(address)
+    load_structures()
+    for name, size in structure_sizes().items():
+        print(f'{name} - {size: .2f} MB')
+        results[f'{name}_mb'] = size
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    results['peak_lookup_mb'] = max(peak_mb(lambda: lookup(address)) for address in test_addresses)
+    batch_addresses = test_addresses + sample_addresses(len(test_addresses) * 19)
+    results['peak_batch_mb'] = peak_mb(lambda: identify_trees.get_trees_batch(batch_addresses))
+    for i in range(args.lookups):
+        lookup(test_addresses[i % len(test_addresses)])
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    results['steady_rss_mb'] = rss_mb()
+
+    print('allocations retained by module after the lookups:')
+    for module, size in top_modules(before, after):
+        print(f'  {module} - {size: .3f} MB')
+
+    for metric in thresholds:
+        print(f'{metric} - {results[metric]: .2f} MB')
+
+    filename = os.path.join(file_dir, 'memory_benchmarks.csv')
+    regressions = check_regressions(results, filename)
+
+    benchmarks = pd.DataFrame([results])
+    if os.path.exists(filename):
+        benchmarks = pd.concat([pd.read_csv(filename), benchmarks], ignore_index=True)
+    benchmarks.to_csv(filename, index=False)
+
+    if regressions:
+        print('memory regressions:')
+        for regression in regressions:
+            print(f'  {regression}')
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+
+# adds python module to path
+path_to_append = os.path.join('.', 'src')
+sys.path.append(path_to_append)
+from SF_Tree_Identifier import identify_trees
+
+# (name, immutable, pragmas) of the runtime configurations compared
+configurations = [
+    ('default (read-write)', None, {}),
+    ('mode=ro', False, {}),
+    ('mode=ro&immutable=1', True, {}),
+    ('immutable + mmap', True, {'mmap_size': identify_trees.DB_PRAGMAS['mmap_size']}),
+    ('immutable + cache', True, {'cache_size': identify_trees.DB_PRAGMAS['cache_size']}),
+    ('runtime (DB_PRAGMAS)', True, identify_trees.DB_PRAGMAS),
+]
+
+
+def connect(db_path, immutable, pragmas):
+    if immutable is None:
+        return sqlite3.connect(db_path)
+    identify_trees.DB_IMMUTABLE = immutable
+    identify_trees.DB_PRAGMAS = pragmas
+    return identify_trees.connect_db(db_path)
+
+
+def workloads(db_path, number):
+    """Returns {workload: (query, [parameters])} sampled from the db."""
+    con = sqlite3.connect(db_path)
+    rng = random.Random(0)
+    addresses = [row[0] for row in con.execute('SELECT DISTINCT qAddress FROM addresses')]
+    streets = [row[0] for row in con.execute('SELECT DISTINCT street_name FROM addresses')]
+    con.close()
+    return {
+        'address': (
+            'SELECT qSpecies FROM addresses WHERE qAddress = ?',
+            [(rng.choice(addresses),) for _ in range(number)],
+        ),
+        'range_scan': (
+            'SELECT TreeID, qAddress, qSpecies FROM addresses WHERE street_name = ? AND street_number BETWEEN 0 AND 10000',
+            [(rng.choice(streets),) for _ in range(number // 10)],
+        ),
+        'connect+query': (None, [(rng.choice(addresses),) for _ in range(number // 10)]),
+    }
+
+
+def run(db_path, immutable, pragmas, query, parameters):
+    """Returns the mean seconds per query. A None query opens a new connection for every address lookup."""
+    if query is None:
+        start = time.perf_counter()
+        for parameter in parameters:
+            con = connect(db_path, immutable, pragmas)
+            con.execute('SELECT qSpecies FROM addresses WHERE qAddress = ?', parameter).fetchall()
+            con.close()
+        return (time.perf_counter() - start) / len(parameters)
+
+    con = connect(db_path, immutable, pragmas)
+    # warm up the page cache and mmap
+    for parameter in parameters[:100]:
+        con.execute(query, parameter).fetchall()
+    start = time.perf_counter()
+    for parameter in parameters:
+        con.execute(query, parameter).fetchall()
+    elapsed = time.perf_counter() - start
+    con.close()
+    return elapsed / len(parameters)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compares the runtime SQLite open modes and pragmas.')
+    parser.add_argument('--db', default=identify_trees.DB_LOCATION, help='tree database to query')
+    parser.add_argument('--number', type=int, default=20_000, help='address lookups per configuration')
+    args = parser.parse_args()
+
+    for workload, (query, parameters) in workloads(args.db, args.number).items():
+        print(f'{workload}:')
+        for name, immutable, pragmas in configurations:
+            seconds = run(args.db, immutable, pragmas, query, parameters)
+            print(f'  {name:<24}{seconds * 1e6: 9.1f}us')
+
+
+if __name__ == "__main__":
+    main()
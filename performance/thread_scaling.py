@@ -0,0 +1,70 @@
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# adds python module to path
+path_to_append = os.path.join('.', 'src')
+sys.path.append(path_to_append)
+from SF_Tree_Identifier import identify_trees
+
+logging.basicConfig(level=logging.ERROR)
+
+test_addresses = ['1470 Valencia St', '1470 valenci street', '1468 Valencia St', '900 Brotherhood Way', '1204 19th St']
+thread_counts = [1, 2, 4, 8]
+
+
+def range_scan(street_name):
+    """I/O heavy workload: one range scan of every tree on the street."""
+    return len(list(identify_trees.get_trees_in_range(street_name, 0, 10_000)))
+
+
+def sample_addresses(limit, seed=0):
+    """Returns limit distinct addresses with trees drawn from the db, so the batch lookups aren't deduplicated away."""
+    addresses = [row[0] for row in identify_trees.query_db('SELECT DISTINCT qAddress FROM addresses WHERE qAddress IS NOT NULL')]
+    return random.Random(seed).sample(addresses, min(limit, len(addresses)))
+
+
+def street_names(limit):
+    query = 'SELECT street_name FROM species_street_counts GROUP BY street_name ORDER BY SUM(count) DESC LIMIT ?'
+    return [row[0] for row in identify_trees.query_db(query, parameters=(limit,))]
+
+
+def run(workload, inputs, threads):
+    """Returns the throughput (calls/s) of running workload over inputs on the given number of threads."""
+    start = time.perf_counter()
+    if workload == 'lookup':
+        identify_trees.get_trees_batch(inputs, max_workers=threads)
+    else:
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            list(executor.map(range_scan, inputs))
+    return len(inputs) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measures how lookups scale with the number of threads.')
+    parser.add_argument('--db', default=identify_trees.DB_LOCATION, help='tree database to query')
+    parser.add_argument('--repeat', type=int, default=40, help='workload size: repeat x 5 distinct addresses looked up, repeat x 2 streets scanned')
+    args = parser.parse_args()
+    identify_trees.DB_LOCATION = args.db
+
+    workloads = {
+        # get_trees_batch looks up every distinct address once, so the addresses are all different
+        'lookup': test_addresses + sample_addresses(len(test_addresses) * (args.repeat - 1)),
+        'range_scan': street_names(args.repeat * 2),
+    }
+    for workload, inputs in workloads.items():
+        # warm up the cached structures
+        run(workload, inputs[:len(test_addresses)], 1)
+        base = None
+        for threads in thread_counts:
+            throughput = run(workload, inputs, threads)
+            base = base or throughput
+            print(f'{workload} - threads: {threads} - {throughput: .1f} calls/s ({throughput / base: .2f}x)')
+
+
+if __name__ == "__main__":
+    main()
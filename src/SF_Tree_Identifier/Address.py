@@ -1,12 +1,67 @@
+import functools
 import logging
 import os
 import json
 import re
+import sqlite3
+import time
 from string import punctuation as PUNCTUATION
 
 from thefuzz import process as fuzz_process
 
+from SF_Tree_Identifier import metrics, snapshot
+from SF_Tree_Identifier.lru_memo import LRUMemo
+from SF_Tree_Identifier.street_match_cache import StreetMatchCache
+
 DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+STREET_NAMES_LOCATION = os.path.join(DATA_DIR, "street_names.json")
+STREET_TYPES_LOCATION = os.path.join(DATA_DIR, "street_types.json")
+# persistent cache of fuzzy street name matches, set SF_TREE_STREET_MATCH_CACHE to "" to disable it
+STREET_MATCH_CACHE_LOCATION = os.environ.get(
+    "SF_TREE_STREET_MATCH_CACHE", os.path.join(DATA_DIR, "street_match_cache.sqlite")
+)
+
+# raw user inputs whose normalized, street matched Address (or error) is kept in memory, 0 disables the memo
+ADDRESS_MEMO_SIZE = int(os.environ.get("SF_TREE_ADDRESS_MEMO_SIZE", 10_000))
+
+# patterns and tables used by normalize_address_string, compiled once at import
+CITY_PATTERN = re.compile(r"\bsan francisco\b")
+ZIP_CODE_PATTERN = re.compile(r"\d{5}(?:-\d{4})?")
+STATE_NAMES = frozenset(("ca", "california"))
+# keeps '-' for hyphenated street names and ',' so the city can be split off
+ADDRESS_PUNCTUATION_TABLE = str.maketrans(
+    "", "", PUNCTUATION.replace("-", "").replace(",", "")
+)
+
+_street_type_abbreviations = None
+_street_names = None
+# None until first use, False if the cache is disabled or can't be opened
+_street_match_cache = None
+# raw user input -> frozen Address or the AddressError/NoCloseMatchError raised for it (see get_Address_for_query)
+_address_memo = LRUMemo(ADDRESS_MEMO_SIZE)
+
+STREET_MATCHES = metrics.Counter(
+    "sf_tree_street_matches",
+    "Street name resolutions (match_closest_street_name) by how the street was found.",
+    ("method",),
+)
+STREET_MATCHES_EXACT = STREET_MATCHES.labels("exact")
+STREET_MATCHES_CACHE = STREET_MATCHES.labels("cache")
+STREET_MATCHES_FUZZY = STREET_MATCHES.labels("fuzzy")
+STREET_NO_MATCHES = metrics.Counter(
+    "sf_tree_street_no_matches",
+    "Street names without a match above the minimum score.",
+)
+FUZZY_MATCH_SECONDS = metrics.Histogram(
+    "sf_tree_fuzzy_match_seconds", "Latency of fuzzy street name matches."
+)
+ADDRESS_MEMO_LOOKUPS = metrics.Counter(
+    "sf_tree_address_memo_lookups",
+    "Raw user input lookups in the normalized Address memo by result.",
+    ("result",),
+)
+ADDRESS_MEMO_HITS = ADDRESS_MEMO_LOOKUPS.labels("hit")
+ADDRESS_MEMO_MISSES = ADDRESS_MEMO_LOOKUPS.labels("miss")
 
 ##TODO add broadway edge case
 
@@ -32,40 +87,150 @@ class NoCloseMatchError(Exception):
 
 
 class Address:
-    """Dataclass to represent address. str returns the street address as a string and
-    len the number of elements in the street address."""
-
-    street_number: str
-    street_name: str
-
-    def __init__(self, street_address: str, raise_invalid_error: bool = True):
-        street_address_list = street_address.split(" ")
-
-        self.street_number = street_address_list[0]
+    """Value type to represent an address. str returns the street address as a string and
+    len the number of elements in the street address.
+
+    The address is parsed once into its street number and street name tokens and the derived
+    strings are cached. Addresses compare and hash by their street address so they can key
+    caches. If frozen is True the address is immutable and replace() must be used to get a
+    modified copy; mutating an unfrozen address that is used as a cache key is an error."""
+
+    __slots__ = (
+        "_street_number",
+        "_street_name",
+        "_street_name_tokens",
+        "_street_address",
+        "_frozen",
+    )
 
-        self.street_name = " ".join(street_address_list[1:])
+    def __init__(
+        self,
+        street_address: str,
+        raise_invalid_error: bool = True,
+        frozen: bool = False,
+    ):
+        street_number, _, street_name = street_address.partition(" ")
+        self._set_parts(street_number, street_name, street_name.split(" "))
+        self._frozen = frozen
 
         if raise_invalid_error:
             self.is_valid_address(raise_error=True)
 
+    @classmethod
+    def _from_parts(
+        cls,
+        street_number: str,
+        street_name: str,
+        street_name_tokens: list[str],
+        frozen: bool,
+    ) -> "Address":
+        """Creates an Address from already parsed parts without splitting or validating."""
+        address = cls.__new__(cls)
+        address._set_parts(street_number, street_name, street_name_tokens)
+        address._frozen = frozen
+        return address
+
+    def _set_parts(
+        self, street_number: str, street_name: str, street_name_tokens: list[str]
+    ) -> None:
+        self._street_number = street_number
+        self._street_name = street_name
+        self._street_name_tokens = tuple(street_name_tokens)
+        self._street_address = f"{street_number} {street_name}"
+
+    def _check_mutable(self) -> None:
+        if self._frozen:
+            raise AttributeError(
+                f"Address {self._street_address} is frozen, use replace() instead"
+            )
+
     def __str__(self):
-        return self.street_address
+        return self._street_address
+
+    def __repr__(self):
+        return f"Address({self._street_address!r})"
 
     def __len__(self):
-        return len(self.get_address_as_list())
+        return len(self._street_name_tokens) + 1
+
+    def __eq__(self, other):
+        if isinstance(other, Address):
+            return self._street_address == other._street_address
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self._street_address)
+
+    def __getstate__(self):
+        return (
+            self._street_number,
+            self._street_name,
+            self._street_name_tokens,
+            self._frozen,
+        )
+
+    def __setstate__(self, state):
+        street_number, street_name, street_name_tokens, frozen = state
+        self._set_parts(street_number, street_name, street_name_tokens)
+        self._frozen = frozen
 
     def get_address_as_list(self):
-        """Converts the inputted address to a list if it is in string form. Returns the address as a list"""
-        address_list = self.street_address.split(" ")
-        return address_list
+        """Returns the address as a list of its elements."""
+        return [self._street_number, *self._street_name_tokens]
+
+    @property
+    def frozen(self) -> bool:
+        return self._frozen
+
+    @property
+    def street_number(self) -> str:
+        return self._street_number
+
+    @street_number.setter
+    def street_number(self, street_number) -> None:
+        self._check_mutable()
+        street_number = str(street_number)
+        self._street_number = street_number
+        self._street_address = f"{street_number} {self._street_name}"
+
+    @property
+    def street_name(self) -> str:
+        return self._street_name
+
+    @street_name.setter
+    def street_name(self, street_name: str) -> None:
+        self._check_mutable()
+        self._set_parts(self._street_number, street_name, street_name.split(" "))
+
+    @property
+    def street_name_tokens(self) -> tuple:
+        return self._street_name_tokens
 
     @property
     def street_type(self):
-        return self.street_name.split(" ")[-1]
+        return self._street_name_tokens[-1]
 
     @property
     def street_address(self):
-        return f"{self.street_number} {self.street_name}"
+        return self._street_address
+
+    def replace(
+        self, street_number=None, street_name: str = None, frozen: bool = None
+    ) -> "Address":
+        """Returns a new Address with the given parts replaced. Only a replaced street name is re-parsed
+        and the new Address is not re-validated. The frozen state is kept unless passed."""
+        if street_name is None:
+            street_name = self._street_name
+            street_name_tokens = self._street_name_tokens
+        else:
+            street_name_tokens = street_name.split(" ")
+
+        return Address._from_parts(
+            self._street_number if street_number is None else str(street_number),
+            street_name,
+            street_name_tokens,
+            self._frozen if frozen is None else frozen,
+        )
 
     def check_address_arg_length(self) -> bool:
         """Returns false if the input address doesn't have at least 3 components"""
@@ -124,9 +289,7 @@ class Address:
         return True
 
 
-def load_street_type_abbreviations(
-    path: str = os.path.join(DATA_DIR, "street_types.json")
-) -> dict:
+def load_street_type_abbreviations(path: str = STREET_TYPES_LOCATION) -> dict:
     """Loads the street type dictionary json file and returns it as a dict.
     Raises FileNotFoundError if the file is not found."""
     try:
@@ -139,6 +302,20 @@ def load_street_type_abbreviations(
         )
 
 
+def get_street_type_abbreviations() -> dict:
+    """Returns the street type abbreviation dict, loading it from the reference data snapshot
+    or from disk on first use. Raises FileNotFoundError if the file is not found."""
+    global _street_type_abbreviations
+    if _street_type_abbreviations is None:
+        try:
+            _street_type_abbreviations = snapshot.get_value(
+                "street_types", {"street_types": STREET_TYPES_LOCATION}
+            )
+        except KeyError:
+            _street_type_abbreviations = load_street_type_abbreviations()
+    return _street_type_abbreviations
+
+
 def remove_city(address_input: str) -> str:
     """Removes the city/state/zipcode from an inputted string address and returns only the street address. If there
     is no city/state/zipcode info, the original string is returned. *only works for San Francisco*"""
@@ -169,23 +346,22 @@ def abbreviate_street_type(address: Address) -> Address:
 
     # load the street_type_dictionaries
     try:
-        street_abbreviation_dict = load_street_type_abbreviations()
+        street_abbreviation_dict = get_street_type_abbreviations()
     except FileNotFoundError as err:
         logging.error(f"{err}: street not abbreviated.")
         return address
 
     street_type = address.street_type.lower()
 
-    if street_type in street_abbreviation_dict.keys():
+    if street_type in street_abbreviation_dict:
         # get the corressponding abbreviated street type and
-        # create a new street name string with the long type replaced
+        # create a new street name string with only the trailing long type replaced
         abbreviated_street_type = street_abbreviation_dict[street_type]
-        new_street_name = address.street_name.replace(
-            address.street_type, abbreviated_street_type
+        new_street_name = (
+            address.street_name[: -len(address.street_type)] + abbreviated_street_type
         )
         # create a new Address
-        abbreviated_address = Address(f"{address.street_number} {new_street_name}")
-        return abbreviated_address
+        return address.replace(street_name=new_street_name)
 
     # if the street type is not found in the dict, return the original address
     return address
@@ -194,12 +370,63 @@ def abbreviate_street_type(address: Address) -> Address:
 def remove_punctuation(punctuated_input: str, *exceptions: str) -> str:
     """Removes all PUNCTUATION from a string and returns the stripped string.
     Excepts exceptions from PUNCTUATION removal."""
-    allowed_punctuation = PUNCTUATION
+    return punctuated_input.translate(_punctuation_table(exceptions))
+
+
+@functools.lru_cache(maxsize=32)
+def _punctuation_table(exceptions: tuple) -> dict:
+    """Builds (once per set of exceptions) the str.translate table deleting PUNCTUATION minus exceptions."""
+    removed_punctuation = PUNCTUATION
     for exception in exceptions:
-        allowed_punctuation = allowed_punctuation.replace(exception, "")
+        removed_punctuation = removed_punctuation.replace(exception, "")
+    return str.maketrans("", "", removed_punctuation)
+
+
+def _is_street_address_tokens(tokens: list[str]) -> bool:
+    """Returns True if the tokens look like {number} {street_name} {street_suffix}."""
+    return len(tokens) >= 3 and tokens[0].isdigit()
+
+
+def _abbreviate_street_type_token(tokens: list[str]) -> None:
+    """Abbreviates the last token (the street type) of the lower case tokens in place."""
+    if not tokens:
+        return
 
-    allowed_punctuation_set = re.compile(f"[{re.escape(allowed_punctuation)}]")
-    return allowed_punctuation_set.sub("", punctuated_input)
+    try:
+        street_abbreviation_dict = get_street_type_abbreviations()
+    except FileNotFoundError as err:
+        logging.error(f"{err}: street not abbreviated.")
+        return
+
+    tokens[-1] = street_abbreviation_dict.get(tokens[-1], tokens[-1])
+
+
+def normalize_address_string(user_input: str) -> str:
+    """Normalizes a user string input to a standard street address string in a single pass.
+    Lower cases the input, removes punctuation (except '-'), strips the city/state/zipcode,
+    collapses whitespace and abbreviates the street type. *city stripping only works for San Francisco*"""
+
+    address_string = user_input.lower().translate(ADDRESS_PUNCTUATION_TABLE)
+
+    city = CITY_PATTERN.search(address_string)
+    if city:
+        address_string = address_string[: city.start()]
+
+    # a valid street address before the first comma is taken as the whole address,
+    # otherwise commas are treated as stray punctuation
+    head, comma, _ = address_string.partition(",")
+    tokens = head.split()
+    if comma and not _is_street_address_tokens(tokens):
+        tokens = address_string.replace(",", " ").split()
+
+    # trailing zipcode and state (i.e. '... st ca 94110')
+    if len(tokens) > 3 and ZIP_CODE_PATTERN.fullmatch(tokens[-1]):
+        tokens.pop()
+    if len(tokens) > 3 and tokens[-1] in STATE_NAMES:
+        tokens.pop()
+
+    _abbreviate_street_type_token(tokens)
+    return " ".join(tokens)
 
 
 def create_standard_Address(user_input: str) -> Address:
@@ -209,17 +436,18 @@ def create_standard_Address(user_input: str) -> Address:
         - Lower case
         - No random puncuation
         - Abbreviated street type
+        - Street number without leading zeros
     Returns the standard Address. Will raise corresponding errors if users input is invalid."""
 
-    address_string = user_input.lower().strip()
-    address_string = remove_city(address_string)
-    address_string = remove_punctuation(address_string, "-")
-    address = Address(address_string)
-    address = abbreviate_street_type(address)
+    address = Address(normalize_address_string(user_input))
+    # the db holds street numbers without leading zeros (i.e. 0167 -> 167), and batch lookups compare them as integers
+    street_number = str(int(address.street_number))
+    if street_number != address.street_number:
+        address.street_number = street_number
     return address
 
 
-def load_street_names(path: str = os.path.join(DATA_DIR, "street_names.json")) -> list:
+def load_street_names(path: str = STREET_NAMES_LOCATION) -> list:
     """Loads and returns list of street names in SF Tree Database."""
     try:
         with open(path, "r") as fp:
@@ -231,33 +459,137 @@ def load_street_names(path: str = os.path.join(DATA_DIR, "street_names.json")) -
         )
 
 
+def get_street_names() -> list:
+    """Returns the list of street names in SF Tree Database, loading it from the reference data snapshot
+    or from disk on first use. Raises FileNotFoundError if the file is not found."""
+    global _street_names
+    if _street_names is None:
+        try:
+            _street_names = snapshot.get_value(
+                "street_names", {"street_names": STREET_NAMES_LOCATION}
+            )
+        except KeyError:
+            _street_names = load_street_names()
+    return _street_names
+
+
+def get_street_match_cache() -> StreetMatchCache | None:
+    """Returns the persistent street match cache at STREET_MATCH_CACHE_LOCATION, opening it on first use.
+    Returns None if the cache is disabled or can't be opened."""
+    global _street_match_cache
+    if _street_match_cache is None:
+        _street_match_cache = False
+        if STREET_MATCH_CACHE_LOCATION:
+            try:
+                _street_match_cache = StreetMatchCache(
+                    STREET_MATCH_CACHE_LOCATION, STREET_NAMES_LOCATION
+                )
+            except (sqlite3.Error, OSError) as err:
+                logging.warning(f"{err}: street match cache not used.")
+
+    # an empty cache is falsy (len 0), so compare to the False sentinel
+    return None if _street_match_cache is False else _street_match_cache
+
+
 def match_closest_street_name(
-    address: Address, streets: list[str], min_score: int = 90
+    address: Address,
+    streets: list[str],
+    min_score: int = 90,
+    cache: StreetMatchCache | None = None,
 ) -> Address:
     """Match the Address objects street name to a queryable street name in streets (from SF_Trees.db).
     If perfect match, the original Address will be returned.
     If there is a match with a score greater than min_score,
     a new Address object with that matched street name will be returned.
-    If no close match is found, NoCloseMatchError is raised."""
+    If no close match is found, NoCloseMatchError is raised.
+    If a cache is given, it is consulted before fuzzy matching and filled with new matches;
+    it must only be used with the same streets."""
 
     street_name = address.street_name
 
     if street_name in streets:
+        STREET_MATCHES_EXACT.inc()
         return address
 
-    closest_match, score = fuzz_process.extractOne(
-        street_name, streets
-    )  # specify method
+    cached_match = cache.get(street_name) if cache is not None else None
+    if cached_match is not None:
+        closest_match, score = cached_match
+        STREET_MATCHES_CACHE.inc()
+    else:
+        start = time.perf_counter()
+        closest_match, score = fuzz_process.extractOne(
+            street_name, streets
+        )  # specify method
+        FUZZY_MATCH_SECONDS.observe(time.perf_counter() - start)
+        STREET_MATCHES_FUZZY.inc()
+        if cache is not None:
+            cache.put(street_name, closest_match, score)
+
     if score > min_score:
-        address.street_name = closest_match
-        return address
+        return address.replace(street_name=closest_match)
+    STREET_NO_MATCHES.inc()
     raise NoCloseMatchError(
         f"Street name match for {address.street_name} doesn't meet minimum score of {min_score}. "
         f"{closest_match=} {score=}"
     )
 
 
+def normalize_street_name_string(street_input: str) -> str:
+    """Normalizes a user input street name (no street number) the same way normalize_address_string
+    normalizes street addresses: lower case, no punctuation (except '-'), abbreviated street type."""
+    street_string = street_input.lower().translate(ADDRESS_PUNCTUATION_TABLE)
+    tokens = street_string.replace(",", " ").split()
+
+    _abbreviate_street_type_token(tokens)
+    return " ".join(tokens)
+
+
+def get_street_name_for_query(street_input: str) -> str:
+    """Takes a user input street name (no street number) and returns the matching queryable street name.
+    Raises NoCloseMatchError if no close match is found."""
+    street_name = normalize_street_name_string(street_input)
+    address = Address(f"0 {street_name}", raise_invalid_error=False)
+    street_names = get_street_names()
+    return match_closest_street_name(
+        address, street_names, cache=get_street_match_cache()
+    ).street_name
+
+
+def _match_Address_for_query(user_input: str) -> Address | AddressError | NoCloseMatchError:
+    try:
+        address = create_standard_Address(user_input)
+        street_names = get_street_names()
+        return match_closest_street_name(
+            address, street_names, cache=get_street_match_cache()
+        ).replace(frozen=True)
+    except (AddressError, NoCloseMatchError) as err:
+        return err
+
+
 def get_Address_for_query(user_input: str) -> Address:
-    address = create_standard_Address(user_input)
-    street_names = load_street_names()
-    return match_closest_street_name(address, street_names)
+    """Returns the normalized Address of the user input with its street matched to a queryable street name.
+    Raises AddressError or NoCloseMatchError as create_standard_Address and match_closest_street_name do.
+    The result for each raw input (including the error) is memoized in a bounded LRU memo, so repeated
+    inputs skip normalization and street matching. The returned Address is frozen as it is shared."""
+    result = _address_memo.get(user_input)
+    if result is None:
+        ADDRESS_MEMO_MISSES.inc()
+        result = _match_Address_for_query(user_input)
+        _address_memo.put(user_input, result)
+    else:
+        ADDRESS_MEMO_HITS.inc()
+
+    if isinstance(result, Exception):
+        # a new exception each time; raising the memoized one would grow its traceback
+        raise type(result)(*result.args)
+    return result
+
+
+def address_memo_stats() -> dict:
+    """Returns {hits, misses, evictions, size, max_size, hit_rate} of the memo used by get_Address_for_query."""
+    return _address_memo.stats()
+
+
+def clear_address_memo() -> None:
+    """Empties the memo used by get_Address_for_query, i.e. after the street names or types changed."""
+    _address_memo.clear()
@@ -15,7 +15,7 @@ try:
 except ValueError:  # Already removed
     pass
 
-from SF_Tree_Identifier import identify_trees, test
+from SF_Tree_Identifier import Address, identify_trees, test
 
 
 def main():
@@ -31,14 +31,31 @@ def main():
         help="a street address located in San Francisco, CA",
     )
     g.add_argument("--test", "-t", action="store_true", help="run test suite")
+    g.add_argument(
+        "--build-snapshot",
+        action="store_true",
+        help="build the reference data snapshot used for fast startup",
+    )
     args = parser.parse_args()
 
     if args.test:
         test.test()
+    elif args.build_snapshot:
+        path = identify_trees.build_snapshot()
+        print(f"Reference data snapshot saved at {path}")
     elif args.address != "":
         # prints found trees
         address = " ".join(args.address)
-        returned_trees = identify_trees.get_trees(address)
+        try:
+            returned_trees = identify_trees.get_trees(address)
+        except (Address.NoCloseMatchError, identify_trees.NoTreeFoundError) as err:
+            print(err)
+            suggestions = identify_trees.suggest_addresses(address)
+            if suggestions:
+                print("Did you mean:")
+                for suggestion in suggestions:
+                    print(f"  {suggestion['address']}")
+            sys.exit(1)
         identify_trees.print_trees(returned_trees)
 
     else:
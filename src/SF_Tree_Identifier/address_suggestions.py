@@ -0,0 +1,145 @@
+"""Ranked "did you mean" suggestions for street addresses without a matching street or without trees.
+The index holds the street numbers with trees of every street in SF_trees.db, so the closest existing
+addresses are found in one pass (similar streets, then the nearest numbers on each) instead of by
+trying lookups of neighbouring addresses."""
+
+import sqlite3
+from array import array
+from bisect import bisect_left
+from itertools import groupby
+from typing import NamedTuple
+
+from thefuzz import fuzz
+from thefuzz import process as fuzz_process
+
+# street numbers away from the requested one that cost one point of street name similarity
+NUMBER_DISTANCE_PER_POINT = 2
+# the most points the street number distance can cost, so a far number on the right street
+# still ranks above the nearest number on a barely similar street
+MAX_NUMBER_DISTANCE_POINTS = 40
+
+
+class Suggestion(NamedTuple):
+    street_number: int
+    street_name: str
+    # street name similarity (0-100) less the street number distance penalty
+    score: float
+    street_score: int
+    number_distance: int
+
+    @property
+    def street_address(self) -> str:
+        return f"{self.street_number} {self.street_name}"
+
+
+class AddressIndex:
+    """The street numbers with trees of every street, {street_name: sorted array of street numbers}."""
+
+    __slots__ = ("numbers",)
+
+    def __init__(self, street_addresses):
+        """street_addresses are (street_name, street_number) pairs sorted by street name and number."""
+        self.numbers = {}
+        for street_name, pairs in groupby(street_addresses, key=lambda pair: pair[0]):
+            numbers = array("l")
+            for _, street_number in pairs:
+                if not numbers or numbers[-1] != street_number:
+                    numbers.append(street_number)
+            self.numbers[street_name] = numbers
+
+    def __len__(self) -> int:
+        return sum(len(numbers) for numbers in self.numbers.values())
+
+    def nearest_numbers(
+        self, street_name: str, street_number: int, limit: int
+    ) -> list[int]:
+        """Returns up to limit street numbers with trees on the street, nearest to street_number first
+        (the higher number first on ties)."""
+        numbers = self.numbers.get(street_name)
+        if not numbers:
+            return []
+
+        higher = bisect_left(numbers, street_number)
+        lower = higher - 1
+        nearest = []
+        while len(nearest) < limit and (lower >= 0 or higher < len(numbers)):
+            if higher < len(numbers) and (
+                lower < 0 or numbers[higher] - street_number <= street_number - numbers[lower]
+            ):
+                nearest.append(numbers[higher])
+                higher += 1
+            else:
+                nearest.append(numbers[lower])
+                lower -= 1
+        return nearest
+
+    def _similar_streets(self, street_name: str, limit: int) -> list[tuple[str, int]]:
+        # plain edit distance ratio: the default WRatio scores partial matches of long street names
+        # (i.e. 'st' in '6th st berry st') too high to rank suggestions by
+        return fuzz_process.extract(
+            street_name, self.numbers.keys(), scorer=fuzz.ratio, limit=limit
+        )
+
+    def suggest(
+        self,
+        street_number: int,
+        street_name: str,
+        limit: int = 5,
+        street_limit: int = 3,
+        min_street_score: int = 60,
+    ) -> list[Suggestion]:
+        """Returns up to limit suggestions for the (normalized) street address, best first. The street_limit
+        streets most similar to street_name (with a score of at least min_street_score) are considered and
+        on each the limit street numbers nearest to street_number. A suggestion scores its street's similarity
+        less one point per NUMBER_DISTANCE_PER_POINT street numbers away (at most MAX_NUMBER_DISTANCE_POINTS)."""
+        if street_name in self.numbers:
+            streets = [(street_name, 100)]
+            # a right street name can still be the wrong street, i.e. a misremembered street type
+            streets += [
+                match
+                for match in self._similar_streets(street_name, street_limit)
+                if match[0] != street_name
+            ][: street_limit - 1]
+        else:
+            streets = self._similar_streets(street_name, street_limit)
+
+        suggestions = []
+        for candidate_street, street_score in streets:
+            if street_score < min_street_score:
+                continue
+            for number in self.nearest_numbers(candidate_street, street_number, limit):
+                number_distance = abs(number - street_number)
+                penalty = min(
+                    number_distance / NUMBER_DISTANCE_PER_POINT, MAX_NUMBER_DISTANCE_POINTS
+                )
+                suggestions.append(
+                    Suggestion(
+                        number,
+                        candidate_street,
+                        street_score - penalty,
+                        street_score,
+                        number_distance,
+                    )
+                )
+
+        suggestions.sort(
+            key=lambda suggestion: (
+                -suggestion.score,
+                suggestion.number_distance,
+                suggestion.street_name,
+            )
+        )
+        return suggestions[:limit]
+
+
+def build_address_index(con: sqlite3.Connection) -> AddressIndex:
+    """Builds the address index from the addresses table of the db connected to in one scan of its
+    (street_name, street_number) index."""
+    street_addresses = con.execute(
+        """
+        SELECT DISTINCT street_name, street_number
+        FROM addresses
+        WHERE street_name IS NOT NULL AND street_number IS NOT NULL
+        ORDER BY street_name, street_number"""
+    ).fetchall()
+    return AddressIndex(street_addresses)
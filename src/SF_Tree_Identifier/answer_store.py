@@ -0,0 +1,174 @@
+"""Materialized answers of get_trees for every address with trees in SF_trees.db. The answers are static
+until the next db build, so they are formatted at build time (see dev/db_creation/make_tree_table.py) and
+an exact address lookup is one binary search of the memory-mapped answer file, without SQL or aggregation.
+
+Layout: header | key offsets | answer offsets | keys | answers. The header holds the format version, the
+number of addresses and the length of the keys and the answers. The keys are the UTF-8 street addresses
+(the qAddress values of the db) in sorted order and the answers their get_trees dicts as compact JSON;
+the offset tables hold number of addresses + 1 little-endian unsigned 64-bit offsets into each."""
+
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from itertools import groupby
+
+from SF_Tree_Identifier import species_dimension
+
+ANSWER_STORE_MAGIC = b"SFTA"
+ANSWER_STORE_VERSION = 2
+# magic, version, number of addresses, keys length, answers length
+ANSWER_STORE_HEADER = struct.Struct("<4sHIQQ")
+OFFSET_SIZE = 8
+
+
+class AnswerStoreFormatError(Exception):
+    """Raised when an answer store file is not in the expected format."""
+
+
+def _offset_table(data, start: int, count: int):
+    """Returns the count offsets stored at data[start:] as a sequence of ints, without a copy on little-endian hosts."""
+    table = memoryview(data)[start : start + count * OFFSET_SIZE]
+    if sys.byteorder == "little":
+        return table.cast("Q")
+    offsets = array("Q", table)
+    offsets.byteswap()
+    return offsets
+
+
+class AnswerStore:
+    """The get_trees answers of the addresses with trees, {street_address: answer}. get() returns a new dict
+    decoded from the answer file on every call, so callers can modify it."""
+
+    __slots__ = ("_data", "_count", "_key_offsets", "_answer_offsets", "_keys_start", "_answers_start")
+
+    def __init__(self, data):
+        """data is the content of an answer file, any bytes-like object (i.e. an mmap).
+        Raises AnswerStoreFormatError if it isn't a valid answer file."""
+        if len(data) < ANSWER_STORE_HEADER.size:
+            raise AnswerStoreFormatError("too short to be an answer store")
+        magic, version, count, keys_length, answers_length = ANSWER_STORE_HEADER.unpack_from(data)
+        if magic != ANSWER_STORE_MAGIC or version != ANSWER_STORE_VERSION:
+            raise AnswerStoreFormatError(f"not a version {ANSWER_STORE_VERSION} answer store")
+
+        offsets_length = (count + 1) * OFFSET_SIZE
+        self._keys_start = ANSWER_STORE_HEADER.size + 2 * offsets_length
+        self._answers_start = self._keys_start + keys_length
+        if len(data) != self._answers_start + answers_length:
+            raise AnswerStoreFormatError("truncated")
+
+        self._data = data
+        self._count = count
+        self._key_offsets = _offset_table(data, ANSWER_STORE_HEADER.size, count + 1)
+        self._answer_offsets = _offset_table(
+            data, ANSWER_STORE_HEADER.size + offsets_length, count + 1
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "AnswerStore":
+        """Memory-maps the answer file at path, so only the pages lookups touch are read.
+        Raises FileNotFoundError if there is no file and AnswerStoreFormatError if it isn't a valid answer file."""
+        with open(path, "rb") as fp:
+            data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return cls(data)
+        except AnswerStoreFormatError as err:
+            data.close()
+            raise AnswerStoreFormatError(f"{path}: {err}")
+
+    def _key(self, index: int) -> bytes:
+        return self._data[
+            self._keys_start + self._key_offsets[index] : self._keys_start
+            + self._key_offsets[index + 1]
+        ]
+
+    def _find(self, street_address: str) -> int:
+        key = street_address.encode()
+        index = bisect_left(range(self._count), key, key=self._key)
+        if index < self._count and self._key(index) == key:
+            return index
+        return -1
+
+    def get(self, street_address: str, default=None) -> dict | None:
+        """Returns the get_trees answer of the normalized street address, or default if it has no trees."""
+        index = self._find(street_address)
+        if index < 0:
+            return default
+        start = self._answers_start + self._answer_offsets[index]
+        end = self._answers_start + self._answer_offsets[index + 1]
+        return json.loads(self._data[start:end])
+
+    def __contains__(self, street_address: str) -> bool:
+        return self._find(street_address) >= 0
+
+    def __len__(self) -> int:
+        return self._count
+
+
+def write_answer_store(path: str, answers) -> int:
+    """Writes the (street_address, answer) pairs to an answer file at path. Returns the number of addresses."""
+    encoded = sorted(
+        (street_address.encode(), json.dumps(answer, separators=(",", ":")).encode())
+        for street_address, answer in answers
+    )
+
+    key_offsets, answer_offsets = array("Q", [0]), array("Q", [0])
+    for key, answer in encoded:
+        key_offsets.append(key_offsets[-1] + len(key))
+        answer_offsets.append(answer_offsets[-1] + len(answer))
+    if sys.byteorder != "little":
+        key_offsets.byteswap()
+        answer_offsets.byteswap()
+
+    header = ANSWER_STORE_HEADER.pack(
+        ANSWER_STORE_MAGIC,
+        ANSWER_STORE_VERSION,
+        len(encoded),
+        sum(len(key) for key, _ in encoded),
+        sum(len(answer) for _, answer in encoded),
+    )
+    with open(path, "wb") as fp:
+        fp.write(header)
+        fp.write(key_offsets)
+        fp.write(answer_offsets)
+        for key, _ in encoded:
+            fp.write(key)
+        for _, answer in encoded:
+            fp.write(answer)
+    return len(encoded)
+
+
+def get_answer_store_location(db_path: str) -> str:
+    """Returns the path of the answer store belonging to the db at db_path (SF_trees.db -> SF_trees.answers)."""
+    return os.path.splitext(db_path)[0] + ".answers"
+
+
+def build_answers(db_path: str):
+    """Yields (street_address, answer) for every address with trees in the db at db_path, where answer is
+    the dict get_trees returns for the address:
+    {Street Address: [{urlPath, count, scientific_name, common_name, display_name, url}, ...]}.
+    The addresses are read in order from the qAddress index and their trees counted per species."""
+    con = sqlite3.connect(db_path)
+    try:
+        species = species_dimension.SpeciesDimension.from_db(con)
+        rows = con.execute(
+            """
+            SELECT qAddress, qSpecies
+            FROM addresses
+            WHERE qAddress IS NOT NULL
+            ORDER BY qAddress"""
+        )
+        for street_address, address_rows in groupby(rows, key=lambda row: row[0]):
+            species_counts = Counter(species_key for _, species_key in address_rows)
+            yield street_address, {
+                street_address.title(): species_dimension.species_count_dicts(
+                    (species[species_key], count) for species_key, count in species_counts.items()
+                )
+            }
+    finally:
+        con.close()
@@ -0,0 +1,144 @@
+"""Versioned tree databases switched by a pointer file, so a new SF_trees.db can be published while
+long-running processes are serving the current one.
+
+Every build is written to its own file (SF_trees.<version>.db, with its bloom filter SF_trees.<version>.bloom,
+answer store SF_trees.<version>.answers and fingerprint SF_trees.<version>.db.sha256) and never modified afterwards. The pointer file (SF_trees.current) holds the file name of the version to
+serve. Publishing syncs the new files to disk and then atomically replaces the pointer file, so readers
+see either the old or the new version, never a partial one."""
+
+import logging
+import os
+import re
+from datetime import datetime
+
+from SF_Tree_Identifier import answer_store, existence_index, snapshot
+
+POINTER_EXTENSION = ".current"
+# versions sort in the order they were published
+VERSION_FORMAT = "%Y%m%dT%H%M%S%f"
+VERSION_PATTERN = r"\d{8}T\d{12}"
+
+
+def get_pointer_location(db_path: str) -> str:
+    """Returns the path of the pointer file of the db at db_path (SF_trees.db -> SF_trees.current)."""
+    return os.path.splitext(db_path)[0] + POINTER_EXTENSION
+
+
+def new_version() -> str:
+    """Returns a new version name, the current time."""
+    return datetime.now().strftime(VERSION_FORMAT)
+
+
+def get_version_location(db_path: str, version: str) -> str:
+    """Returns the path of the given version of the db at db_path (SF_trees.db -> SF_trees.<version>.db)."""
+    root, extension = os.path.splitext(db_path)
+    return f"{root}.{version}{extension}"
+
+
+def list_versions(db_path: str) -> list[str]:
+    """Returns the paths of the published versions of the db at db_path, oldest first."""
+    db_dir, db_file_name = os.path.split(os.path.abspath(db_path))
+    root, extension = os.path.splitext(db_file_name)
+    pattern = re.compile(
+        f"{re.escape(root)}\\.{VERSION_PATTERN}{re.escape(extension)}"
+    )
+    return [
+        os.path.join(db_dir, file_name)
+        for file_name in sorted(os.listdir(db_dir))
+        if pattern.fullmatch(file_name)
+    ]
+
+
+def read_pointer(pointer_path: str) -> str | None:
+    """Returns the path of the db version the pointer file at pointer_path points to.
+    Returns None if there is no pointer file."""
+    try:
+        with open(pointer_path) as fp:
+            db_file_name = fp.read().strip()
+    except FileNotFoundError:
+        return None
+
+    if not db_file_name:
+        return None
+    return os.path.join(os.path.dirname(os.path.abspath(pointer_path)), db_file_name)
+
+
+def fsync_path(path: str) -> None:
+    """Flushes the file or directory at path to disk. Directories can't be synced on Windows, they are skipped."""
+    if os.path.isdir(path) and os.name != "posix":
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_pointer(pointer_path: str, db_location: str) -> None:
+    """Points the pointer file at pointer_path to the db at db_location, which must be in the same directory.
+    The pointer file is replaced atomically and synced to disk."""
+    pointer_dir = os.path.dirname(os.path.abspath(pointer_path))
+    if os.path.dirname(os.path.abspath(db_location)) != pointer_dir:
+        raise ValueError(f"{db_location} is not in the directory of {pointer_path}")
+
+    tmp_path = f"{pointer_path}.tmp"
+    with open(tmp_path, "w") as fp:
+        fp.write(os.path.basename(db_location))
+        fp.flush()
+        os.fsync(fp.fileno())
+    os.replace(tmp_path, pointer_path)
+    fsync_path(pointer_dir)
+
+
+def get_sidecar_locations(db_location: str) -> list[str]:
+    """Returns the paths of the files built alongside the db at db_location: its bloom filter, answer store
+    and fingerprint."""
+    return [
+        existence_index.get_bloom_filter_location(db_location),
+        answer_store.get_answer_store_location(db_location),
+        snapshot.get_fingerprint_location(db_location),
+    ]
+
+
+def publish(build_path: str, db_path: str, version: str, keep: int = 2) -> str:
+    """Publishes the db built at build_path as the given version of the db at db_path and returns its location.
+    The db is moved to its version location, the db and its sidecar files (built at their locations for the
+    version, see get_sidecar_locations) are synced to disk and the pointer file is switched to it. Only the keep
+    newest versions are kept afterwards (see prune_versions)."""
+    db_location = get_version_location(db_path, version)
+
+    fsync_path(build_path)
+    os.replace(build_path, db_location)
+    for sidecar_location in get_sidecar_locations(db_location):
+        if os.path.exists(sidecar_location):
+            fsync_path(sidecar_location)
+    fsync_path(os.path.dirname(os.path.abspath(db_location)))
+
+    write_pointer(get_pointer_location(db_path), db_location)
+    prune_versions(db_path, keep)
+    return db_location
+
+
+def prune_versions(db_path: str, keep: int = 2) -> list[str]:
+    """Removes all but the keep newest versions of the db at db_path (with their sidecar files); the version
+    the pointer file points to is always kept. Processes still reading a removed version keep reading it
+    where the file system allows it; versions that can't be removed are left for the next prune.
+    Returns the removed versions."""
+    current = read_pointer(get_pointer_location(db_path))
+    versions = list_versions(db_path)
+    removed = []
+    for db_location in versions[: max(len(versions) - keep, 0)]:
+        if db_location == current:
+            continue
+        try:
+            os.remove(db_location)
+        except OSError as err:
+            logging.warning(f"{err}: old db version not removed.")
+            continue
+        for sidecar_location in get_sidecar_locations(db_location):
+            try:
+                os.remove(sidecar_location)
+            except FileNotFoundError:
+                pass
+        removed.append(db_location)
+    return removed
@@ -0,0 +1,148 @@
+"""Compact existence index over the addresses with trees in SF_trees.db. The bloom filter is built
+together with the db and lets lookups skip SQLite for addresses that definitely have no trees."""
+
+import hashlib
+import math
+import os
+import pickle
+import sqlite3
+import struct
+
+BLOOM_FILTER_MAGIC = b"SFTB"
+BLOOM_FILTER_VERSION = 1
+# magic, version, number of hashes, number of items, number of bits
+BLOOM_FILTER_HEADER = struct.Struct("<4sHIIQ")
+
+
+class BloomFilterFormatError(Exception):
+    """Raised when a bloom filter file is not in the expected format."""
+
+
+class AddressBloomFilter:
+    """Bloom filter over normalized street address strings (the qAddress values of the db).
+    'in' returns False if the address definitely has no trees and True if it may have trees.
+    bits can be any bytes-like object; it must be writable to add() addresses."""
+
+    __slots__ = ("num_bits", "num_hashes", "num_items", "bits")
+
+    def __init__(
+        self,
+        num_bits: int,
+        num_hashes: int,
+        bits: bytearray | None = None,
+        num_items: int = 0,
+    ):
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.num_items = num_items
+        self.bits = bits if bits is not None else bytearray((num_bits + 7) // 8)
+
+    @classmethod
+    def for_capacity(
+        cls, capacity: int, false_positive_rate: float = 0.01
+    ) -> "AddressBloomFilter":
+        """Creates an empty filter sized for capacity items at the given false positive rate."""
+        capacity = max(capacity, 1)
+        num_bits = math.ceil(
+            -capacity * math.log(false_positive_rate) / (math.log(2) ** 2)
+        )
+        num_hashes = max(1, round(num_bits / capacity * math.log(2)))
+        return cls(num_bits, num_hashes)
+
+    def _positions(self, street_address: str):
+        """Yields the bit positions of the street address using double hashing of one blake2b digest."""
+        digest = hashlib.blake2b(street_address.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        num_bits = self.num_bits
+        for i in range(self.num_hashes):
+            yield (h1 + i * h2) % num_bits
+
+    def add(self, street_address: str) -> None:
+        bits = self.bits
+        for position in self._positions(street_address):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.num_items += 1
+
+    def __contains__(self, street_address: str) -> bool:
+        bits = self.bits
+        for position in self._positions(street_address):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def __len__(self):
+        return self.num_items
+
+    def __reduce_ex__(self, protocol):
+        # with protocol 5 the bits can be stored out-of-band (see snapshot.py) and loaded without a copy
+        bits = pickle.PickleBuffer(self.bits) if protocol >= 5 else bytes(self.bits)
+        return type(self), (self.num_bits, self.num_hashes, bits, self.num_items)
+
+    def save(self, path: str) -> None:
+        """Saves the filter to path."""
+        header = BLOOM_FILTER_HEADER.pack(
+            BLOOM_FILTER_MAGIC,
+            BLOOM_FILTER_VERSION,
+            self.num_hashes,
+            self.num_items,
+            self.num_bits,
+        )
+        with open(path, "wb") as fp:
+            fp.write(header)
+            fp.write(self.bits)
+
+    @classmethod
+    def load(cls, path: str) -> "AddressBloomFilter":
+        """Loads a filter saved with save(). Raises FileNotFoundError if the file is not found
+        and BloomFilterFormatError if the file is not a valid bloom filter."""
+        try:
+            with open(path, "rb") as fp:
+                data = fp.read()
+        except FileNotFoundError:
+            raise FileNotFoundError(
+                f"bloom filter file not found at {os.path.abspath(path)}"
+            )
+
+        if len(data) < BLOOM_FILTER_HEADER.size:
+            raise BloomFilterFormatError(f"{path} is too short to be a bloom filter")
+
+        magic, version, num_hashes, num_items, num_bits = (
+            BLOOM_FILTER_HEADER.unpack_from(data)
+        )
+        if magic != BLOOM_FILTER_MAGIC or version != BLOOM_FILTER_VERSION:
+            raise BloomFilterFormatError(
+                f"{path} is not a version {BLOOM_FILTER_VERSION} bloom filter"
+            )
+
+        bits = bytearray(data[BLOOM_FILTER_HEADER.size :])
+        if len(bits) != (num_bits + 7) // 8:
+            raise BloomFilterFormatError(f"{path} is truncated")
+
+        return cls(num_bits, num_hashes, bits, num_items)
+
+
+def get_bloom_filter_location(db_path: str) -> str:
+    """Returns the path of the bloom filter belonging to the db at db_path (SF_trees.db -> SF_trees.bloom)."""
+    return os.path.splitext(db_path)[0] + ".bloom"
+
+
+def build_address_bloom_filter(
+    db_path: str, false_positive_rate: float = 0.01
+) -> AddressBloomFilter:
+    """Builds a bloom filter of every qAddress in the addresses table of the db at db_path."""
+    con = sqlite3.connect(db_path)
+    try:
+        addresses = [
+            row[0]
+            for row in con.execute("SELECT DISTINCT qAddress FROM addresses")
+            if row[0] is not None
+        ]
+    finally:
+        con.close()
+
+    bloom_filter = AddressBloomFilter.for_capacity(len(addresses), false_positive_rate)
+    for address in addresses:
+        bloom_filter.add(address)
+
+    return bloom_filter
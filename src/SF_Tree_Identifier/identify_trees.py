@@ -1,13 +1,114 @@
+"""Tree lookups against the SF_trees.db database.
+
+Thread safety: the lookup functions (main, get_trees, get_trees_batch and the query functions) can be
+called from multiple threads at once. Each thread queries the db through its own SQLite connection
+(see get_connection) and the structures derived from the db are built once under a lock and are
+read-only afterwards.
+
+Hot reload: if the db is published as versions switched by a pointer file (see db_versions), DB_LOCATION
+follows the pointer. Lookups check the pointer at most every DB_RELOAD_INTERVAL seconds and a changed
+pointer is picked up in the background (reload_db): the structures derived from the db are built for the
+new version before lookups are switched to it, and lookups in flight finish on the version they started
+on. Setting DB_LOCATION directly stops following the pointer."""
+
 import logging
 import sqlite3
 import os
+import pathlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 
 import pandas as pd
-
-from SF_Tree_Identifier import Address
+from thefuzz import process as fuzz_process
+
+from SF_Tree_Identifier import (
+    Address,
+    address_suggestions,
+    answer_store,
+    db_versions,
+    existence_index,
+    metrics,
+    profiler,
+    snapshot,
+    spatial_index,
+    species_dimension,
+    street_autocomplete,
+)
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
-DB_LOCATION = os.path.join(DATA_DIR, "SF_trees.db")
+DEFAULT_DB_LOCATION = os.path.join(DATA_DIR, "SF_trees.db")
+DB_POINTER_LOCATION = os.environ.get(
+    "SF_TREE_DB_POINTER", db_versions.get_pointer_location(DEFAULT_DB_LOCATION)
+)
+# seconds between checks of the pointer file for a newly published db version
+DB_RELOAD_INTERVAL = float(os.environ.get("SF_TREE_DB_RELOAD_INTERVAL", 5))
+DB_LOCATION = db_versions.read_pointer(DB_POINTER_LOCATION) or DEFAULT_DB_LOCATION
+
+# runtime SQLite settings for the served db, which is a read-only artifact. With DB_IMMUTABLE the db is
+# opened with immutable=1 (no locks, no change detection); set SF_TREE_DB_IMMUTABLE=0 if it's modified in place
+DB_IMMUTABLE = os.environ.get("SF_TREE_DB_IMMUTABLE", "1") != "0"
+DB_PRAGMAS = {
+    "mmap_size": 256 * 2**20,  # bytes, more than the whole db
+    "cache_size": -16_000,  # KiB
+    "temp_store": "MEMORY",
+    "query_only": "ON",
+}
+# batched addresses on a street at most this many street numbers apart are read with one range scan
+BATCH_RANGE_GAP = 50
+
+# structures derived from a db keyed by (name, db location), and their loaders by name
+_db_caches = {}
+_db_cache_loaders = {}
+# reentrant as some loaders use other cached structures
+_db_caches_lock = threading.RLock()
+# per-thread SQLite connections keyed by db location and the db location pinned by pin_db_location
+_thread_local = threading.local()
+# the DB_LOCATION set at import or by reload_db; reloads stop if DB_LOCATION is set to anything else
+_pointer_db_location = DB_LOCATION
+# held while a reload is running
+_reload_lock = threading.Lock()
+_next_reload_check = 0.0
+
+LOOKUPS = metrics.Counter(
+    "sf_tree_lookups", "Address lookups (main) by result.", ("result",)
+)
+LOOKUPS_EXACT = LOOKUPS.labels("exact")
+LOOKUPS_NEARBY = LOOKUPS.labels("nearby")
+LOOKUPS_NOT_FOUND = LOOKUPS.labels("not_found")
+LOOKUPS_NO_STREET_MATCH = LOOKUPS.labels("no_street_match")
+LOOKUPS_INVALID_ADDRESS = LOOKUPS.labels("invalid_address")
+LOOKUP_SECONDS = metrics.Histogram(
+    "sf_tree_lookup_seconds", "Latency of address lookups (main)."
+)
+DB_QUERY_SECONDS = metrics.Histogram(
+    "sf_tree_db_query_seconds",
+    "Latency of db queries; for streamed queries, until the first row.",
+    ("function",),
+)
+QUERY_DB_SECONDS = DB_QUERY_SECONDS.labels("query_db")
+ITERATE_DB_SECONDS = DB_QUERY_SECONDS.labels("iterate_db")
+EXISTENCE_CHECKS = metrics.Counter(
+    "sf_tree_existence_checks",
+    "Existence index checks by result (miss: definitely no trees).",
+    ("result",),
+)
+EXISTENCE_MISSES = EXISTENCE_CHECKS.labels("miss")
+EXISTENCE_MAYBES = EXISTENCE_CHECKS.labels("maybe")
+ANSWER_STORE_LOOKUPS = metrics.Counter(
+    "sf_tree_answer_store_lookups",
+    "Answer store lookups by result (miss: no stored answer, looked up in the db).",
+    ("result",),
+)
+ANSWER_STORE_HITS = ANSWER_STORE_LOOKUPS.labels("hit")
+ANSWER_STORE_MISSES = ANSWER_STORE_LOOKUPS.labels("miss")
+DB_RELOADS = metrics.Counter(
+    "sf_tree_db_reloads", "Switches to a newly published db version."
+)
+
+# profiles the whole process if SF_TREE_PROFILE is set
+profiler.start_from_env()
 
 
 class NoTreeFoundError(Exception):
@@ -16,6 +117,12 @@ class NoTreeFoundError(Exception):
     pass
 
 
+class NoSpeciesFoundError(Exception):
+    """Raised if no species closely matches the given species name."""
+
+    pass
+
+
 def create_address_query(street_address: str) -> str:
     """Creates the sql query to retrieve the qSpecies keys for a specfic address. Returns the query as a string."""
     query = f"""
@@ -35,20 +142,89 @@ def create_species_query(key: str) -> str:
 
 
 def check_db_connection() -> bool:
-    """Checks if the SF_Trees database exists. Returns True if so, or raises a FileNotFoundError if not."""
-    data_dir = os.listdir(DATA_DIR)
-    _, db_name = os.path.split(DB_LOCATION)
-    if db_name in data_dir:
+    """Checks if the SF_Trees database exists, after checking for a newly published version (see check_for_new_db).
+    Returns True if so, or raises a FileNotFoundError if not."""
+    check_for_new_db()
+    db_location = get_db_location()
+    if os.path.isfile(db_location):
         return True
 
-    raise FileNotFoundError(f"Can't find the tree database at {DB_LOCATION}")
+    raise FileNotFoundError(f"Can't find the tree database at {db_location}")
+
 
+def get_db_location() -> str:
+    """Returns the location of the db the calling thread queries: the location pinned with pin_db_location, or DB_LOCATION."""
+    return getattr(_thread_local, "pinned_db_location", None) or DB_LOCATION
 
-def query_db(query: str, fetchall: bool = True):
-    """General function to query the sqlite3 database at DB_LOCATION. Returns the results if they are found or None if there are none."""
-    con = sqlite3.connect(DB_LOCATION)
-    cur = con.cursor()
-    result = cur.execute(query)
+
+@contextmanager
+def pin_db_location(db_location: str | None = None):
+    """Pins the calling thread to the current db version (or db_location) for the block, so a reload during
+    a lookup can't mix the data of two versions. Nested blocks keep the outermost pin."""
+    if getattr(_thread_local, "pinned_db_location", None) is not None:
+        yield
+        return
+
+    _thread_local.pinned_db_location = db_location or DB_LOCATION
+    try:
+        yield
+    finally:
+        _thread_local.pinned_db_location = None
+
+
+def get_connection() -> sqlite3.Connection:
+    """Returns the calling thread's connection to the sqlite3 database at get_db_location(), opening it on first use.
+    Connections are never shared between threads; SQLite releases the GIL while a query runs,
+    so threads querying through their own connections run their queries in parallel."""
+    try:
+        connections = _thread_local.connections
+    except AttributeError:
+        connections = _thread_local.connections = {}
+
+    db_location = get_db_location()
+    try:
+        return connections[db_location]
+    except KeyError:
+        pass
+
+    # connections to other db versions are dropped rather than closed, a generator of this thread
+    # (i.e. find_species) may still be reading from one; they close once nothing uses them
+    connections.clear()
+    con = connections[db_location] = connect_db(db_location)
+    return con
+
+
+def connect_db(db_location: str) -> sqlite3.Connection:
+    """Opens a read-only connection to the db at db_location (immutable if DB_IMMUTABLE) with DB_PRAGMAS applied.
+    Raises sqlite3.OperationalError if the db doesn't exist."""
+    uri = f"{pathlib.Path(os.path.abspath(db_location)).as_uri()}?mode=ro"
+    if DB_IMMUTABLE:
+        uri += "&immutable=1"
+
+    con = sqlite3.connect(uri, uri=True)
+    try:
+        for pragma, value in DB_PRAGMAS.items():
+            con.execute(f"PRAGMA {pragma}={value}")
+    except sqlite3.Error:
+        con.close()
+        raise
+    return con
+
+
+def close_connections() -> None:
+    """Closes the calling thread's db connections. They are reopened on next use."""
+    connections = getattr(_thread_local, "connections", {})
+    for con in connections.values():
+        con.close()
+    connections.clear()
+
+
+def query_db(query: str, fetchall: bool = True, parameters: tuple = ()):
+    """General function to query the sqlite3 database at get_db_location(). Returns the results if they are found or None if there are none.
+    parameters are bound to the query's ? placeholders. Uses the calling thread's connection."""
+    start = time.perf_counter()
+    cur = get_connection().cursor()
+    result = cur.execute(query, parameters)
 
     if result:
         if fetchall:
@@ -56,10 +232,200 @@ def query_db(query: str, fetchall: bool = True):
         else:
             result = result.fetchone()
 
-    con.close()
+    cur.close()
+    QUERY_DB_SECONDS.observe(time.perf_counter() - start)
     return result
 
 
+def iterate_db(query: str, parameters: tuple = ()):
+    """Generator that queries the sqlite3 database at get_db_location() and yields the result rows one at a time.
+    Uses the calling thread's connection, so the generator must be consumed by the thread that created it."""
+    start = time.perf_counter()
+    cur = get_connection().cursor()
+    try:
+        rows = cur.execute(query, parameters)
+        ITERATE_DB_SECONDS.observe(time.perf_counter() - start)
+        yield from rows
+    finally:
+        cur.close()
+
+
+def get_snapshot_source_paths(db_location: str | None = None) -> dict:
+    """Returns {role: path} of the files the reference data snapshot is built from (default db: get_db_location())."""
+    db_location = db_location or get_db_location()
+    return {
+        "db": db_location,
+        "bloom_filter": existence_index.get_bloom_filter_location(db_location),
+        "street_names": Address.STREET_NAMES_LOCATION,
+        "street_types": Address.STREET_TYPES_LOCATION,
+    }
+
+
+def get_db_cached(name: str, loader, db_location: str | None = None):
+    """Returns the structure called name derived from the db at db_location (default: get_db_location()).
+    On first use it is taken from the reference data snapshot if the snapshot is up to date,
+    otherwise it is built with loader(db_location). It is then cached per db location.
+    Each structure is built once, even if several threads ask for it at the same time."""
+    db_location = db_location or get_db_location()
+    key = (name, db_location)
+    try:
+        return _db_caches[key]
+    except KeyError:
+        pass
+
+    with _db_caches_lock:
+        # another thread may have built it while this one waited
+        if key in _db_caches:
+            return _db_caches[key]
+
+        try:
+            value = snapshot.get_value(name, get_snapshot_source_paths(db_location))
+        except KeyError:
+            value = loader(db_location)
+
+        _db_caches[key] = value
+        _db_cache_loaders[name] = loader
+        return value
+
+
+def follow_db_pointer(pointer_path: str) -> str:
+    """Serves the db version the pointer file at pointer_path points to and follows the pointer from then on
+    (see reload_db). Returns the location of the db served. Raises FileNotFoundError if there is no pointer file."""
+    global DB_POINTER_LOCATION, DB_LOCATION, _pointer_db_location
+    db_location = db_versions.read_pointer(pointer_path)
+    if db_location is None:
+        raise FileNotFoundError(f"Can't find the db pointer file at {pointer_path}")
+
+    with _reload_lock:
+        DB_POINTER_LOCATION = pointer_path
+        DB_LOCATION = _pointer_db_location = db_location
+    return db_location
+
+
+def check_for_new_db() -> None:
+    """Starts reload_db in a background thread if the pointer file at DB_POINTER_LOCATION points to another
+    db version than DB_LOCATION. The pointer file is read at most every DB_RELOAD_INTERVAL seconds,
+    so this is cheap enough to call on every lookup."""
+    global _next_reload_check
+    now = time.monotonic()
+    if now < _next_reload_check or DB_LOCATION != _pointer_db_location:
+        return
+    _next_reload_check = now + DB_RELOAD_INTERVAL
+
+    if db_versions.read_pointer(DB_POINTER_LOCATION) in (None, DB_LOCATION):
+        return
+    if not _reload_lock.locked():
+        threading.Thread(
+            target=reload_db, name="SF_Tree_Identifier db reload", daemon=True
+        ).start()
+
+
+def reload_db() -> bool:
+    """Switches lookups to the db version the pointer file at DB_POINTER_LOCATION points to, if it changed.
+    The structures derived from the db that are loaded for the current version are built for the new version
+    first, so lookups don't start over with cold caches. Lookups in flight finish on the version they started
+    on (see pin_db_location); the caches of the previous version are dropped at the next switch and each
+    thread drops its connection to it on its next query.
+    Returns True if lookups were switched. Nothing is switched if DB_LOCATION was set directly."""
+    global DB_LOCATION, _pointer_db_location
+    with _reload_lock:
+        old_location = DB_LOCATION
+        new_location = db_versions.read_pointer(DB_POINTER_LOCATION)
+        if old_location != _pointer_db_location or new_location in (None, old_location):
+            return False
+        if not os.path.isfile(new_location):
+            logging.warning(
+                f"{DB_POINTER_LOCATION} points to the missing db {new_location}: not switched."
+            )
+            return False
+
+        start = time.perf_counter()
+        loaded = [name for name, db_location in list(_db_caches) if db_location == old_location]
+        for name in loaded:
+            try:
+                get_db_cached(name, _db_cache_loaders[name], new_location)
+            except Exception as err:
+                logging.warning(f"{err}: {name} not loaded before switching to {new_location}.")
+
+        with _db_caches_lock:
+            for key in list(_db_caches):
+                if key[1] not in (old_location, new_location):
+                    del _db_caches[key]
+            DB_LOCATION = _pointer_db_location = new_location
+
+    DB_RELOADS.inc()
+    logging.info(
+        f"Switched to {new_location} in {time.perf_counter() - start: .2f}s ({len(loaded)} structures loaded)."
+    )
+    return True
+
+
+def _load_existence_index(db_location: str) -> existence_index.AddressBloomFilter | None:
+    path = existence_index.get_bloom_filter_location(db_location)
+    try:
+        return existence_index.AddressBloomFilter.load(path)
+    except FileNotFoundError:
+        return None
+    except existence_index.BloomFilterFormatError as err:
+        logging.warning(f"{err}: existence index not used.")
+        return None
+
+
+def get_existence_index() -> existence_index.AddressBloomFilter | None:
+    """Returns the bloom filter of addresses with trees built alongside the db at DB_LOCATION.
+    The filter is loaded on first use. Returns None if the db has no (valid) filter."""
+    return get_db_cached("existence_index", _load_existence_index)
+
+
+def may_have_trees(street_address: str) -> bool:
+    """Returns False if the existence index shows there are definitely no trees at the street address.
+    Returns True if there may be trees or no existence index is available."""
+    bloom_filter = get_existence_index()
+    if bloom_filter is None:
+        return True
+    if street_address in bloom_filter:
+        EXISTENCE_MAYBES.inc()
+        return True
+    EXISTENCE_MISSES.inc()
+    return False
+
+
+def _load_answer_store(db_location: str) -> answer_store.AnswerStore | None:
+    path = answer_store.get_answer_store_location(db_location)
+    try:
+        return answer_store.AnswerStore.load(path)
+    except FileNotFoundError:
+        return None
+    except answer_store.AnswerStoreFormatError as err:
+        logging.warning(f"{err}: answer store not used.")
+        return None
+
+
+def get_answer_store() -> answer_store.AnswerStore | None:
+    """Returns the precomputed get_trees answers of the addresses with trees built alongside the db at get_db_location().
+    The answer file is memory-mapped on first use. Returns None if the db has no (valid) answer store."""
+    return get_db_cached("answer_store", _load_answer_store)
+
+
+def get_stored_answer(query_address: Address.Address) -> dict | None:
+    """Returns the get_trees answer for the query address (see Address.get_Address_for_query) from the answer
+    store if it has trees, without querying the db or aggregating its trees. Returns None if it has none or
+    if the db has no answer store; the address is then looked up in the db."""
+    check_for_new_db()
+    with pin_db_location():
+        store = get_answer_store()
+        if store is None:
+            return None
+        answer = store.get(query_address.street_address)
+
+    if answer is None:
+        ANSWER_STORE_MISSES.inc()
+        return None
+    ANSWER_STORE_HITS.inc()
+    LOOKUPS_EXACT.inc()
+    return answer
+
+
 def get_species_keys(street_address: str) -> list[str]:
     """Queries the sqlite3 database for the species keys found at the given address.
     Returns a list of the keys found keys. List will be empty if none are found"""
@@ -74,25 +440,37 @@ def get_species_keys(street_address: str) -> list[str]:
     return keys
 
 
-def get_species(key: str) -> tuple | None:
-    """Queries the species table for the species matching the passed key.
-    Returns the tuple (qSpecies, urlPath) if a species is found and returns None if none are found."""
-    species_query = create_species_query(key)
-    result = query_db(species_query, fetchall=False)
+def _load_species_dimension(db_location: str) -> species_dimension.SpeciesDimension:
+    """Loads the species table of the db. The display columns are derived here for dbs built without them."""
+    con = connect_db(db_location)
+    try:
+        return species_dimension.SpeciesDimension.from_db(con)
+    finally:
+        con.close()
 
-    if result:
-        result = result  # should only be one species per key
-        qSpecies = result[0]
-        urlPaths = str(result[1])
-        return qSpecies, urlPaths
 
-    return None
+def get_species_dimension() -> species_dimension.SpeciesDimension:
+    """Returns every species of the db at get_db_location() by species key, loaded on first use."""
+    return get_db_cached("species_dimension", _load_species_dimension)
+
+
+def get_species(key: str) -> tuple | None:
+    """Returns the tuple (qSpecies, urlPath) of the species matching the passed key and returns None if none are found."""
+    specie = get_species_dimension().get(int(key))
+    if specie is None:
+        return None
+    return specie.qSpecies, specie.urlPath
 
 
 def get_address_species_keys(street_address: str) -> dict:
     """Returns a dict in the form of {street_address: [key1, key2, ...]} for the given street address.
     Will return an empty dict if no trees are found at that address."""
     address_species_keys = {}
+
+    # definite misses never reach the db
+    if not may_have_trees(street_address):
+        return address_species_keys
+
     species_keys = get_species_keys(street_address)
     # get all tree_ids at the query address and store in
 
@@ -107,17 +485,483 @@ def get_nearby_species_keys(query_address: Address.Address) -> dict:
     Will return a dict with TWO addresses if both nearby address have trees.
     Will return an empty dict if none are found at either."""
     address_species_keys = {}
-    steps = [-2, 4]
+    steps = [-2, 2]
+    street_number = int(query_address.street_number)
 
     for step in steps:
-        query_address.street_number = int(query_address.street_number) + step
+        nearby_address = query_address.replace(street_number=street_number + step)
         address_species_keys.update(
-            get_address_species_keys(query_address.street_address)
+            get_address_species_keys(nearby_address.street_address)
         )
 
     return address_species_keys
 
 
+def _has_nearest_addresses(db_location: str) -> bool:
+    con = connect_db(db_location)
+    try:
+        return (
+            con.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'nearest_addresses'"
+            ).fetchone()
+            is not None
+        )
+    finally:
+        con.close()
+
+
+def get_nearest_street_numbers(street_name: str, street_number: int) -> list[int] | None:
+    """Returns the street numbers with trees nearest to street_number (which has none) on the same street and side
+    (odd or even numbers), however far away: one, or two equally near ones (the lower first). Returns an empty list
+    if that side of the street has no trees and None if the db was built without the nearest_addresses table.
+    The nearest numbers are found with one lookup of the interval of numbers without trees holding street_number."""
+    if not get_db_cached("has_nearest_addresses", _has_nearest_addresses):
+        return None
+
+    query = """
+        SELECT end_number, lower_number, higher_number
+        FROM nearest_addresses
+        WHERE street_name = ? AND side = ? AND start_number <= ?
+        ORDER BY start_number DESC
+        LIMIT 1"""
+    row = query_db(
+        query, fetchall=False, parameters=(street_name, street_number % 2, street_number)
+    )
+    if row is None:
+        return []
+
+    end_number, lower_number, higher_number = row
+    if end_number is not None and end_number < street_number:
+        # street_number has trees itself, it's between two intervals
+        return []
+    distances = {
+        number: abs(number - street_number)
+        for number in (lower_number, higher_number)
+        if number is not None
+    }
+    return [
+        number for number, distance in distances.items() if distance == min(distances.values())
+    ]
+
+
+def get_nearest_species_keys(query_address: Address.Address) -> dict:
+    """Returns {street_address: [key1, key2, ...]} of the addresses with trees nearest to the given address (which has none)
+    on the same street and side (see get_nearest_street_numbers). Will return TWO addresses if two are equally near.
+    Dbs built without the nearest_addresses table are only looked up next door (see get_nearby_species_keys).
+    Will return an empty dict if none are found."""
+    street_numbers = get_nearest_street_numbers(
+        query_address.street_name, int(query_address.street_number)
+    )
+    if street_numbers is None:
+        return get_nearby_species_keys(query_address)
+
+    address_species_keys = {}
+    for street_number in street_numbers:
+        nearest_address = query_address.replace(street_number=street_number)
+        address_species_keys.update(
+            get_address_species_keys(nearest_address.street_address)
+        )
+
+    return address_species_keys
+
+
+def get_species_by_keys(keys) -> dict:
+    """Returns {key: (qSpecies, urlPath)} for the given species keys found in the db."""
+    species = get_species_dimension()
+    return {
+        key: (specie.qSpecies, specie.urlPath)
+        for key, specie in ((key, species.get(key)) for key in set(keys))
+        if specie is not None
+    }
+
+
+def _load_spatial_index(db_location: str) -> spatial_index.SpatialIndex:
+    con = connect_db(db_location)
+    try:
+        return spatial_index.build_spatial_index(con)
+    finally:
+        con.close()
+
+
+def get_spatial_index() -> spatial_index.SpatialIndex:
+    """Returns the spatial index of the trees in the db at DB_LOCATION, built on first use.
+    Raises sqlite3.OperationalError if the db was built without tree coordinates."""
+    return get_db_cached("spatial_index", _load_spatial_index)
+
+
+def get_trees_near(
+    latitude: float,
+    longitude: float,
+    radius_m: float | None = 50.0,
+    limit: int | None = None,
+) -> list[dict]:
+    """Returns the trees within radius_m meters of the given coordinates, nearest first, at most limit of them.
+    If radius_m is None, the limit nearest trees are returned regardless of distance. Each tree is a dict of the format:
+    {tree_id: int, address: str, distance_m: float, latitude: float, longitude: float,
+     common_name: str, scientific_name: str, urlPath: str}
+    Raises FileNotFoundError if the db doesn't exist."""
+    check_db_connection()
+    with pin_db_location():
+        nearby_trees = get_spatial_index().query(latitude, longitude, radius_m, limit)
+        species = get_species_dimension()
+
+    unknown_species = species_dimension.Species(-1, "", "0", "", "", "", "")
+    trees = []
+    for distance, (tree_id, address, species_key, tree_lat, tree_lon) in nearby_trees:
+        specie = species.get(species_key, unknown_species)
+        trees.append(
+            {
+                "tree_id": tree_id,
+                "address": address.title(),
+                "distance_m": round(distance, 1),
+                "latitude": tree_lat,
+                "longitude": tree_lon,
+                "common_name": specie.common_name,
+                "scientific_name": specie.scientific_name,
+                "urlPath": specie.urlPath,
+            }
+        )
+
+    return trees
+
+
+def _load_species_name_choices(db_location: str) -> dict:
+    """Returns {(key, qSpecies, part): name} for the full, scientific and common name of every species."""
+    return _species_name_choices(
+        get_db_cached("species_dimension", _load_species_dimension, db_location)
+    )
+
+
+def _species_name_choices(species: species_dimension.SpeciesDimension) -> dict:
+    choices = {}
+    for specie in species:
+        key, qSpecies = specie.key, specie.qSpecies
+        choices[(key, qSpecies, "qSpecies")] = qSpecies
+        choices[(key, qSpecies, "scientific_name")] = specie.scientific_name
+        if specie.common_name:
+            choices[(key, qSpecies, "common_name")] = specie.common_name
+    return choices
+
+
+def match_species_name(species_name: str, min_score: int = 85) -> tuple[int, str]:
+    """Matches a scientific or common species name to a species in the db. Returns (species_key, qSpecies).
+    Raises NoSpeciesFoundError if no species matches with a score of at least min_score."""
+    choices = get_db_cached("species_name_choices", _load_species_name_choices)
+    match = fuzz_process.extractOne(species_name, choices, score_cutoff=min_score)
+    if match is None:
+        raise NoSpeciesFoundError(f"No species matching {species_name} found")
+
+    _, _, (species_key, qSpecies, _) = match
+    return species_key, qSpecies
+
+
+def find_species(species_name: str, street: str | None = None, limit: int | None = None):
+    """Returns a generator yielding every tree of the species matching species_name (see match_species_name),
+    ordered by street name and street number. If street is given, only trees on that street are yielded.
+    Each tree is a dict of the format {tree_id: int, address: str, street_name: str, street_number: int}.
+    Raises NoSpeciesFoundError or Address.NoCloseMatchError if the species or street can't be matched."""
+    species_key, _ = match_species_name(species_name)
+
+    query = """
+        SELECT TreeID, qAddress, street_name, street_number
+        FROM addresses
+        WHERE qSpecies = ?"""
+    parameters = [species_key]
+
+    if street is not None:
+        query += " AND street_name = ?"
+        parameters.append(Address.get_street_name_for_query(street))
+
+    query += " ORDER BY street_name, street_number"
+
+    if limit is not None:
+        query += " LIMIT ?"
+        parameters.append(limit)
+
+    # the species and street are resolved here; only the rows are streamed
+    return (
+        {
+            "tree_id": tree_id,
+            "address": address.title(),
+            "street_name": street_name,
+            "street_number": street_number,
+        }
+        for tree_id, address, street_name, street_number in iterate_db(
+            query, tuple(parameters)
+        )
+    )
+
+
+def count_species_by_street(species_name: str, limit: int | None = None) -> dict:
+    """Returns {street_name: count} of the trees of the species matching species_name on each street,
+    ordered by count (highest first). Reads the species_street_counts table built with the db."""
+    species_key, _ = match_species_name(species_name)
+
+    query = """
+        SELECT street_name, count
+        FROM species_street_counts
+        WHERE qSpecies = ?
+        ORDER BY count DESC, street_name"""
+    parameters = (species_key,)
+
+    if limit is not None:
+        query += " LIMIT ?"
+        parameters += (limit,)
+
+    return dict(query_db(query, parameters=parameters))
+
+
+def get_trees_in_range(
+    street: str, start: int, end: int, parity: str | None = None
+):
+    """Returns a generator yielding every tree on the given street with a street number from start to end (inclusive),
+    ordered by street number. parity can be 'even' or 'odd' to only yield trees on one side of the street.
+    The street is resolved once and the trees are streamed from one range scan of the street number index.
+    Each tree is a dict of the format
+    {tree_id: int, address: str, street_number: int, common_name: str, scientific_name: str, urlPath: str}.
+    Raises Address.NoCloseMatchError if the street can't be matched and ValueError for an unknown parity."""
+    parities = {None: None, "even": 0, "odd": 1}
+    if parity not in parities:
+        raise ValueError(f"parity must be 'even', 'odd' or None, not {parity!r}")
+
+    street_name = Address.get_street_name_for_query(street)
+    start, end = sorted((int(start), int(end)))
+
+    query = """
+        SELECT addresses.TreeID, addresses.qAddress, addresses.street_number,
+            species.qSpecies, species.urlPath
+        FROM addresses
+        JOIN species ON species."index" = addresses.qSpecies
+        WHERE addresses.street_name = ? AND addresses.street_number BETWEEN ? AND ?"""
+    parameters = (street_name, start, end)
+
+    if parities[parity] is not None:
+        query += " AND addresses.street_number % 2 = ?"
+        parameters += (parities[parity],)
+
+    query += " ORDER BY addresses.street_number, addresses.TreeID"
+
+    return (_range_row_to_dict(row) for row in iterate_db(query, parameters))
+
+
+def _range_row_to_dict(row: tuple) -> dict:
+    tree_id, address, street_number, qSpecies, urlPath = row
+    scientific_name, common_name = species_dimension.split_species_name(qSpecies)
+    return {
+        "tree_id": tree_id,
+        "address": address.title(),
+        "street_number": street_number,
+        "common_name": common_name,
+        "scientific_name": scientific_name,
+        "urlPath": str(urlPath),
+    }
+
+
+def species_counts_to_dicts(results: list[tuple]) -> list[dict]:
+    """Converts (qSpecies, urlPath, count) rows to tree dicts of the format
+    {urlPath: str, count: int, scientific_name: str, common_name: str}."""
+    trees = []
+    for qSpecies, urlPath, count in results:
+        scientific_name, common_name = species_dimension.split_species_name(qSpecies)
+        trees.append(
+            {
+                "urlPath": str(urlPath),
+                "count": count,
+                "scientific_name": scientific_name,
+                "common_name": common_name,
+            }
+        )
+    return trees
+
+
+def get_street_species_counts(street: str, limit: int | None = None) -> list[dict]:
+    """Returns the species on the given street with their tree counts, most common first, at most limit of them.
+    Reads the materialized species_street_counts table. Each species is a dict of the format
+    {urlPath: str, count: int, scientific_name: str, common_name: str}.
+    Raises Address.NoCloseMatchError if the street can't be matched."""
+    street_name = Address.get_street_name_for_query(street)
+
+    query = """
+        SELECT species.qSpecies, species.urlPath, counts.count
+        FROM species_street_counts AS counts
+        JOIN species ON species."index" = counts.qSpecies
+        WHERE counts.street_name = ?
+        ORDER BY counts.count DESC, species.qSpecies"""
+    parameters = (street_name,)
+
+    if limit is not None:
+        query += " LIMIT ?"
+        parameters += (limit,)
+
+    return species_counts_to_dicts(query_db(query, parameters=parameters))
+
+
+def get_block_species_counts(
+    street: str, street_number: int, limit: int | None = None
+) -> list[dict]:
+    """Returns the species on the block (hundred) of street_number on the given street with their tree counts,
+    most common first, at most limit of them (i.e. street_number 1468 gives the 1400 block).
+    Reads the materialized block_species_counts table. Species are dicts as in get_street_species_counts.
+    Raises Address.NoCloseMatchError if the street can't be matched."""
+    street_name = Address.get_street_name_for_query(street)
+    block = int(street_number) // 100 * 100
+
+    query = """
+        SELECT species.qSpecies, species.urlPath, counts.count
+        FROM block_species_counts AS counts
+        JOIN species ON species."index" = counts.qSpecies
+        WHERE counts.street_name = ? AND counts.block = ?
+        ORDER BY counts.count DESC, species.qSpecies"""
+    parameters = (street_name, block)
+
+    if limit is not None:
+        query += " LIMIT ?"
+        parameters += (limit,)
+
+    return species_counts_to_dicts(query_db(query, parameters=parameters))
+
+
+def _load_street_tree_counts(db_location: str) -> dict:
+    """Returns {street_name: number of trees} from the species_street_counts table of the db.
+    Returns an empty dict if the db or table doesn't exist."""
+    if not os.path.exists(db_location):
+        return {}
+
+    con = connect_db(db_location)
+    try:
+        return dict(
+            con.execute(
+                "SELECT street_name, SUM(count) FROM species_street_counts GROUP BY street_name"
+            )
+        )
+    except sqlite3.OperationalError as err:
+        logging.warning(f"{err}: street tree counts not available.")
+        return {}
+    finally:
+        con.close()
+
+
+def get_street_tree_counts() -> dict:
+    """Returns {street_name: number of trees} for the streets in the db at DB_LOCATION."""
+    return get_db_cached("street_tree_counts", _load_street_tree_counts)
+
+
+def _load_street_trie(db_location: str) -> street_autocomplete.StreetTrie:
+    return street_autocomplete.StreetTrie(
+        Address.get_street_names(),
+        get_db_cached("street_tree_counts", _load_street_tree_counts, db_location),
+    )
+
+
+def complete_street_name(prefix: str, limit: int = 10, max_typos: int = 1) -> list[dict]:
+    """Returns up to limit street names completing the user typed prefix, for type-ahead.
+    Exact prefix matches come first, followed by matches within max_typos typos; each group is ranked
+    by the number of trees on the street. Each street is a dict of the format
+    {street_name: str, tree_count: int, typos: int}."""
+    trie = get_db_cached("street_trie", _load_street_trie)
+    normalized_prefix = street_autocomplete.normalize_prefix(prefix)
+
+    if max_typos > 0:
+        matches = trie.complete_fuzzy(normalized_prefix, limit, max_typos)
+    else:
+        matches = [(name, 0) for name in trie.complete(normalized_prefix, limit)]
+
+    tree_counts = trie.tree_counts
+    return [
+        {
+            "street_name": street_name,
+            "tree_count": tree_counts.get(street_name, 0),
+            "typos": typos,
+        }
+        for street_name, typos in matches
+    ]
+
+
+def _load_address_index(db_location: str) -> address_suggestions.AddressIndex:
+    con = connect_db(db_location)
+    try:
+        return address_suggestions.build_address_index(con)
+    finally:
+        con.close()
+
+
+def get_address_index() -> address_suggestions.AddressIndex:
+    """Returns the street numbers with trees of every street in the db at get_db_location(), built on first use."""
+    return get_db_cached("address_index", _load_address_index)
+
+
+def suggest_addresses(user_input: str, limit: int = 5) -> list[dict]:
+    """Returns up to limit existing addresses with trees closest to user_input, best first, for
+    'did you mean' answers to lookups raising Address.NoCloseMatchError or NoTreeFoundError.
+    Candidates are the streets most similar to the entered street and the nearest street numbers
+    with trees on each (see address_suggestions.AddressIndex.suggest). Each suggestion is a dict of the format
+    {address: str, street_name: str, street_number: int, score: float}.
+    Raises Address.AddressError if user_input isn't a street address."""
+    address = Address.create_standard_Address(user_input)
+    with pin_db_location():
+        check_db_connection()
+        suggestions = get_address_index().suggest(
+            int(address.street_number), address.street_name, limit
+        )
+
+    return [
+        {
+            "address": suggestion.street_address.title(),
+            "street_name": suggestion.street_name,
+            "street_number": suggestion.street_number,
+            "score": round(suggestion.score, 1),
+        }
+        for suggestion in suggestions
+    ]
+
+
+def build_snapshot(path: str | None = None) -> str:
+    """Builds the reference data snapshot of the street names, street types and the structures derived
+    from the db at DB_LOCATION and saves it at path (default snapshot.SNAPSHOT_LOCATION). Returns the path.
+    The spatial index is not included, it is only built when a coordinate lookup is made."""
+    path = path or snapshot.SNAPSHOT_LOCATION
+    source_paths = get_snapshot_source_paths()
+    if not os.path.exists(source_paths["bloom_filter"]):
+        del source_paths["bloom_filter"]
+
+    street_names = Address.load_street_names()
+    street_tree_counts = _load_street_tree_counts(DB_LOCATION)
+    values = {
+        "street_names": (street_names, ("street_names",)),
+        "street_types": (Address.load_street_type_abbreviations(), ("street_types",)),
+        "street_tree_counts": (street_tree_counts, ("db",)),
+        "street_trie": (
+            street_autocomplete.StreetTrie(street_names, street_tree_counts),
+            ("db", "street_names"),
+        ),
+    }
+
+    if "bloom_filter" in source_paths:
+        values["existence_index"] = (
+            _load_existence_index(DB_LOCATION),
+            ("db", "bloom_filter"),
+        )
+
+    if os.path.exists(DB_LOCATION):
+        species = _load_species_dimension(DB_LOCATION)
+        values["species_dimension"] = (species, ("db",))
+        values["species_name_choices"] = (_species_name_choices(species), ("db",))
+        try:
+            values["address_index"] = (
+                _load_address_index(DB_LOCATION),
+                ("db",),
+            )
+        except sqlite3.OperationalError as err:
+            logging.warning(f"{err}: address index not included in the snapshot.")
+    else:
+        del source_paths["db"]
+        for name in ("street_tree_counts", "street_trie"):
+            del values[name]
+
+    snapshot.write_snapshot(path, values, source_paths)
+    return path
+
+
 def calculate_total_trees(address_species_keys: dict) -> int:
     """Calculates the total number of trees in the address_species_keys_dict"""
     total = 0
@@ -128,102 +972,139 @@ def calculate_total_trees(address_species_keys: dict) -> int:
 
 
 def address_species_keys_to_dataframe(address_species_keys: dict) -> pd.DataFrame:
-    """Converts the address_species_keys dict to a pandas dataframe."""
-    # get total number of trees for empty df
-    total_trees = calculate_total_trees(address_species_keys)
-
-    # create an empty results dataframe with number of rows as address_keys
-    results = pd.DataFrame(
-        columns=["qSpecies", "urlPath", "queried_address"],
-        index=[i for i in range(total_trees)],
-    )
-
-    # save results to df
-    i = 0
+    """Converts the address_species_keys dict to a pandas dataframe with one row per tree of the columns
+    species_key, qSpecies, urlPath, scientific_name, common_name, display_name, url and queried_address."""
+    species = get_species_dimension()
+    rows = []
     for address, species_keys in address_species_keys.items():
+        queried_address = address.title()
         for specie_key in species_keys:
-            qSpecie, urlPath = get_species(specie_key)
-            results.loc[i] = {
-                "qSpecies": qSpecie,
-                "urlPath": urlPath,
-                "queried_address": address.title(),
-            }
-            i += 1
-
-    return results
+            specie = species[int(specie_key)]
+            rows.append(
+                (
+                    specie.key,
+                    specie.qSpecies,
+                    specie.urlPath,
+                    specie.scientific_name,
+                    specie.common_name,
+                    specie.display_name,
+                    specie.url,
+                    queried_address,
+                )
+            )
+
+    return pd.DataFrame(
+        rows,
+        columns=[
+            "species_key",
+            "qSpecies",
+            "urlPath",
+            "scientific_name",
+            "common_name",
+            "display_name",
+            "url",
+            "queried_address",
+        ],
+    )
 
 
-def main(user_input: str, check_nearby: bool = True) -> pd.DataFrame | dict:
-    """Main function that queries tree species from the given user_input. Returns a panda dataframe with the results."""
-    # create an Address object from the given user input. Raises an exception if the input is not appropriate for the DB.
+def _get_query_address(user_input: str) -> Address.Address:
+    """Returns the Address to look up for the user input (see Address.get_Address_for_query).
+    Raises AddressError or NoCloseMatchError with a message for the user and counts the failed lookup."""
     try:
-        query_address = Address.get_Address_for_query(user_input)
+        return Address.get_Address_for_query(user_input)
     except Address.NoCloseMatchError as err:
+        LOOKUPS_NO_STREET_MATCH.inc()
         raise Address.NoCloseMatchError(
             f"Address {user_input} not found in San Francisco"
         ) from err
     except Address.AddressError as err:
+        LOOKUPS_INVALID_ADDRESS.inc()
         raise Address.AddressError(
             f"Invalid address {user_input} entered, ensure proper street address is given."
         ) from err
 
+
+@metrics.timed(LOOKUP_SECONDS)
+def main(user_input: str, check_nearby: bool = True) -> pd.DataFrame | dict:
+    """Main function that queries tree species from the given user_input. Returns a panda dataframe with the results."""
+    # create an Address object from the given user input. Raises an exception if the input is not appropriate for the DB.
+    query_address = _get_query_address(user_input)
+    return _lookup_address(query_address, user_input, check_nearby)
+
+
+def _lookup_address(
+    query_address: Address.Address, user_input: str, check_nearby: bool = True
+) -> pd.DataFrame:
+    """Queries the tree species at the query address of the user input, as main does once the input is normalized.
+    Returns a panda dataframe with the results. Raises NoTreeFoundError if there are none (nearby if check_nearby)."""
     # test connection to tree database
     try:
         check_db_connection()
     except FileNotFoundError as err:
         raise err
 
-    address_species_keys = get_address_species_keys(query_address.street_address)
+    # every query of the lookup goes to the same db version, even if a new one is switched to meanwhile
+    with pin_db_location():
+        address_species_keys = get_address_species_keys(query_address.street_address)
+        lookups = LOOKUPS_EXACT
 
-    if not address_species_keys and check_nearby:
-        # if no trees at given address, will look next door (+2 or -2 street number i.e. 1470 and 1466 if given 1468)
-        logging.warning("Couldn't find trees at given address, looking nearby...")
-        address_species_keys = get_nearby_species_keys(query_address)
+        if not address_species_keys and check_nearby:
+            # if no trees at given address, will look for the nearest trees on the same side of the street
+            # (i.e. 1470 and 1466 if given 1468, or 1480 if those have none either)
+            logging.warning("Couldn't find trees at given address, looking nearby...")
+            address_species_keys = get_nearest_species_keys(query_address)
+            lookups = LOOKUPS_NEARBY
 
-    if not address_species_keys:
-        raise NoTreeFoundError(
-            f"Can't find any trees near entered street address {user_input}"
-        )
+        if not address_species_keys:
+            LOOKUPS_NOT_FOUND.inc()
+            raise NoTreeFoundError(
+                f"Can't find any trees near entered street address {user_input}"
+            )
 
-    return address_species_keys_to_dataframe(address_species_keys)
+        lookups.inc()
+        return address_species_keys_to_dataframe(address_species_keys)
 
 
 def create_output_dict(results: pd.DataFrame) -> list[dict]:
-    """Creates a formatted list of string messages from main()'s results df."""
-    queried_addresses = results.queried_address.unique()
-    tree_dict = {}
-    for address in queried_addresses:
-        grouped_results = (
-            results.loc[results.queried_address == address]
-            .groupby(["qSpecies", "urlPath"])
-            .count()
-            .reset_index()
-            .rename({"queried_address": "count"}, axis=1)
-        )
-        grouped_results[["scientific_name", "common_name"]] = (
-            grouped_results.qSpecies.str.split("::", expand=True)
-            .fillna("")
-            .apply(lambda name: name.str.strip())
-        )
+    """Creates a formatted list of string messages from main()'s results df.
+    The trees of each address are counted per species and ordered by qSpecies."""
+    species_counts = {}
+    for row in results.itertuples(index=False):
+        address_counts = species_counts.setdefault(row.queried_address, {})
+        if row.species_key in address_counts:
+            address_counts[row.species_key][1] += 1
+        else:
+            address_counts[row.species_key] = [row, 1]
 
-        grouped_results = grouped_results.drop("qSpecies", axis=1)
-        tree_dict.update({address: grouped_results.to_dict(orient="records")})
+    tree_dict = {}
+    for address, address_counts in species_counts.items():
+        tree_dict[address] = species_dimension.species_count_dicts(address_counts.values())
     return tree_dict
 
 
+@metrics.timed(LOOKUP_SECONDS)
 def get_trees(user_input: str) -> list[str]:
     """Takes a string address from a user and returns a dictionary of the format:
     {address_1: [{
                 common_name: str,
                 scientific_name: str,
                 urlPath: str,
-                count: str
+                count: str,
+                display_name: str,
+                url: str
                 },{}...]
      address_2: [{}, ...]
-     }."""
+     }.
+    Addresses with trees are answered from the answer store if the db has one (see get_stored_answer).
+    The input is normalized once for the answer store and the db lookup."""
+    query_address = _get_query_address(user_input)
+    answer = get_stored_answer(query_address)
+    if answer is not None:
+        return answer
 
     try:
-        tree_df = main(user_input)
+        tree_df = _lookup_address(query_address, user_input)
     except (Address.AddressError, NoTreeFoundError) as err:
         raise err
     except Exception as err:
@@ -231,25 +1112,204 @@ def get_trees(user_input: str) -> list[str]:
     return create_output_dict(tree_df)
 
 
-def create_message(tree: dict) -> str:
-    """Creates formatted messages for each tree."""
+def _get_trees_or_error(user_input: str) -> dict | Exception:
+    try:
+        return get_trees(user_input)
+    except Exception as err:
+        return err
+
+
+def _normalize_batch_inputs(user_inputs: list[str]) -> dict:
+    """Returns {user_input: Address} of the user inputs that normalize to a street address with a matching street.
+    Each input goes through Address.get_Address_for_query, so the batch shares its memo with single lookups
+    and each distinct street name is matched once through the street match cache."""
+    addresses = {}
+    for user_input in user_inputs:
+        try:
+            addresses[user_input] = Address.get_Address_for_query(user_input)
+        except (Address.AddressError, Address.NoCloseMatchError):
+            pass
+    return addresses
+
+
+def _street_number_ranges(street_numbers: list[int]) -> list[tuple[int, int]]:
+    """Returns the (start, end) street number ranges to scan for the sorted street numbers and their
+    nearby numbers (-2 and +2). Numbers closer than BATCH_RANGE_GAP share a range."""
+    ranges = []
+    for street_number in street_numbers:
+        if ranges and street_number - 2 - ranges[-1][1] <= BATCH_RANGE_GAP:
+            ranges[-1][1] = street_number + 2
+        else:
+            ranges.append([street_number - 2, street_number + 2])
+    return [tuple(street_number_range) for street_number_range in ranges]
+
 
-    if tree["common_name"] != "":
-        first_line = (
-            f"{tree['common_name'].title()} ({tree['scientific_name'].title()})"
+def _get_street_species_keys(street_name: str, street_numbers: list[int]) -> dict:
+    """Returns {street_number: [key1, key2, ...]} of the trees at the sorted street numbers on the street
+    and next door to them, read with range scans of the street number index."""
+    query = """
+        SELECT street_number, qSpecies
+        FROM addresses
+        WHERE street_name = ? AND street_number BETWEEN ? AND ?
+        ORDER BY street_number, TreeID"""
+    species_keys = {}
+    for start, end in _street_number_ranges(street_numbers):
+        for street_number, species_key in iterate_db(query, (street_name, start, end)):
+            species_keys.setdefault(street_number, []).append(str(species_key))
+    return species_keys
+
+
+def _lookup_street(addresses: list, entered: dict, db_location: str) -> dict:
+    """Looks up the addresses on one street (sorted by street number) as main and get_trees would.
+    entered maps each address to the user input it came from. Returns {street_address: get_trees dict or the exception raised}.
+    Observes one LOOKUP_SECONDS sample per address: its own time plus its share of the street's range scans."""
+    results = {}
+    with pin_db_location(db_location):
+        start = time.perf_counter()
+        species_keys = _get_street_species_keys(
+            addresses[0].street_name, [int(address.street_number) for address in addresses]
         )
+        scan_seconds = (time.perf_counter() - start) / len(addresses)
+        for address in addresses:
+            start = time.perf_counter()
+            try:
+                results[address.street_address] = _lookup_street_address(
+                    address, species_keys, entered
+                )
+            finally:
+                LOOKUP_SECONDS.observe(scan_seconds + time.perf_counter() - start)
+    return results
+
+
+def _lookup_street_address(address, species_keys: dict, entered: dict) -> dict | Exception:
+    """Looks up one address of _lookup_street from the species keys read for its street.
+    Returns its get_trees dict or the exception raised."""
+    street_number = int(address.street_number)
+    address_species_keys = {}
+    lookups = LOOKUPS_EXACT
+    if street_number in species_keys:
+        address_species_keys[address.street_address] = species_keys[street_number]
     else:
-        first_line = f"{tree['scientific_name'].title()}"
+        lookups = LOOKUPS_NEARBY
+        nearby_numbers = [
+            street_number + step
+            for step in (-2, 2)
+            if street_number + step in species_keys
+        ]
+        if not nearby_numbers:
+            # next door was scanned, farther trees are found in the nearest address table
+            nearby_numbers = (
+                get_nearest_street_numbers(address.street_name, street_number) or []
+            )
+        for nearby_number in nearby_numbers:
+            nearby_address = address.replace(street_number=nearby_number)
+            if nearby_number in species_keys:
+                address_species_keys[nearby_address.street_address] = species_keys[
+                    nearby_number
+                ]
+            else:
+                address_species_keys.update(
+                    get_address_species_keys(nearby_address.street_address)
+                )
+
+    if not address_species_keys:
+        LOOKUPS_NOT_FOUND.inc()
+        return NoTreeFoundError(
+            f"Can't find any trees near entered street address {entered[address]}"
+        )
+
+    lookups.inc()
+    try:
+        return create_output_dict(address_species_keys_to_dataframe(address_species_keys))
+    except Exception as err:
+        return err
+
+
+def get_trees_batch(user_inputs, max_workers: int | None = None) -> list[dict | Exception]:
+    """Looks up the trees at every address in user_inputs on a pool of max_workers threads
+    (default: ThreadPoolExecutor's default). Returns a list in the order of user_inputs holding,
+    for each address, the dict returned by get_trees or the exception it raised.
+
+    The inputs are normalized first and every distinct address is looked up once: inputs normalizing
+    to the same address share the same result. Addresses in the answer store are answered from it;
+    the other distinct addresses are sorted by street and street
+    number, and the trees at the addresses of a street (and next door to them) are read with range
+    scans walking the street number index in order, instead of one query per address and neighbour.
+    Each thread looks up whole streets. Every distinct address gets one LOOKUP_SECONDS sample, like a
+    lookup with main."""
+    user_inputs = list(user_inputs)
+    try:
+        check_db_connection()
+    except FileNotFoundError as err:
+        return [err] * len(user_inputs)
+
+    unique_inputs = list(dict.fromkeys(user_inputs))
+    addresses = _normalize_batch_inputs(unique_inputs)
+
+    # the first input of each distinct address, for error messages
+    entered = {}
+    for user_input, address in addresses.items():
+        entered.setdefault(address, user_input)
+
+    db_location = DB_LOCATION
+    store = get_db_cached("answer_store", _load_answer_store, db_location)
+    results = {}
+    streets = {}
+    for address in entered:
+        start = time.perf_counter()
+        answer = store.get(address.street_address) if store is not None else None
+        if answer is not None:
+            ANSWER_STORE_HITS.inc()
+            LOOKUPS_EXACT.inc()
+            results[address.street_address] = answer
+            LOOKUP_SECONDS.observe(time.perf_counter() - start)
+            continue
+        if store is not None:
+            ANSWER_STORE_MISSES.inc()
+        streets.setdefault(address.street_name, []).append(address)
+    for street_addresses in streets.values():
+        street_addresses.sort(key=lambda address: int(address.street_number))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        street_results = executor.map(
+            lambda street_name: _lookup_street(
+                streets[street_name], entered, db_location
+            ),
+            sorted(streets),
+        )
+        for street_result in street_results:
+            results.update(street_result)
+        # inputs that can't be normalized get the errors main raises for them
+        invalid_inputs = [user_input for user_input in unique_inputs if user_input not in addresses]
+        errors = dict(zip(invalid_inputs, executor.map(_get_trees_or_error, invalid_inputs)))
+
+    return [
+        results[addresses[user_input].street_address]
+        if user_input in addresses
+        else errors[user_input]
+        for user_input in user_inputs
+    ]
+
+
+def create_message(tree: dict) -> str:
+    """Creates formatted messages for each tree from the tree dict alone, using its display_name and url.
+    Species without a SelecTree page (urlPath 0) get no link."""
+    first_line, url = tree.get("display_name"), tree.get("url")
+    if first_line is None:
+        # tree dicts made without the display fields (i.e. by callers of older versions)
+        _, _, first_line, url = species_dimension.display_fields(
+            f"{tree['scientific_name']} :: {tree['common_name']}", tree["urlPath"]
+        )
 
     number = tree["count"]
     if number > 1:
         first_line = first_line + f": {tree['count']}"
 
-    if tree["urlPath"] != 0:
-        second_line = f"https://selectree.calpoly.edu/tree-detail/{tree['urlPath']}\n"
+    if url:
+        second_line = f"{url}\n"
         return "\n".join([first_line, second_line])
 
-    return first_line.append("\n")
+    return first_line + "\n"
 
 
 def format_messages(results: dict) -> list[str]:
@@ -0,0 +1,76 @@
+"""Bounded in-memory LRU memo for results of deterministic functions of a hashable key, i.e. the
+normalized Address of a raw user input string."""
+
+import threading
+from collections import OrderedDict
+
+_MISSING = object()
+
+
+class LRUMemo:
+    """Holds at most max_size entries and evicts the least recently used ones (max_size 0 disables it).
+    Records its hits, misses and evictions. Safe to use from multiple threads; values are computed
+    outside the lock, so two threads missing the same key at once both compute it."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Returns the value memoized for key (marking it as recently used) or default if there is none."""
+        with self._lock:
+            value = self._entries.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value) -> None:
+        """Memoizes value for key, evicting the least recently used entry if the memo is full."""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Returns the value memoized for key, computing it with compute(key) and memoizing it on a miss."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute(key)
+            self.put(key, value)
+        return value
+
+    def clear(self) -> None:
+        """Removes every entry and resets the stats."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        """Returns {hits, misses, evictions, size, max_size, hit_rate} of the memo."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key) -> bool:
+        return key in self._entries
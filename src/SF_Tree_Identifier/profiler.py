@@ -0,0 +1,164 @@
+"""Low overhead sampling profiler for lookups under production like load. A timer thread samples the
+stack of every other thread (sys._current_frames) every interval seconds, so the profiled code runs
+unmodified and threaded batches are covered. Samples are written as collapsed stacks
+('frame;frame;frame count' lines, root first) for flamegraph tools, and summarized per lookup stage.
+
+Profile a block with `with profiler.profile("batch.collapsed"): ...` or set SF_TREE_PROFILE to a path
+to profile the whole process; the collapsed stacks are written to that path at exit."""
+
+import atexit
+import logging
+import os
+import sys
+import threading
+from collections import Counter
+
+DEFAULT_INTERVAL = 0.005
+
+# (module, function) -> lookup stage; a sample belongs to the stage of its innermost matching frame
+STAGES = {
+    ("Address", "normalize_address_string"): "normalize",
+    ("Address", "create_standard_Address"): "normalize",
+    ("Address", "normalize_street_name_string"): "normalize",
+    ("Address", "match_closest_street_name"): "street_match",
+    ("identify_trees", "may_have_trees"): "existence_index",
+    ("identify_trees", "get_stored_answer"): "answer_store",
+    ("answer_store", "get"): "answer_store",
+    ("answer_store", "__contains__"): "answer_store",
+    ("identify_trees", "query_db"): "db",
+    ("identify_trees", "iterate_db"): "db",
+    ("identify_trees", "get_db_cached"): "load_reference_data",
+    ("identify_trees", "address_species_keys_to_dataframe"): "dataframe",
+    ("identify_trees", "create_output_dict"): "output",
+}
+
+# innermost frames of threads waiting for work or results, left out of the stage summary
+IDLE_FRAMES = frozenset(
+    ("threading:Condition.wait", "threading:Event.wait", "thread:_worker")
+)
+
+# the process wide profiler started from SF_TREE_PROFILE
+_env_profiler = None
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f"{module}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class SamplingProfiler:
+    """Samples the stacks of all threads except its own every interval seconds while running.
+    samples holds {collapsed stack: count}. If path is given, the collapsed stacks are written there on stop()."""
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL, path: str | None = None):
+        self.interval = interval
+        self.path = path
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> "SamplingProfiler":
+        if self._thread is not None:
+            raise RuntimeError("The profiler is already running")
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="SF_Tree_Identifier profiler", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> "SamplingProfiler":
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            if self.path is not None:
+                self.write_collapsed(self.path)
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self.sample(own_id)
+
+    def sample(self, skip_thread_id: int | None = None) -> None:
+        """Records the current stack of every thread except skip_thread_id."""
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == skip_thread_id:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame))
+                frame = frame.f_back
+            labels.reverse()
+            self.samples[";".join(labels)] += 1
+
+    def collapsed(self) -> str:
+        """Returns the samples as collapsed stacks, one 'frame;frame;frame count' line per stack."""
+        return "".join(
+            f"{stack} {count}\n" for stack, count in sorted(self.samples.items())
+        )
+
+    def write_collapsed(self, path: str) -> None:
+        with open(path, "w") as fp:
+            fp.write(self.collapsed())
+
+    def stage_summary(self) -> dict:
+        """Returns {stage: share of samples} for the lookup stages in STAGES, largest first.
+        Samples in lookups outside of any stage count as 'other'; samples outside lookups and of idle
+        threads are left out."""
+        stages = Counter()
+        for stack, count in self.samples.items():
+            if stack.rsplit(";", 1)[-1] in IDLE_FRAMES:
+                continue
+            frames = [tuple(label.split(":", 1)) for label in stack.split(";")]
+            in_lookup = False
+            stage = None
+            for module, function in frames:
+                function = function.rsplit(".", 1)[-1]
+                if module in ("identify_trees", "Address"):
+                    in_lookup = True
+                stage = STAGES.get((module, function), stage)
+            if in_lookup:
+                stages[stage or "other"] += count
+
+        total = sum(stages.values()) or 1
+        return {stage: count / total for stage, count in stages.most_common()}
+
+    def format_stage_summary(self) -> str:
+        return "\n".join(
+            f"{stage}: {share:.1%}" for stage, share in self.stage_summary().items()
+        )
+
+
+def profile(path: str | None = None, interval: float = DEFAULT_INTERVAL) -> SamplingProfiler:
+    """Returns a profiler to use as a context manager. If path is given, the collapsed stacks
+    are written there when the block exits."""
+    return SamplingProfiler(interval, path)
+
+
+def start_from_env() -> SamplingProfiler | None:
+    """Starts profiling the process if SF_TREE_PROFILE is set to a path (SF_TREE_PROFILE_INTERVAL
+    sets the interval in seconds). The collapsed stacks are written to the path at exit and the
+    stage summary is logged. Returns the profiler, or None if profiling isn't enabled."""
+    global _env_profiler
+    path = os.environ.get("SF_TREE_PROFILE")
+    if not path or _env_profiler is not None:
+        return _env_profiler
+
+    interval = float(os.environ.get("SF_TREE_PROFILE_INTERVAL", DEFAULT_INTERVAL))
+    _env_profiler = SamplingProfiler(interval, path).start()
+
+    def write():
+        _env_profiler.stop()
+        logging.info(f"lookup stages:\n{_env_profiler.format_stage_summary()}")
+
+    atexit.register(write)
+    return _env_profiler
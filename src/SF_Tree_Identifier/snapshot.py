@@ -0,0 +1,214 @@
+"""Versioned binary snapshot of the preprocessed reference data (street names, street types and the
+structures derived from SF_trees.db) so a new process can start serving without parsing and indexing.
+
+Layout: header | pickle (protocol 5) | out-of-band buffers. The header holds the format version, the
+buffer count, the pickle length and the sha256 of everything after the header, followed by the length
+of every buffer. Every snapshot value records the source files (by role, i.e. 'db') it was built from
+and is only used if those files are unchanged. The fingerprint of the db is computed when it is built and
+stored next to it (see write_file_fingerprint), so checking the snapshot doesn't read the whole db."""
+
+import hashlib
+import logging
+import os
+import pickle
+import struct
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+SNAPSHOT_LOCATION = os.environ.get(
+    "SF_TREE_SNAPSHOT", os.path.join(DATA_DIR, "reference.snapshot")
+)
+
+SNAPSHOT_MAGIC = b"SFTS"
+SNAPSHOT_VERSION = 1
+# magic, version, number of out-of-band buffers, pickle length, sha256 of everything after the header
+SNAPSHOT_HEADER = struct.Struct("<4sHIQ32s")
+BUFFER_LENGTH = struct.Struct("<Q")
+
+# files are hashed in chunks of this many bytes
+FINGERPRINT_CHUNK_SIZE = 1 << 20
+FINGERPRINT_EXTENSION = ".sha256"
+
+# None until first use, False if there is no valid snapshot
+_snapshot = None
+_fingerprints = {}
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot file is not a valid snapshot of the current version."""
+
+
+def get_fingerprint_location(path: str) -> str:
+    """Returns the path of the stored fingerprint of the file at path (SF_trees.db -> SF_trees.db.sha256)."""
+    return path + FINGERPRINT_EXTENSION
+
+
+def _hash_file(path: str) -> str:
+    # the whole file is hashed: dbs are built deterministically, so two builds with different rows
+    # can have the same size and the same SQLite header
+    digest = hashlib.sha256()
+    with open(path, "rb") as fp:
+        while chunk := fp.read(FINGERPRINT_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _read_stored_fingerprint(path: str, stat: os.stat_result) -> str | None:
+    """Returns the fingerprint stored for the file at path if it was stored for the file's current size and
+    modification time, else None."""
+    try:
+        with open(get_fingerprint_location(path)) as fp:
+            fingerprint, size, mtime_ns = fp.read().split()
+        if int(size) != stat.st_size or int(mtime_ns) != stat.st_mtime_ns:
+            return None
+    except (OSError, ValueError):
+        return None
+    return fingerprint
+
+
+def write_file_fingerprint(path: str, fingerprint_location: str | None = None) -> str:
+    """Computes the fingerprint of the file at path and stores it with the file's size and modification time
+    at fingerprint_location (default: get_fingerprint_location(path)), written atomically. The file must not be
+    modified afterwards; moving it keeps the stored fingerprint valid. Returns the fingerprint."""
+    fingerprint_location = fingerprint_location or get_fingerprint_location(path)
+    stat = os.stat(path)
+    fingerprint = _hash_file(path)
+
+    tmp_path = f"{fingerprint_location}.tmp"
+    with open(tmp_path, "w") as fp:
+        fp.write(f"{fingerprint} {stat.st_size} {stat.st_mtime_ns}\n")
+        fp.flush()
+        os.fsync(fp.fileno())
+    os.replace(tmp_path, fingerprint_location)
+    return fingerprint
+
+
+def file_fingerprint(path: str) -> str:
+    """Returns a fingerprint of the file at path that changes when its content changes: the sha256 of the whole file.
+    The fingerprint stored by write_file_fingerprint is used if the file's size and modification time are
+    unchanged since, otherwise the file is hashed. Fingerprints are cached per path, size and modification
+    time for the lifetime of the process."""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    try:
+        return _fingerprints[key]
+    except KeyError:
+        pass
+
+    fingerprint = _read_stored_fingerprint(path, stat) or _hash_file(path)
+    _fingerprints[key] = fingerprint
+    return fingerprint
+
+
+def write_snapshot(path: str, values: dict, source_paths: dict) -> None:
+    """Writes a snapshot of values ({name: (value, source roles)}) to path. source_paths maps every source
+    role used by the values to the file it was built from. The file is written atomically."""
+    sources = {role: file_fingerprint(source) for role, source in source_paths.items()}
+    buffers = []
+    payload = pickle.dumps(
+        {"values": values, "sources": sources},
+        protocol=5,
+        buffer_callback=buffers.append,
+    )
+    raw_buffers = [buffer.raw() for buffer in buffers]
+
+    body = [payload]
+    body.extend(raw_buffers)
+    digest = hashlib.sha256()
+    for raw_buffer in raw_buffers:
+        digest.update(BUFFER_LENGTH.pack(raw_buffer.nbytes))
+    for part in body:
+        digest.update(part)
+
+    header = SNAPSHOT_HEADER.pack(
+        SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(buffers), len(payload), digest.digest()
+    )
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as fp:
+        fp.write(header)
+        for raw_buffer in raw_buffers:
+            fp.write(BUFFER_LENGTH.pack(raw_buffer.nbytes))
+        for part in body:
+            fp.write(part)
+        fp.flush()
+        os.fsync(fp.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(path: str) -> dict:
+    """Reads and validates the snapshot at path. Returns {'values': ..., 'sources': ...}.
+    Raises FileNotFoundError if there is no snapshot and SnapshotError if it is invalid."""
+    with open(path, "rb") as fp:
+        data = memoryview(fp.read())
+
+    if len(data) < SNAPSHOT_HEADER.size:
+        raise SnapshotError(f"{path} is too short to be a snapshot")
+
+    magic, version, num_buffers, payload_length, checksum = (
+        SNAPSHOT_HEADER.unpack_from(data)
+    )
+    if magic != SNAPSHOT_MAGIC:
+        raise SnapshotError(f"{path} is not a snapshot")
+    if version != SNAPSHOT_VERSION:
+        raise SnapshotError(
+            f"{path} is a version {version} snapshot, version {SNAPSHOT_VERSION} is required"
+        )
+    if hashlib.sha256(data[SNAPSHOT_HEADER.size :]).digest() != checksum:
+        raise SnapshotError(f"{path} failed its checksum")
+
+    offset = SNAPSHOT_HEADER.size
+    buffer_lengths = []
+    for _ in range(num_buffers):
+        buffer_lengths.append(BUFFER_LENGTH.unpack_from(data, offset)[0])
+        offset += BUFFER_LENGTH.size
+
+    payload = data[offset : offset + payload_length]
+    offset += payload_length
+    buffers = []
+    for buffer_length in buffer_lengths:
+        buffers.append(data[offset : offset + buffer_length])
+        offset += buffer_length
+
+    return pickle.loads(payload, buffers=buffers)
+
+
+def get_snapshot() -> dict | None:
+    """Returns the snapshot at SNAPSHOT_LOCATION, loading it on first use.
+    Returns None if there is no valid snapshot."""
+    global _snapshot
+    if _snapshot is None:
+        _snapshot = False
+        try:
+            _snapshot = read_snapshot(SNAPSHOT_LOCATION)
+        except FileNotFoundError:
+            pass
+        except (SnapshotError, pickle.UnpicklingError, EOFError) as err:
+            logging.warning(f"{err}: reference data snapshot not used.")
+
+    return None if _snapshot is False else _snapshot
+
+
+def get_value(name: str, source_paths: dict):
+    """Returns the snapshot value called name if it was built from the files in source_paths ({role: path})
+    as they are now. Raises KeyError if the snapshot doesn't exist, doesn't hold the value or is stale."""
+    snapshot = get_snapshot()
+    if snapshot is None:
+        raise KeyError(name)
+
+    value, roles = snapshot["values"][name]
+    for role in roles:
+        try:
+            if file_fingerprint(source_paths[role]) != snapshot["sources"][role]:
+                raise KeyError(name)
+        except OSError:
+            raise KeyError(name)
+
+    return value
+
+
+def clear() -> None:
+    """Forgets the loaded snapshot and file fingerprints so they are read again on next use."""
+    global _snapshot
+    _snapshot = None
+    _fingerprints.clear()
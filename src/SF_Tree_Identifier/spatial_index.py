@@ -0,0 +1,168 @@
+"""Grid based spatial index over the tree coordinates in SF_trees.db for radius and k-nearest
+queries. Distances use an equirectangular projection, which is accurate to well under a meter
+over the distances the index is queried for within San Francisco."""
+
+import heapq
+import math
+import sqlite3
+from array import array
+
+EARTH_RADIUS_M = 6_371_008.8
+METERS_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180
+# latitude used for the longitude scale of the projection (center of San Francisco)
+REFERENCE_LATITUDE = 37.76
+
+
+class SpatialIndex:
+    """Buckets trees into square grid cells of cell_size_m meters. Each tree is stored as a
+    (tree_id, qAddress, species_key, latitude, longitude) record; query() returns
+    (distance_m, record) tuples sorted by distance."""
+
+    __slots__ = (
+        "cell_size_m",
+        "meters_per_degree_lon",
+        "tree_ids",
+        "addresses",
+        "species_keys",
+        "latitudes",
+        "longitudes",
+        "cells",
+        "bounds",
+    )
+
+    def __init__(self, trees, cell_size_m: float = 100.0):
+        self.cell_size_m = cell_size_m
+        self.meters_per_degree_lon = METERS_PER_DEGREE * math.cos(
+            math.radians(REFERENCE_LATITUDE)
+        )
+        self.tree_ids = array("q")
+        self.addresses = []
+        self.species_keys = array("q")
+        self.latitudes = array("d")
+        self.longitudes = array("d")
+        self.cells = {}
+
+        for i, (tree_id, address, species_key, latitude, longitude) in enumerate(trees):
+            self.tree_ids.append(tree_id)
+            self.addresses.append(address)
+            self.species_keys.append(species_key)
+            self.latitudes.append(latitude)
+            self.longitudes.append(longitude)
+            self.cells.setdefault(self._cell(latitude, longitude), []).append(i)
+
+        # (min x, max x, min y, max y) of the occupied cells
+        if self.cells:
+            xs = [cell[0] for cell in self.cells]
+            ys = [cell[1] for cell in self.cells]
+            self.bounds = (min(xs), max(xs), min(ys), max(ys))
+        else:
+            self.bounds = None
+
+    def __len__(self):
+        return len(self.tree_ids)
+
+    def _cell(self, latitude: float, longitude: float) -> tuple[int, int]:
+        return (
+            math.floor(longitude * self.meters_per_degree_lon / self.cell_size_m),
+            math.floor(latitude * METERS_PER_DEGREE / self.cell_size_m),
+        )
+
+    def _record(self, i: int) -> tuple:
+        return (
+            self.tree_ids[i],
+            self.addresses[i],
+            self.species_keys[i],
+            self.latitudes[i],
+            self.longitudes[i],
+        )
+
+    def _max_ring(self, center: tuple[int, int]) -> int:
+        """Returns the number of rings around center needed to cover every occupied cell."""
+        if self.bounds is None:
+            return 0
+        min_x, max_x, min_y, max_y = self.bounds
+        cx, cy = center
+        return max(abs(cx - min_x), abs(cx - max_x), abs(cy - min_y), abs(cy - max_y))
+
+    def _ring_cells(self, center: tuple[int, int], ring: int):
+        """Yields the cells exactly ring cells away (chebyshev distance) from center."""
+        cx, cy = center
+        if ring == 0:
+            yield center
+            return
+        for x in range(cx - ring, cx + ring + 1):
+            yield x, cy - ring
+            yield x, cy + ring
+        for y in range(cy - ring + 1, cy + ring):
+            yield cx - ring, y
+            yield cx + ring, y
+
+    def _ring_distances(self, latitude: float, longitude: float, center, ring: int):
+        """Yields (distance_m, i) for every tree in the given ring of cells around center."""
+        x = longitude * self.meters_per_degree_lon
+        y = latitude * METERS_PER_DEGREE
+        latitudes, longitudes = self.latitudes, self.longitudes
+        meters_per_degree_lon = self.meters_per_degree_lon
+        cells = self.cells
+        for cell in self._ring_cells(center, ring):
+            for i in cells.get(cell, ()):
+                dx = longitudes[i] * meters_per_degree_lon - x
+                dy = latitudes[i] * METERS_PER_DEGREE - y
+                yield math.sqrt(dx * dx + dy * dy), i
+
+    def query(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_m: float | None = None,
+        limit: int | None = None,
+    ) -> list[tuple[float, tuple]]:
+        """Returns (distance_m, record) for the trees within radius_m of the point, nearest first,
+        at most limit of them. With no radius, returns the limit nearest trees (k-nearest).
+        Raises ValueError if neither radius_m nor limit is given."""
+        if radius_m is None and limit is None:
+            raise ValueError("Either radius_m or limit must be given")
+        if limit is not None and limit <= 0:
+            return []
+
+        center = self._cell(latitude, longitude)
+        max_ring = self._max_ring(center)
+        if radius_m is not None:
+            max_ring = min(math.ceil(radius_m / self.cell_size_m), max_ring)
+
+        # max heap (negated distances) of the best limit candidates if a limit is given
+        found = []
+        for ring in range(max_ring + 1):
+            for distance, i in self._ring_distances(latitude, longitude, center, ring):
+                if radius_m is not None and distance > radius_m:
+                    continue
+                if limit is None:
+                    found.append((-distance, i))
+                elif len(found) < limit:
+                    heapq.heappush(found, (-distance, i))
+                elif distance < -found[0][0]:
+                    heapq.heapreplace(found, (-distance, i))
+
+            # any tree outside the scanned rings is at least ring cells away
+            if limit is not None and len(found) == limit:
+                if -found[0][0] <= ring * self.cell_size_m:
+                    break
+
+        found.sort(reverse=True)
+        return [(-distance, self._record(i)) for distance, i in found]
+
+
+def load_trees(con: sqlite3.Connection) -> list[tuple]:
+    """Returns (TreeID, qAddress, qSpecies, Latitude, Longitude) for every tree with coordinates in the db connected to."""
+    return con.execute(
+        """
+        SELECT TreeID, qAddress, qSpecies, Latitude, Longitude
+        FROM addresses
+        WHERE Latitude IS NOT NULL AND Longitude IS NOT NULL"""
+    ).fetchall()
+
+
+def build_spatial_index(con: sqlite3.Connection, cell_size_m: float = 100.0) -> SpatialIndex:
+    """Builds the spatial index of every tree with coordinates in the db connected to.
+    Raises sqlite3.OperationalError if the db was built without coordinates."""
+    return SpatialIndex(load_trees(con), cell_size_m)
@@ -0,0 +1,114 @@
+"""The species table of SF_trees.db held in memory. The species table is small and every tree in a result
+refers to it, so it is loaded once and a tree's species is found by indexing a list with its species key.
+The names and the display strings shown to users are derived once per species, at db build time
+(see dev/db_creation/make_tree_table.py) or, for dbs built without them, when the table is loaded."""
+
+import sqlite3
+from typing import NamedTuple
+
+SELECTREE_URL = "https://selectree.calpoly.edu/tree-detail/{}"
+# the display columns of the species table, in the order of display_fields
+DISPLAY_COLUMNS = ("scientific_name", "common_name", "display_name", "url")
+
+
+class Species(NamedTuple):
+    key: int
+    qSpecies: str
+    urlPath: str
+    scientific_name: str
+    common_name: str
+    display_name: str
+    url: str
+
+
+def split_species_name(qSpecies: str) -> tuple[str, str]:
+    """Splits a qSpecies string ('Scientific name :: Common name') into (scientific_name, common_name)."""
+    scientific_name, _, common_name = qSpecies.partition("::")
+    return scientific_name.strip(), common_name.strip()
+
+
+def display_fields(qSpecies: str, urlPath) -> tuple[str, str, str, str]:
+    """Returns (scientific_name, common_name, display_name, url) of a species. display_name is the title-cased
+    'Common Name (Scientific Name)', or the scientific name if there is no common name. url is the SelecTree
+    page of the species, or '' if it has none (urlPath 0)."""
+    scientific_name, common_name = split_species_name(qSpecies)
+    if common_name:
+        display_name = f"{common_name.title()} ({scientific_name.title()})"
+    else:
+        display_name = scientific_name.title()
+    url = SELECTREE_URL.format(urlPath) if int(urlPath) else ""
+    return scientific_name, common_name, display_name, url
+
+
+def species_count_dicts(species_counts) -> list[dict]:
+    """Returns the trees of an address as shown by get_trees,
+    [{urlPath, count, scientific_name, common_name, display_name, url}, ...] ordered by qSpecies,
+    from (species, count) pairs. species can be any objects with the Species fields."""
+    return [
+        {
+            "urlPath": specie.urlPath,
+            "count": count,
+            "scientific_name": specie.scientific_name,
+            "common_name": specie.common_name,
+            "display_name": specie.display_name,
+            "url": specie.url,
+        }
+        for specie, count in sorted(
+            species_counts, key=lambda item: (item[0].qSpecies, item[0].urlPath)
+        )
+    ]
+
+
+class SpeciesDimension:
+    """Every species of the db, indexed by species key. dimension[key] returns the Species of the key
+    and raises KeyError for an unknown key."""
+
+    __slots__ = ("species",)
+
+    def __init__(self, species):
+        species = list(species)
+        self.species = [None] * (max((specie.key for specie in species), default=-1) + 1)
+        for specie in species:
+            self.species[specie.key] = specie
+
+    @classmethod
+    def from_rows(cls, rows) -> "SpeciesDimension":
+        """Creates the dimension from (index, qSpecies, urlPath) rows of the species table, or
+        (index, qSpecies, urlPath, *DISPLAY_COLUMNS) rows of dbs built with the display columns."""
+        species = []
+        for key, qSpecies, urlPath, *fields in rows:
+            if not fields:
+                fields = display_fields(qSpecies, urlPath)
+            species.append(Species(key, qSpecies, str(urlPath), *fields))
+        return cls(species)
+
+    @classmethod
+    def from_db(cls, con: sqlite3.Connection) -> "SpeciesDimension":
+        """Loads the species table of the db connected to. The display columns are derived here for dbs built without them."""
+        columns = ", ".join(DISPLAY_COLUMNS)
+        try:
+            rows = con.execute(f'SELECT "index", qSpecies, urlPath, {columns} FROM species').fetchall()
+        except sqlite3.OperationalError:
+            rows = con.execute('SELECT "index", qSpecies, urlPath FROM species').fetchall()
+        return cls.from_rows(rows)
+
+    def __getitem__(self, key: int) -> Species:
+        try:
+            specie = self.species[key] if key >= 0 else None
+        except IndexError:
+            specie = None
+        if specie is None:
+            raise KeyError(key)
+        return specie
+
+    def get(self, key: int, default=None) -> Species | None:
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __iter__(self):
+        return (specie for specie in self.species if specie is not None)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
@@ -0,0 +1,142 @@
+"""Prefix index over the street names for type-ahead. Completions are ranked by the number of trees
+on each street and prefix queries can tolerate a bounded number of typos."""
+
+from SF_Tree_Identifier import Address
+
+
+class _TrieNode:
+    __slots__ = ("children", "street_name", "top")
+
+    def __init__(self):
+        self.children = {}
+        # full street name if a street name ends at this node
+        self.street_name = None
+        # best ranked street names below this node, best first
+        self.top = ()
+
+
+class StreetTrie:
+    """Trie of street names. Every node keeps its top_k best ranked completions (most trees first,
+    then alphabetical), so an exact prefix query only walks the prefix."""
+
+    def __init__(self, street_names, tree_counts: dict | None = None, top_k: int = 10):
+        self.tree_counts = tree_counts or {}
+        self.top_k = top_k
+        self.root = _TrieNode()
+
+        for street_name in street_names:
+            node = self.root
+            for char in street_name:
+                node = node.children.setdefault(char, _TrieNode())
+            node.street_name = street_name
+
+        self._set_top(self.root)
+
+    def _rank(self, street_name: str) -> tuple:
+        return -self.tree_counts.get(street_name, 0), street_name
+
+    def _set_top(self, root: _TrieNode) -> None:
+        """Sets the top completions of every node, children before parents (iteratively, names can be long)."""
+        stack = [(root, False)]
+        while stack:
+            node, children_done = stack.pop()
+            if not children_done:
+                stack.append((node, True))
+                stack.extend((child, False) for child in node.children.values())
+                continue
+
+            candidates = [name for child in node.children.values() for name in child.top]
+            if node.street_name is not None:
+                candidates.append(node.street_name)
+            node.top = tuple(sorted(candidates, key=self._rank)[: self.top_k])
+
+    def _completions(self, node: _TrieNode, limit: int) -> list[str]:
+        """Returns the limit best completions below node."""
+        if limit <= self.top_k:
+            return list(node.top[:limit])
+
+        names = []
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if current.street_name is not None:
+                names.append(current.street_name)
+            stack.extend(current.children.values())
+        return sorted(names, key=self._rank)[:limit]
+
+    def complete(self, prefix: str, limit: int = 10) -> list[str]:
+        """Returns up to limit street names starting with prefix, most trees first."""
+        node = self.root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return self._completions(node, limit)
+
+    def complete_fuzzy(
+        self, prefix: str, limit: int = 10, max_typos: int = 1
+    ) -> list[tuple[str, int]]:
+        """Returns up to limit (street_name, typos) pairs for street names starting with a string
+        within max_typos edits (levenshtein distance) of prefix, fewest typos first, then most trees."""
+        exact = self.complete(prefix, limit)
+        if len(exact) == limit or max_typos <= 0:
+            return [(street_name, 0) for street_name in exact]
+
+        # typos of each node whose path is within max_typos of the prefix
+        matched = {}
+        too_many = max_typos + 1
+        length = len(prefix)
+        # only the cells within max_typos of the diagonal of the edit distance table can be <= max_typos
+        stack = [(self.root, 0, list(range(length + 1)))]
+
+        while stack:
+            node, depth, row = stack.pop()
+            if row[length] <= max_typos:
+                matched[node] = row[length]
+
+            depth += 1
+            first = max(1, depth - max_typos)
+            last = min(length, depth + max_typos)
+            children = node.children
+            if min(row) >= max_typos:
+                # no typos left: only children matching a prefix character in the band can stay in budget
+                children = {
+                    char: children[char]
+                    for char in set(prefix[first - 1 : last])
+                    if char in children
+                }
+            for char, child in children.items():
+                child_row = [too_many] * (length + 1)
+                child_row[0] = depth if depth <= max_typos else too_many
+                best = child_row[0]
+                for i in range(first, last + 1):
+                    cost = min(
+                        child_row[i - 1] + 1,
+                        row[i] + 1,
+                        row[i - 1] + (prefix[i - 1] != char),
+                    )
+                    child_row[i] = cost if cost < too_many else too_many
+                    if cost < best:
+                        best = cost
+                if best <= max_typos:
+                    stack.append((child, depth, child_row))
+
+        typos = {street_name: 0 for street_name in exact}
+        for node, distance in matched.items():
+            for street_name in self._completions(node, limit):
+                if distance < typos.get(street_name, too_many):
+                    typos[street_name] = distance
+
+        ranked = sorted(typos, key=lambda name: (typos[name], *self._rank(name)))
+        return [(street_name, typos[street_name]) for street_name in ranked[:limit]]
+
+
+def normalize_prefix(prefix: str) -> str:
+    """Lower cases the prefix, removes punctuation (except '-') and collapses whitespace.
+    Trailing whitespace is kept as a single space so 'main ' doesn't complete to 'mainsail'."""
+    prefix_string = prefix.lower().translate(Address.ADDRESS_PUNCTUATION_TABLE)
+    tokens = prefix_string.replace(",", " ").split()
+    normalized = " ".join(tokens)
+    if normalized and prefix[-1:].isspace():
+        normalized += " "
+    return normalized
@@ -0,0 +1,159 @@
+"""Persistent cache of fuzzy street name resolutions (raw street name -> closest street name and score),
+stored in a small SQLite file so they survive restarts and are shared between processes."""
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+
+# hits are recorded in memory and their last_used times written in one transaction every this many hits
+# (and before evicting), so reads don't take the write lock of a file shared between processes
+TOUCH_BATCH_SIZE = 100
+
+
+class StreetMatchCache:
+    """SQLite backed LRU cache of fuzzy street name matches. Holds at most max_size entries and evicts the
+    least recently used ones. The cache is cleared when the street names file at street_names_path changes.
+    Safe to use from multiple threads and processes. Errors of the cache file (i.e. locked by another process
+    for longer than the timeout) are logged and treated as misses, so they never fail a lookup."""
+
+    def __init__(
+        self, path: str, street_names_path: str, max_size: int = 10_000, timeout: float = 5.0
+    ):
+        self.path = path
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        # {street_name: last_used} of hits not written yet
+        self._touched = {}
+        # rows in the cache as far as this process knows, None if it has to be counted; recounted after
+        # every TOUCH_BATCH_SIZE hits to pick up the rows other processes added
+        self._size = None
+        self._con = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+
+        try:
+            self._con.execute("PRAGMA journal_mode=WAL")
+            # losing the last few writes in a crash only costs a fuzzy match
+            self._con.execute("PRAGMA synchronous=OFF")
+            with self._con:
+                self._con.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS "matches" (
+                    "street_name" TEXT PRIMARY KEY,
+                    "closest_match" TEXT NOT NULL,
+                    "score" INTEGER NOT NULL,
+                    "last_used" INTEGER NOT NULL
+                    )"""
+                )
+                self._con.execute(
+                    'CREATE INDEX IF NOT EXISTS "last_used_index" ON "matches" ("last_used")'
+                )
+                self._con.execute(
+                    'CREATE TABLE IF NOT EXISTS "meta" ("key" TEXT PRIMARY KEY, "value" TEXT)'
+                )
+            self._check_street_names(street_names_path)
+        except sqlite3.Error:
+            self._con.close()
+            raise
+
+    def _check_street_names(self, street_names_path: str) -> None:
+        """Clears the cache if it was filled with a different street names file."""
+        with open(street_names_path, "rb") as fp:
+            fingerprint = hashlib.sha256(fp.read()).hexdigest()
+
+        with self._lock, self._con:
+            result = self._con.execute(
+                "SELECT value FROM meta WHERE key = 'street_names_sha256'"
+            ).fetchone()
+            if result is not None and result[0] == fingerprint:
+                return
+
+            if result is not None:
+                logging.info("street names changed, clearing the street match cache")
+            self._con.execute("DELETE FROM matches")
+            self._con.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('street_names_sha256', ?)",
+                (fingerprint,),
+            )
+
+    def get(self, street_name: str) -> tuple[str, int] | None:
+        """Returns (closest_match, score) for the street name or None if it isn't cached or can't be read."""
+        try:
+            with self._lock:
+                result = self._con.execute(
+                    "SELECT closest_match, score FROM matches WHERE street_name = ?",
+                    (street_name,),
+                ).fetchone()
+                if result is not None:
+                    self._touched[street_name] = time.time_ns()
+                    if len(self._touched) >= TOUCH_BATCH_SIZE:
+                        self._write_touched()
+                        self._size = None
+        except sqlite3.Error as err:
+            logging.warning(f"{err}: street match cache not read.")
+            return None
+        return result
+
+    def _write_touched(self) -> None:
+        """Writes the last_used times of the recorded hits. Called with the lock held."""
+        touched = [(last_used, street_name) for street_name, last_used in self._touched.items()]
+        self._touched.clear()
+        try:
+            with self._con:
+                self._con.executemany(
+                    "UPDATE matches SET last_used = ? WHERE street_name = ?", touched
+                )
+        except sqlite3.Error as err:
+            # the hits only order the evictions
+            logging.warning(f"{err}: street match cache hits not recorded.")
+
+    def put(self, street_name: str, closest_match: str, score: int) -> None:
+        """Caches the match of the street name, evicting the least recently used entries if the cache is full.
+        The match is dropped if the cache can't be written."""
+        try:
+            with self._lock:
+                if self._size is None:
+                    self._size = self._con.execute("SELECT COUNT(*) FROM matches").fetchone()[0]
+                with self._con:
+                    inserted = self._con.execute(
+                        "INSERT OR IGNORE INTO matches VALUES (?, ?, ?, ?)",
+                        (street_name, closest_match, score, time.time_ns()),
+                    ).rowcount
+                    if not inserted:
+                        self._con.execute(
+                            "UPDATE matches SET closest_match = ?, score = ?, last_used = ? WHERE street_name = ?",
+                            (closest_match, score, time.time_ns(), street_name),
+                        )
+                self._size += inserted
+
+                excess = self._size - self.max_size
+                if excess > 0:
+                    # the hits decide what is least recently used
+                    self._write_touched()
+                    with self._con:
+                        self._size -= self._con.execute(
+                            """
+                            DELETE FROM matches WHERE street_name IN (
+                            SELECT street_name FROM matches ORDER BY last_used LIMIT ?
+                            )""",
+                            (excess,),
+                        ).rowcount
+        except sqlite3.Error as err:
+            self._size = None
+            logging.warning(f"{err}: street match not cached.")
+
+    def clear(self) -> None:
+        with self._lock, self._con:
+            self._con.execute("DELETE FROM matches")
+            self._touched.clear()
+            self._size = None
+
+    def __len__(self):
+        with self._lock:
+            return self._con.execute("SELECT COUNT(*) FROM matches").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._touched:
+                self._write_touched()
+            self._con.close()
@@ -14,6 +14,7 @@ try:
 except ValueError:  # Already removed
     pass
 from SF_Tree_Identifier import Address
+from helpers import setUpModule, tearDownModule
 
 logging.basicConfig(level=logging.ERROR)
 
@@ -51,6 +52,51 @@ class NewAddressTestCase(unittest.TestCase):
     def test_street_address(self):
         self.assertTrue(self.address.street_address == "123 Street St")
 
+    def test_len(self):
+        self.assertTrue(len(Address.Address("123 Cesar Chavez St")) == 4)
+
+    def test_set_street_name(self):
+        self.address.street_name = "Other Ave"
+        self.assertTrue(self.address.street_type == "Ave")
+        self.assertTrue(self.address.street_address == "123 Other Ave")
+
+
+class AddressValueTestCase(unittest.TestCase):
+    def test_equal_and_hash(self):
+        address = Address.Address("123 Street St")
+        other_address = Address.Address("123 Street St", frozen=True)
+        self.assertTrue(address == other_address)
+        self.assertTrue(len({address, other_address}) == 1)
+
+    def test_replace_street_number(self):
+        address = Address.Address("123 Street St", frozen=True)
+        new_address = address.replace(street_number=125)
+        self.assertTrue(new_address.street_address == "125 Street St")
+        self.assertTrue(address.street_address == "123 Street St")
+        self.assertTrue(new_address.frozen)
+
+    def test_replace_street_name(self):
+        address = Address.Address("123 Street St")
+        new_address = address.replace(street_name="Other Ave")
+        self.assertTrue(new_address.street_type == "Ave")
+
+    def test_frozen_immutable(self):
+        address = Address.Address("123 Street St", frozen=True)
+        with self.assertRaises(AttributeError):
+            address.street_number = "125"
+
+    def test_no_instance_dict(self):
+        with self.assertRaises(AttributeError):
+            Address.Address("123 Street St").other = 1
+
+    def test_match_returns_new_address(self):
+        address = Address.Address("1468 vaelncia st")
+        closest_match = Address.match_closest_street_name(
+            address, Address.load_street_names()
+        )
+        self.assertTrue(closest_match.street_name == "valencia st")
+        self.assertTrue(address.street_name == "vaelncia st")
+
 
 class StandardAddressTestCase(unittest.TestCase):
     def test_street_to_st(self):
@@ -114,6 +160,33 @@ class StandardAddressTestCase(unittest.TestCase):
         self.assertTrue(address.street_address == "123 example-example st")
 
 
+class NormalizeAddressStringTestCase(unittest.TestCase):
+    def test_city_state_zip(self):
+        user_input = "123. Example-Example Street, San Francisco, CA 94110"
+        normalized = Address.normalize_address_string(user_input)
+        self.assertTrue(normalized == "123 example-example st")
+
+    def test_city_no_comma(self):
+        normalized = Address.normalize_address_string("272 Capp Street San Francisco")
+        self.assertTrue(normalized == "272 capp st")
+
+    def test_state_zip_no_city(self):
+        normalized = Address.normalize_address_string("272 Capp St CA 94110")
+        self.assertTrue(normalized == "272 capp st")
+
+    def test_random_comma(self):
+        normalized = Address.normalize_address_string("123 Example, St")
+        self.assertTrue(normalized == "123 example st")
+
+    def test_extra_whitespace(self):
+        normalized = Address.normalize_address_string("  123  Example   Avenue ")
+        self.assertTrue(normalized == "123 example ave")
+
+    def test_only_street_type_abbreviated(self):
+        normalized = Address.normalize_address_string("123 Streetview Street")
+        self.assertTrue(normalized == "123 streetview st")
+
+
 class StreetMatchingTestCase(unittest.TestCase):
     def setUp(self) -> None:
         self.street_list = Address.load_street_names()
@@ -156,5 +229,41 @@ class GetAddressForQueryTestCase(unittest.TestCase):
         self.assertTrue(query_address.street_address == "272 capp st")
 
 
+    def test_leading_zeros(self):
+        query_address = Address.get_Address_for_query("0167 Valencia St")
+        self.assertTrue(query_address.street_address == "167 valencia st")
+
+
+class AddressMemoTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        Address.clear_address_memo()
+
+    def tearDown(self) -> None:
+        Address.clear_address_memo()
+
+    def test_repeated_input_memoized(self):
+        user_input = "1468 Valencia Street, San Francisco"
+        first = Address.get_Address_for_query(user_input)
+        second = Address.get_Address_for_query(user_input)
+        self.assertTrue(first is second)
+        stats = Address.address_memo_stats()
+        self.assertTrue(stats["hits"] == 1 and stats["misses"] == 1)
+
+    def test_memoized_address_frozen(self):
+        query_address = Address.get_Address_for_query("272 Capp St")
+        with self.assertRaises(Exception):
+            query_address.street_number = 1
+
+    def test_memoized_error(self):
+        user_input = "1468 Example Street, San Francisco"
+        with self.assertRaises(Address.NoCloseMatchError) as first:
+            Address.get_Address_for_query(user_input)
+        with self.assertRaises(Address.NoCloseMatchError) as second:
+            Address.get_Address_for_query(user_input)
+        self.assertTrue(first.exception is not second.exception)
+        self.assertTrue(first.exception.args == second.exception.args)
+        self.assertTrue(Address.address_memo_stats()["hits"] == 1)
+
+
 if __name__ == "__main__":
     unittest.main()
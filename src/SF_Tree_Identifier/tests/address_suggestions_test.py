@@ -0,0 +1,63 @@
+import os
+import sys
+import unittest
+from pathlib import Path  # if you haven't already done so
+
+file = Path(os.path.dirname(__file__)).resolve()
+parent, root = file.parent, file.parents[1]
+sys.path.append(str(root))
+
+# Additionally remove the current file's directory from sys.path
+try:
+    sys.path.remove(str(parent))
+except ValueError:  # Already removed
+    pass
+from SF_Tree_Identifier import address_suggestions
+
+# (street_name, street_number) sorted as read from the street_number_index
+STREET_ADDRESSES = [
+    ("19th st", 1202),
+    ("19th st", 1206),
+    ("brotherhood way", 900),
+    ("valencia st", 1402),
+    ("valencia st", 1415),
+    ("valencia st", 1470),
+    ("valencia st", 1480),
+    ("valencia st", 1480),
+]
+
+
+class AddressIndexTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.index = address_suggestions.AddressIndex(STREET_ADDRESSES)
+
+    def test_duplicates_collapsed(self):
+        self.assertTrue(len(self.index) == 7)
+        self.assertTrue(list(self.index.numbers["valencia st"]) == [1402, 1415, 1470, 1480])
+
+    def test_nearest_numbers(self):
+        self.assertTrue(
+            self.index.nearest_numbers("valencia st", 1466, 3) == [1470, 1480, 1415]
+        )
+        self.assertTrue(self.index.nearest_numbers("valencia st", 2000, 2) == [1480, 1470])
+        self.assertTrue(self.index.nearest_numbers("market st", 1, 2) == [])
+
+    def test_suggest_nearest_number(self):
+        suggestions = self.index.suggest(1466, "valencia st", limit=2)
+        self.assertTrue(
+            [suggestion.street_address for suggestion in suggestions]
+            == ["1470 valencia st", "1480 valencia st"]
+        )
+        self.assertTrue(suggestions[0].score == 98)
+
+    def test_suggest_misspelled_street(self):
+        suggestions = self.index.suggest(900, "brotherhod way", limit=1)
+        self.assertTrue(suggestions[0].street_address == "900 brotherhood way")
+        self.assertTrue(suggestions[0].number_distance == 0)
+
+    def test_no_similar_street(self):
+        self.assertTrue(self.index.suggest(5, "qwxyz ave") == [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path  # if you haven't already done so
+
+file = Path(os.path.dirname(__file__)).resolve()
+parent, root = file.parent, file.parents[1]
+sys.path.append(str(root))
+
+# Additionally remove the current file's directory from sys.path
+try:
+    sys.path.remove(str(parent))
+except ValueError:  # Already removed
+    pass
+from SF_Tree_Identifier import answer_store
+
+ANSWERS = {
+    "1470 valencia st": {"1470 Valencia St": [{"urlPath": "1425", "count": 1}]},
+    "1202 19th st": {"1202 19Th St": [{"urlPath": "605", "count": 2}]},
+    "900 brotherhood way": {"900 Brotherhood Way": []},
+}
+
+
+class AnswerStoreTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "SF_trees.answers")
+        answer_store.write_answer_store(self.path, ANSWERS.items())
+        self.store = answer_store.AnswerStore.load(self.path)
+
+    def tearDown(self) -> None:
+        del self.store
+        self.tmp_dir.cleanup()
+
+    def test_get(self):
+        for street_address, answer in ANSWERS.items():
+            self.assertTrue(self.store.get(street_address) == answer)
+        self.assertTrue(len(self.store) == 3)
+
+    def test_missing_address(self):
+        self.assertTrue(self.store.get("1468 valencia st") is None)
+        self.assertFalse("1 a st" in self.store)
+        self.assertFalse("999 zzz st" in self.store)
+
+    def test_answers_not_shared(self):
+        self.store.get("1470 valencia st")["1470 Valencia St"].clear()
+        self.assertTrue(self.store.get("1470 valencia st") == ANSWERS["1470 valencia st"])
+
+    def test_empty_store(self):
+        answer_store.write_answer_store(self.path + ".empty", [])
+        store = answer_store.AnswerStore(open(self.path + ".empty", "rb").read())
+        self.assertTrue(len(store) == 0)
+        self.assertTrue(store.get("1470 valencia st") is None)
+
+    def test_not_an_answer_store(self):
+        with open(self.path + ".bad", "wb") as fp:
+            fp.write(b"SQLite format 3\x00" * 4)
+        with self.assertRaises(answer_store.AnswerStoreFormatError):
+            answer_store.AnswerStore.load(self.path + ".bad")
+
+    def test_truncated(self):
+        with open(self.path, "rb") as fp:
+            data = fp.read()
+        with self.assertRaises(answer_store.AnswerStoreFormatError):
+            answer_store.AnswerStore(data[:-1])
+
+    def test_location(self):
+        self.assertTrue(
+            answer_store.get_answer_store_location(os.path.join("data", "SF_trees.20240101T000000000000.db"))
+            == os.path.join("data", "SF_trees.20240101T000000000000.answers")
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,536 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path  # if you haven't already done so
+
+file = Path(os.path.dirname(__file__)).resolve()
+parent, root = file.parent, file.parents[1]
+sys.path.append(str(root))
+
+# Additionally remove the current file's directory from sys.path
+try:
+    sys.path.remove(str(parent))
+except ValueError:  # Already removed
+    pass
+from SF_Tree_Identifier import (
+    Address,
+    answer_store,
+    db_versions,
+    existence_index,
+    identify_trees,
+    metrics,
+)
+from helpers import TREES, make_test_db, setUpModule, tearDownModule
+
+class TestDbTestCase(unittest.TestCase):
+    """Points identify_trees at a freshly made test db for each test."""
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_location = identify_trees.DB_LOCATION
+        identify_trees.DB_LOCATION = os.path.join(self.tmp_dir.name, "SF_trees.db")
+        make_test_db(identify_trees.DB_LOCATION)
+
+    def tearDown(self) -> None:
+        identify_trees.close_connections()
+        identify_trees.DB_LOCATION = self.db_location
+        self.tmp_dir.cleanup()
+
+
+class FindSpeciesTestCase(TestDbTestCase):
+    def test_match_scientific_name(self):
+        self.assertTrue(identify_trees.match_species_name("ginkgo biloba")[0] == 1)
+
+    def test_match_common_name(self):
+        self.assertTrue(identify_trees.match_species_name("Monterey Pine")[0] == 2)
+
+    def test_no_species(self):
+        with self.assertRaises(identify_trees.NoSpeciesFoundError):
+            identify_trees.match_species_name("qwerty zxcvb")
+
+    def test_find_species(self):
+        trees = list(identify_trees.find_species("Ginkgo biloba"))
+        self.assertTrue([tree["tree_id"] for tree in trees] == [6, 2, 3, 4])
+        self.assertTrue(trees[0]["address"] == "1202 19Th St")
+
+    def test_find_species_on_street(self):
+        trees = identify_trees.find_species("ginkgo", street="Valencia Street", limit=2)
+        self.assertTrue([tree["street_number"] for tree in trees] == [1402, 1415])
+
+    def test_find_species_bad_street(self):
+        with self.assertRaises(Address.NoCloseMatchError):
+            identify_trees.find_species("ginkgo", street="Qwerty Street")
+
+    def test_count_species_by_street(self):
+        counts = identify_trees.count_species_by_street("Maidenhair Tree")
+        self.assertTrue(counts == {"valencia st": 3, "19th st": 1})
+
+
+class SpeciesCountsTestCase(TestDbTestCase):
+    def test_street_species_counts(self):
+        counts = identify_trees.get_street_species_counts("Valencia Street")
+        self.assertTrue(
+            [(tree["common_name"], tree["count"]) for tree in counts]
+            == [("Maidenhair Tree", 3), ("Brisbane Box", 2)]
+        )
+        self.assertTrue(counts[0]["urlPath"] == "605")
+
+    def test_street_species_counts_limit(self):
+        counts = identify_trees.get_street_species_counts("valencia st", limit=1)
+        self.assertTrue(len(counts) == 1)
+
+    def test_block_species_counts(self):
+        counts = identify_trees.get_block_species_counts("valencia st", 1468)
+        self.assertTrue(
+            [(tree["scientific_name"], tree["count"]) for tree in counts]
+            == [("Ginkgo biloba", 3), ("Lophostemon confertus", 2)]
+        )
+
+    def test_empty_block(self):
+        self.assertTrue(identify_trees.get_block_species_counts("valencia st", 100) == [])
+
+
+class TreesInRangeTestCase(TestDbTestCase):
+    def test_range(self):
+        trees = identify_trees.get_trees_in_range("Valencia Street", 1400, 1470)
+        self.assertTrue([tree["tree_id"] for tree in trees] == [2, 3, 1])
+
+    def test_range_inclusive_and_ordered(self):
+        trees = list(identify_trees.get_trees_in_range("valencia st", 1480, 1402))
+        self.assertTrue(
+            [tree["street_number"] for tree in trees] == [1402, 1415, 1470, 1480, 1480]
+        )
+        self.assertTrue(trees[-1]["common_name"] == "Brisbane Box")
+
+    def test_odd_parity(self):
+        trees = identify_trees.get_trees_in_range("valencia st", 1400, 1500, "odd")
+        self.assertTrue([tree["address"] for tree in trees] == ["1415 Valencia St"])
+
+    def test_bad_parity(self):
+        with self.assertRaises(ValueError):
+            identify_trees.get_trees_in_range("valencia st", 1400, 1500, "left")
+
+
+class ThreadedLookupTestCase(TestDbTestCase):
+    def test_batch_in_order(self):
+        results = identify_trees.get_trees_batch(
+            ["1470 Valencia St", "900 Brotherhood Way", "1202 19th St"] * 10,
+            max_workers=4,
+        )
+        self.assertTrue(len(results) == 30)
+        self.assertTrue(
+            [list(result) for result in results[:3]]
+            == [["1470 Valencia St"], ["900 Brotherhood Way"], ["1202 19Th St"]]
+        )
+        self.assertTrue(results[0] == results[3] == results[27])
+
+    def test_batch_errors(self):
+        results = identify_trees.get_trees_batch(["1470 Valencia St", "Valencia St"])
+        self.assertTrue(isinstance(results[0], dict))
+        self.assertTrue(isinstance(results[1], Address.AddressError))
+
+    def test_batch_matches_single_lookups(self):
+        user_inputs = [
+            "1470 Valencia St",
+            "1468 valencia street",
+            "1480 Valencia St, San Francisco",
+            "100 Valencia St",
+            "900 Brotherhod Way",
+            "1204 19th St",
+            "1 Qwxyz St",
+            "01470 Valencia St",
+            "0001468 valencia street",
+        ]
+        for user_input, result in zip(user_inputs, identify_trees.get_trees_batch(user_inputs)):
+            try:
+                expected = identify_trees.get_trees(user_input)
+            except Exception as err:
+                expected = err
+            if isinstance(expected, Exception):
+                self.assertTrue(type(result) is type(expected))
+            else:
+                self.assertTrue(result == expected)
+
+    def test_batch_deduplicated(self):
+        metrics.clear()
+        results = identify_trees.get_trees_batch(
+            ["1470 Valencia St", "1470 valencia street", "1480 Valencia St", "900 Brotherhood Way"] * 10
+        )
+        self.assertTrue(results[0] is results[1] is results[36])
+        # one range scan per street
+        self.assertTrue(identify_trees.ITERATE_DB_SECONDS.count == 2)
+        self.assertTrue(identify_trees.LOOKUPS_EXACT.value == 3)
+        # one latency sample per distinct address
+        self.assertTrue(identify_trees.LOOKUP_SECONDS.buckets()[-1][1] == 3)
+
+    def test_batch_shares_address_memo(self):
+        Address.clear_address_memo()
+        identify_trees.get_trees_batch(["1470 Valencia St", "1480 Valencia St", "1470 Valencia St"])
+        self.assertTrue(Address.address_memo_stats()["misses"] == 2)
+        identify_trees.main("1470 Valencia St")
+        self.assertTrue(Address.address_memo_stats()["hits"] == 1)
+
+    def test_street_number_ranges(self):
+        self.assertTrue(
+            identify_trees._street_number_ranges([1402, 1415, 1470, 1600])
+            == [(1400, 1417), (1468, 1472), (1598, 1602)]
+        )
+
+    def test_connection_per_thread(self):
+        connections = []
+        thread = threading.Thread(
+            target=lambda: connections.append(identify_trees.get_connection())
+        )
+        thread.start()
+        thread.join()
+        self.assertTrue(identify_trees.get_connection() is identify_trees.get_connection())
+        self.assertTrue(connections[0] is not identify_trees.get_connection())
+
+    def test_cached_structure_built_once(self):
+        calls = []
+        barrier = threading.Barrier(8)
+
+        def loader(db_location):
+            calls.append(db_location)
+            return object()
+
+        def get():
+            barrier.wait()
+            values.append(identify_trees.get_db_cached("test_structure", loader))
+
+        values = []
+        threads = [threading.Thread(target=get) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertTrue(len(calls) == 1)
+        self.assertTrue(all(value is values[0] for value in values))
+
+
+class NearestAddressTestCase(TestDbTestCase):
+    def test_nearest_between(self):
+        self.assertTrue(identify_trees.get_nearest_street_numbers("valencia st", 1474) == [1470])
+        self.assertTrue(identify_trees.get_nearest_street_numbers("valencia st", 1436) == [1402, 1470])
+        self.assertTrue(identify_trees.get_nearest_street_numbers("valencia st", 1417) == [1415])
+
+    def test_nearest_beyond_ends(self):
+        self.assertTrue(identify_trees.get_nearest_street_numbers("valencia st", 100) == [1402])
+        self.assertTrue(identify_trees.get_nearest_street_numbers("valencia st", 3001) == [1415])
+
+    def test_no_trees_on_side(self):
+        self.assertTrue(identify_trees.get_nearest_street_numbers("19th st", 1203) == [])
+        self.assertTrue(identify_trees.get_nearest_street_numbers("qwxyz st", 10) == [])
+
+    def test_far_lookup(self):
+        trees = identify_trees.get_trees("1446 Valencia St")
+        self.assertTrue(list(trees) == ["1470 Valencia St"])
+
+    def test_batch_far_lookup(self):
+        user_inputs = ["1446 Valencia St", "1472 Valencia St", "100 Valencia St", "1203 19th St"]
+        results = identify_trees.get_trees_batch(user_inputs)
+        self.assertTrue(results[0] == identify_trees.get_trees(user_inputs[0]))
+        self.assertTrue(list(results[1]) == ["1470 Valencia St"])
+        self.assertTrue(list(results[2]) == ["1402 Valencia St"])
+        self.assertTrue(isinstance(results[3], identify_trees.NoTreeFoundError))
+
+    def test_db_without_table(self):
+        identify_trees.DB_LOCATION = os.path.join(self.tmp_dir.name, "SF_trees_old.db")
+        make_test_db(identify_trees.DB_LOCATION)
+        with sqlite3.connect(identify_trees.DB_LOCATION) as con:
+            con.execute("DROP TABLE nearest_addresses")
+        con.close()
+        self.assertTrue(identify_trees.get_nearest_street_numbers("valencia st", 1446) is None)
+        self.assertTrue(list(identify_trees.get_trees("1468 Valencia St")) == ["1470 Valencia St"])
+        with self.assertRaises(identify_trees.NoTreeFoundError):
+            identify_trees.get_trees("1446 Valencia St")
+
+
+class AnswerStoreTestCase(TestDbTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.user_inputs = ["1470 Valencia St", "1480 valencia street", "900 Brotherhood Way", "1202 19th St"]
+        self.expected = [
+            identify_trees.create_output_dict(identify_trees.main(user_input))
+            for user_input in self.user_inputs
+        ]
+        answer_store.write_answer_store(
+            answer_store.get_answer_store_location(identify_trees.DB_LOCATION),
+            answer_store.build_answers(identify_trees.DB_LOCATION),
+        )
+        metrics.clear()
+
+    def test_answers_match_lookups(self):
+        self.assertTrue(
+            [identify_trees.get_trees(user_input) for user_input in self.user_inputs] == self.expected
+        )
+        self.assertTrue(identify_trees.ANSWER_STORE_HITS.value == 4)
+        self.assertTrue(identify_trees.LOOKUPS_EXACT.value == 4)
+        self.assertTrue(identify_trees.QUERY_DB_SECONDS.count == 0)
+
+    def test_miss_looked_up(self):
+        self.assertTrue(list(identify_trees.get_trees("1468 Valencia St")) == ["1470 Valencia St"])
+        self.assertTrue(identify_trees.ANSWER_STORE_MISSES.value == 1)
+        with self.assertRaises(Address.AddressError):
+            identify_trees.get_trees("Valencia St")
+
+    def test_miss_normalized_once(self):
+        Address.clear_address_memo()
+        identify_trees.get_trees("1468 Valencia St")
+        self.assertTrue(Address.address_memo_stats()["misses"] == 1)
+        self.assertTrue(Address.address_memo_stats()["hits"] == 0)
+        self.assertTrue(identify_trees.LOOKUP_SECONDS.buckets()[-1][1] == 1)
+
+    def test_batch(self):
+        self.assertTrue(identify_trees.get_trees_batch(self.user_inputs) == self.expected)
+        self.assertTrue(identify_trees.ITERATE_DB_SECONDS.count == 0)
+        self.assertTrue(identify_trees.LOOKUP_SECONDS.buckets()[-1][1] == 4)
+        results = identify_trees.get_trees_batch(["1470 Valencia St", "1468 Valencia St"])
+        self.assertTrue(list(results[1]) == ["1470 Valencia St"])
+        self.assertTrue(identify_trees.ITERATE_DB_SECONDS.count == 1)
+
+
+class DbConnectionTestCase(TestDbTestCase):
+    def test_read_only(self):
+        with self.assertRaises(sqlite3.OperationalError):
+            identify_trees.query_db("DELETE FROM addresses")
+
+    def test_pragmas_applied(self):
+        self.assertTrue(identify_trees.query_db("PRAGMA query_only", fetchall=False) == (1,))
+        self.assertTrue(identify_trees.query_db("PRAGMA temp_store", fetchall=False) == (2,))
+
+    def test_path_needing_quoting(self):
+        db_dir = os.path.join(self.tmp_dir.name, "data dir?#")
+        os.mkdir(db_dir)
+        identify_trees.DB_LOCATION = os.path.join(db_dir, "SF_trees.db")
+        make_test_db(identify_trees.DB_LOCATION)
+        self.assertTrue(len(identify_trees.query_db("SELECT * FROM species")) == 3)
+
+    def test_missing_db(self):
+        identify_trees.DB_LOCATION = os.path.join(self.tmp_dir.name, "missing.db")
+        with self.assertRaises(sqlite3.OperationalError):
+            identify_trees.query_db("SELECT * FROM species")
+        self.assertFalse(os.path.exists(identify_trees.DB_LOCATION))
+
+
+class LookupMetricsTestCase(TestDbTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        metrics.clear()
+        # memoized inputs skip street matching and its metrics
+        Address.clear_address_memo()
+
+    def test_lookup_results(self):
+        identify_trees.main("1470 Valencia St")
+        identify_trees.main("1468 Valencia St")
+        with self.assertRaises(identify_trees.NoTreeFoundError):
+            # no trees on the odd side of 19th st
+            identify_trees.main("1203 19th St")
+        with self.assertRaises(Address.AddressError):
+            identify_trees.main("Valencia St")
+
+        for result, count in (
+            ("exact", 1),
+            ("nearby", 1),
+            ("not_found", 1),
+            ("invalid_address", 1),
+        ):
+            self.assertTrue(identify_trees.LOOKUPS.labels(result).value == count)
+        self.assertTrue(identify_trees.LOOKUP_SECONDS.buckets()[-1][1] == 4)
+        self.assertTrue(identify_trees.QUERY_DB_SECONDS.count > 0)
+
+    def test_street_match_methods(self):
+        identify_trees.main("1470 valencia street")
+        self.assertTrue(Address.STREET_MATCHES_EXACT.value == 1)
+        self.assertTrue(
+            "sf_tree_lookups_total{result=\"exact\"} 1" in metrics.render()
+        )
+
+
+class StreetNameForQueryTestCase(unittest.TestCase):
+    def test_street_name(self):
+        street_name = Address.get_street_name_for_query("Valencia Street")
+        self.assertTrue(street_name == "valencia st")
+
+    def test_misspelled_street_name(self):
+        street_name = Address.get_street_name_for_query("vaelncia st.")
+        self.assertTrue(street_name == "valencia st")
+
+
+class OutputTestCase(TestDbTestCase):
+    def test_trees_counted_per_species(self):
+        self.assertTrue(
+            identify_trees.get_trees("1480 Valencia St")
+            == {
+                "1480 Valencia St": [
+                    {
+                        "urlPath": "605",
+                        "count": 1,
+                        "scientific_name": "Ginkgo biloba",
+                        "common_name": "Maidenhair Tree",
+                        "display_name": "Maidenhair Tree (Ginkgo Biloba)",
+                        "url": "https://selectree.calpoly.edu/tree-detail/605",
+                    },
+                    {
+                        "urlPath": "1425",
+                        "count": 1,
+                        "scientific_name": "Lophostemon confertus",
+                        "common_name": "Brisbane Box",
+                        "display_name": "Brisbane Box (Lophostemon Confertus)",
+                        "url": "https://selectree.calpoly.edu/tree-detail/1425",
+                    },
+                ]
+            }
+        )
+        self.assertTrue(
+            identify_trees.get_trees("900 Brotherhood Way")["900 Brotherhood Way"][0]["count"] == 2
+        )
+
+    def test_messages(self):
+        messages = identify_trees.format_messages(identify_trees.get_trees("900 Brotherhood Way"))
+        self.assertTrue(
+            messages
+            == [
+                "Tree at 900 Brotherhood Way:\nMonterey Pine (Pinus Radiata): 2\n"
+                "https://selectree.calpoly.edu/tree-detail/1071\n"
+            ]
+        )
+
+    def test_message_uses_display_fields(self):
+        tree = {
+            "urlPath": "605",
+            "count": 2,
+            "scientific_name": "Ginkgo biloba",
+            "common_name": "Maidenhair Tree",
+            "display_name": "Ginkgo",
+            "url": "https://example.com/ginkgo",
+        }
+        self.assertTrue(
+            identify_trees.create_message(tree) == "Ginkgo: 2\nhttps://example.com/ginkgo\n"
+        )
+
+    def test_message_without_db(self):
+        identify_trees.DB_LOCATION = os.path.join(self.tmp_dir.name, "missing.db")
+        tree = {"urlPath": "605", "count": 1, "scientific_name": "Ginkgo biloba", "common_name": ""}
+        self.assertTrue(
+            identify_trees.create_message(tree)
+            == "Ginkgo Biloba\nhttps://selectree.calpoly.edu/tree-detail/605\n"
+        )
+
+    def test_message_without_url(self):
+        tree = {"urlPath": "0", "count": 3, "scientific_name": "Ginkgo biloba", "common_name": "Maidenhair Tree"}
+        self.assertTrue(
+            identify_trees.create_message(tree) == "Maidenhair Tree (Ginkgo Biloba): 3\n"
+        )
+
+    def test_species_loaded_once(self):
+        identify_trees.get_trees("1470 Valencia St")
+        species = identify_trees.get_species_dimension()
+        identify_trees.get_trees("1480 Valencia St")
+        self.assertTrue(identify_trees.get_species_dimension() is species)
+        self.assertTrue(identify_trees.get_species("1") == ("Ginkgo biloba :: Maidenhair Tree", "605"))
+
+
+class SuggestAddressesTestCase(TestDbTestCase):
+    def test_no_tree_address(self):
+        with self.assertRaises(identify_trees.NoTreeFoundError):
+            identify_trees.main("1460 Valencia St", check_nearby=False)
+        suggestions = identify_trees.suggest_addresses("1460 Valencia St", limit=2)
+        self.assertTrue(
+            [suggestion["address"] for suggestion in suggestions]
+            == ["1470 Valencia St", "1480 Valencia St"]
+        )
+
+    def test_no_street_match(self):
+        suggestions = identify_trees.suggest_addresses("900 Brotherhod Wy")
+        self.assertTrue(suggestions[0]["address"] == "900 Brotherhood Way")
+        self.assertTrue(suggestions[0]["street_number"] == 900)
+
+    def test_invalid_address(self):
+        with self.assertRaises(Address.AddressError):
+            identify_trees.suggest_addresses("Valencia St")
+
+
+class HotReloadTestCase(unittest.TestCase):
+    """Publishes versions of the test db and follows their pointer file."""
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_location = identify_trees.DB_LOCATION
+        self.pointer_location = identify_trees.DB_POINTER_LOCATION
+        self.pointer_db_location = identify_trees._pointer_db_location
+        self.db_path = os.path.join(self.tmp_dir.name, "SF_trees.db")
+        self.first = self.publish("20240101T000000000000")
+        identify_trees.follow_db_pointer(db_versions.get_pointer_location(self.db_path))
+
+    def tearDown(self) -> None:
+        identify_trees.close_connections()
+        identify_trees.DB_LOCATION = self.db_location
+        identify_trees.DB_POINTER_LOCATION = self.pointer_location
+        identify_trees._pointer_db_location = self.pointer_db_location
+        self.tmp_dir.cleanup()
+
+    def publish(self, version: str, new_trees: list = ()) -> str:
+        db_location = db_versions.get_version_location(self.db_path, version)
+        build_path = f"{db_location}.build"
+        make_test_db(build_path, TREES + list(new_trees))
+        existence_index.build_address_bloom_filter(build_path).save(
+            existence_index.get_bloom_filter_location(db_location)
+        )
+        return db_versions.publish(build_path, self.db_path, version)
+
+    def test_reload_switches_db(self):
+        self.assertTrue(list(identify_trees.get_trees("1500 Valencia St")) == ["1480 Valencia St"])
+        second = self.publish("20240102T000000000000", [(9, "1500 valencia st", 2)])
+        self.assertTrue(identify_trees.reload_db())
+        self.assertTrue(identify_trees.DB_LOCATION == second)
+        self.assertTrue(list(identify_trees.get_trees("1500 Valencia St")) == ["1500 Valencia St"])
+
+    def test_unchanged_pointer(self):
+        self.assertFalse(identify_trees.reload_db())
+
+    def test_caches_loaded_before_switch(self):
+        identify_trees.get_existence_index()
+        second = self.publish("20240102T000000000000")
+        identify_trees.reload_db()
+        self.assertTrue(("existence_index", second) in identify_trees._db_caches)
+        self.assertTrue(("existence_index", self.first) in identify_trees._db_caches)
+
+    def test_pinned_lookup_keeps_version(self):
+        with identify_trees.pin_db_location():
+            self.publish("20240102T000000000000", [(9, "1500 valencia st", 2)])
+            identify_trees.reload_db()
+            self.assertTrue(identify_trees.get_db_location() == self.first)
+            self.assertTrue(identify_trees.get_address_species_keys("1500 valencia st") == {})
+        self.assertTrue(
+            identify_trees.get_address_species_keys("1500 valencia st")
+            == {"1500 valencia st": ["2"]}
+        )
+
+    def test_direct_location_not_reloaded(self):
+        identify_trees.DB_LOCATION = self.first
+        identify_trees._pointer_db_location = None
+        self.publish("20240102T000000000000")
+        self.assertFalse(identify_trees.reload_db())
+        self.assertTrue(identify_trees.DB_LOCATION == self.first)
+
+    def test_lookup_starts_background_reload(self):
+        reload_interval = identify_trees.DB_RELOAD_INTERVAL
+        identify_trees.DB_RELOAD_INTERVAL = 0
+        try:
+            second = self.publish("20240102T000000000000")
+            identify_trees.check_db_connection()
+            deadline = time.monotonic() + 5
+            while identify_trees.DB_LOCATION != second and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            identify_trees.DB_RELOAD_INTERVAL = reload_interval
+        self.assertTrue(identify_trees.DB_LOCATION == second)
+
+
+if __name__ == "__main__":
+    unittest.main()
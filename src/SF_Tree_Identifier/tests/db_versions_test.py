@@ -0,0 +1,82 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path  # if you haven't already done so
+
+file = Path(os.path.dirname(__file__)).resolve()
+parent, root = file.parent, file.parents[1]
+sys.path.append(str(root))
+
+# Additionally remove the current file's directory from sys.path
+try:
+    sys.path.remove(str(parent))
+except ValueError:  # Already removed
+    pass
+from SF_Tree_Identifier import answer_store, db_versions, existence_index
+
+
+class PublishTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, "SF_trees.db")
+        self.pointer_path = db_versions.get_pointer_location(self.db_path)
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def publish(self, version: str, keep: int = 2) -> str:
+        db_location = db_versions.get_version_location(self.db_path, version)
+        build_path = f"{db_location}.build"
+        with open(build_path, "w") as fp:
+            fp.write(version)
+        for sidecar_location in db_versions.get_sidecar_locations(db_location):
+            with open(sidecar_location, "w") as fp:
+                fp.write(version)
+        return db_versions.publish(build_path, self.db_path, version, keep)
+
+    def test_version_location(self):
+        self.assertTrue(
+            db_versions.get_version_location("data/SF_trees.db", "20240101T000000000000")
+            == "data/SF_trees.20240101T000000000000.db"
+        )
+
+    def test_no_pointer(self):
+        self.assertTrue(db_versions.read_pointer(self.pointer_path) is None)
+
+    def test_publish_switches_pointer(self):
+        first = self.publish("20240101T000000000000")
+        self.assertTrue(db_versions.read_pointer(self.pointer_path) == first)
+        second = self.publish("20240102T000000000000")
+        self.assertTrue(db_versions.read_pointer(self.pointer_path) == second)
+        self.assertFalse(os.path.exists(f"{second}.build"))
+        self.assertTrue(os.path.exists(first))
+
+    def test_prune_old_versions(self):
+        versions = [f"2024010{day}T000000000000" for day in range(1, 5)]
+        locations = [self.publish(version) for version in versions]
+        self.assertTrue(db_versions.list_versions(self.db_path) == locations[-2:])
+        self.assertFalse(
+            os.path.exists(existence_index.get_bloom_filter_location(locations[0]))
+        )
+        self.assertFalse(
+            os.path.exists(answer_store.get_answer_store_location(locations[0]))
+        )
+
+    def test_prune_keeps_current(self):
+        locations = [
+            self.publish(f"2024010{day}T000000000000", keep=10) for day in range(1, 4)
+        ]
+        db_versions.write_pointer(self.pointer_path, locations[0])
+        db_versions.prune_versions(self.db_path, keep=1)
+        self.assertTrue(
+            db_versions.list_versions(self.db_path) == [locations[0], locations[2]]
+        )
+
+    def test_pointer_outside_dir(self):
+        with self.assertRaises(ValueError):
+            db_versions.write_pointer(self.pointer_path, os.path.join("elsewhere", "SF_trees.db"))
+
+
+if __name__ == "__main__":
+    unittest.main()
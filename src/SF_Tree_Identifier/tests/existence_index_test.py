@@ -0,0 +1,82 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path  # if you haven't already done so
+
+file = Path(os.path.dirname(__file__)).resolve()
+parent, root = file.parent, file.parents[1]
+sys.path.append(str(root))
+
+# Additionally remove the current file's directory from sys.path
+try:
+    sys.path.remove(str(parent))
+except ValueError:  # Already removed
+    pass
+from SF_Tree_Identifier import existence_index, identify_trees
+
+from helpers import TREES, make_test_db
+
+ADDRESSES = sorted({address for _, address, _ in TREES})
+
+
+class AddressBloomFilterTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, "SF_trees.db")
+        make_test_db(self.db_path)
+        self.bloom_filter = existence_index.build_address_bloom_filter(self.db_path)
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+
+    def test_no_false_negatives(self):
+        for address in ADDRESSES:
+            self.assertTrue(address in self.bloom_filter)
+
+    def test_miss(self):
+        self.assertFalse("1466 valencia st" in self.bloom_filter)
+
+    def test_save_load(self):
+        path = existence_index.get_bloom_filter_location(self.db_path)
+        self.bloom_filter.save(path)
+        loaded_filter = existence_index.AddressBloomFilter.load(path)
+        self.assertTrue(loaded_filter.bits == self.bloom_filter.bits)
+        self.assertTrue(len(loaded_filter) == len(ADDRESSES))
+
+    def test_bad_file(self):
+        path = os.path.join(self.tmp_dir.name, "bad.bloom")
+        with open(path, "wb") as fp:
+            fp.write(b"not a bloom filter")
+        with self.assertRaises(existence_index.BloomFilterFormatError):
+            existence_index.AddressBloomFilter.load(path)
+
+
+class ShortCircuitTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_location = identify_trees.DB_LOCATION
+        identify_trees.DB_LOCATION = os.path.join(self.tmp_dir.name, "SF_trees.db")
+        make_test_db(identify_trees.DB_LOCATION)
+        existence_index.build_address_bloom_filter(identify_trees.DB_LOCATION).save(
+            existence_index.get_bloom_filter_location(identify_trees.DB_LOCATION)
+        )
+
+    def tearDown(self) -> None:
+        identify_trees.DB_LOCATION = self.db_location
+        self.tmp_dir.cleanup()
+
+    def test_hit_queries_db(self):
+        address_species_keys = identify_trees.get_address_species_keys(
+            "1470 valencia st"
+        )
+        self.assertTrue(address_species_keys == {"1470 valencia st": ["0"]})
+
+    def test_miss_skips_db(self):
+        os.remove(identify_trees.DB_LOCATION)
+        self.assertFalse(identify_trees.may_have_trees("1466 valencia st"))
+        self.assertTrue(identify_trees.get_address_species_keys("1466 valencia st") == {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+"""Fixtures shared by the test modules. Test modules import them after adding src to sys.path."""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+from SF_Tree_Identifier import Address
+
+# the test dbs are built by the functions building SF_trees.db
+sys.path.append(str(Path(__file__).resolve().parents[3] / "dev" / "db_creation"))
+import make_tree_table
+
+# (index, qSpecies, urlPath)
+SPECIES = [
+    (0, "Lophostemon confertus :: Brisbane Box", 1425),
+    (1, "Ginkgo biloba :: Maidenhair Tree", 605),
+    (2, "Pinus radiata :: Monterey Pine", 1071),
+]
+
+# (TreeID, qAddress, qSpecies)
+TREES = [
+    (1, "1470 valencia st", 0),
+    (2, "1402 valencia st", 1),
+    (3, "1415 valencia st", 1),
+    (4, "1480 valencia st", 1),
+    (5, "1480 valencia st", 0),
+    (6, "1202 19th st", 1),
+    (7, "900 brotherhood way", 2),
+    (8, "900 brotherhood way", 2),
+]
+
+def make_test_db(db_path: str, trees: list = TREES) -> None:
+    """Creates a small db of the trees (TreeID, qAddress, qSpecies) of the SPECIES with make_tree_table.make_tables,
+    so it has every table and index of SF_trees.db."""
+    species = pd.DataFrame(
+        [(qSpecies, urlPath) for _, qSpecies, urlPath in SPECIES],
+        columns=["qSpecies", "urlPath"],
+        index=pd.Index([index for index, _, _ in SPECIES], name="index"),
+    )
+    addresses = pd.DataFrame(
+        [
+            (address, species_key, 1, None, None, int(address.split(" ", 1)[0]), address.split(" ", 1)[1])
+            for _, address, species_key in trees
+        ],
+        columns=["qAddress", "qSpecies", "SiteOrder", "Latitude", "Longitude", "street_number", "street_name"],
+        index=pd.Index([tree_id for tree_id, _, _ in trees], name="TreeID"),
+    )
+    make_tree_table.make_tables(addresses, species, db_path)
+
+
+_tmp_dir = None
+_street_match_cache = None
+
+
+def setUpModule() -> None:
+    """Points the street match cache at a file in a temporary directory for the tests of the module, so running
+    the tests never writes to the package data dir. Test modules running lookups import it as their setUpModule."""
+    global _tmp_dir, _street_match_cache
+    _tmp_dir = tempfile.TemporaryDirectory()
+    _street_match_cache = (Address.STREET_MATCH_CACHE_LOCATION, Address._street_match_cache)
+    Address.STREET_MATCH_CACHE_LOCATION = os.path.join(_tmp_dir.name, "street_match_cache.sqlite")
+    Address._street_match_cache = None
+    Address.clear_address_memo()
+
+
+def tearDownModule() -> None:
+    if Address._street_match_cache not in (None, False):
+        Address._street_match_cache.close()
+    Address.STREET_MATCH_CACHE_LOCATION, Address._street_match_cache = _street_match_cache
+    Address.clear_address_memo()
+    _tmp_dir.cleanup()
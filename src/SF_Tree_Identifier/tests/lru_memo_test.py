@@ -0,0 +1,74 @@
+import os
+import sys
+import threading
+import unittest
+from pathlib import Path  # if you haven't already done so
+
+file = Path(os.path.dirname(__file__)).resolve()
+parent, root = file.parent, file.parents[1]
+sys.path.append(str(root))
+
+# Additionally remove the current file's directory from sys.path
+try:
+    sys.path.remove(str(parent))
+except ValueError:  # Already removed
+    pass
+from SF_Tree_Identifier.lru_memo import LRUMemo
+
+
+class LRUMemoTestCase(unittest.TestCase):
+    def test_get_or_compute(self):
+        memo = LRUMemo(2)
+        calls = []
+        compute = lambda key: calls.append(key) or key * 2
+        self.assertTrue(memo.get_or_compute(1, compute) == 2)
+        self.assertTrue(memo.get_or_compute(1, compute) == 2)
+        self.assertTrue(calls == [1])
+
+    def test_evicts_least_recently_used(self):
+        memo = LRUMemo(2)
+        memo.put("a", 1)
+        memo.put("b", 2)
+        memo.get("a")
+        memo.put("c", 3)
+        self.assertTrue("a" in memo and "c" in memo)
+        self.assertFalse("b" in memo)
+        self.assertTrue(memo.stats()["evictions"] == 1)
+
+    def test_stats(self):
+        memo = LRUMemo(10)
+        memo.put("a", 1)
+        memo.get("a")
+        memo.get("b")
+        stats = memo.stats()
+        self.assertTrue(stats["hits"] == 1 and stats["misses"] == 1)
+        self.assertTrue(stats["size"] == 1 and stats["max_size"] == 10)
+        self.assertTrue(stats["hit_rate"] == 0.5)
+        memo.clear()
+        self.assertTrue(memo.stats()["hits"] == 0 and len(memo) == 0)
+
+    def test_disabled(self):
+        memo = LRUMemo(0)
+        memo.put("a", 1)
+        self.assertTrue(memo.get("a") is None)
+        self.assertTrue(len(memo) == 0)
+
+    def test_threads(self):
+        memo = LRUMemo(50)
+
+        def worker():
+            for key in range(200):
+                memo.get_or_compute(key % 100, str)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = memo.stats()
+        self.assertTrue(stats["hits"] + stats["misses"] == 800)
+        self.assertTrue(stats["size"] == 50)
+
+
+if __name__ == "__main__":
+    unittest.main()
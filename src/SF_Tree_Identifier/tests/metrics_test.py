@@ -0,0 +1,114 @@
+import os
+import sys
+import unittest
+import urllib.request
+from pathlib import Path  # if you haven't already done so
+
+file = Path(os.path.dirname(__file__)).resolve()
+parent, root = file.parent, file.parents[1]
+sys.path.append(str(root))
+
+# Additionally remove the current file's directory from sys.path
+try:
+    sys.path.remove(str(parent))
+except ValueError:  # Already removed
+    pass
+from SF_Tree_Identifier import metrics
+
+
+class MetricsTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.names = []
+
+    def tearDown(self) -> None:
+        for name in self.names:
+            del metrics._registry[name]
+
+    def counter(self, name, labelnames=()):
+        self.names.append(name)
+        return metrics.Counter(name, "Test counter.", labelnames)
+
+    def histogram(self, name, labelnames=(), buckets=(0.1, 1.0)):
+        self.names.append(name)
+        return metrics.Histogram(name, "Test histogram.", labelnames, buckets)
+
+    def test_counter(self):
+        counter = self.counter("test_events")
+        counter.inc()
+        counter.inc(2)
+        self.assertTrue(counter.value == 3)
+        self.assertTrue("test_events_total 3\n" in metrics.render())
+
+    def test_counter_labels(self):
+        counter = self.counter("test_results", ("result",))
+        counter.labels("hit").inc()
+        counter.labels("miss").inc()
+        counter.labels("hit").inc()
+        self.assertTrue(counter.labels("hit").value == 2)
+        rendered = counter.render()
+        self.assertTrue("# TYPE test_results counter" in rendered)
+        self.assertTrue('test_results_total{result="hit"} 2' in rendered)
+        with self.assertRaises(ValueError):
+            counter.labels("hit", "extra")
+
+    def test_duplicate_name(self):
+        self.counter("test_duplicate")
+        with self.assertRaises(ValueError):
+            metrics.Counter("test_duplicate", "Test counter.")
+
+    def test_histogram(self):
+        histogram = self.histogram("test_seconds")
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.observe(value)
+        self.assertTrue(histogram.buckets() == [(0.1, 2), (1.0, 3), (float("inf"), 4)])
+        rendered = histogram.render()
+        self.assertTrue('test_seconds_bucket{le="0.1"} 2' in rendered)
+        self.assertTrue('test_seconds_bucket{le="+Inf"} 4' in rendered)
+        self.assertTrue("test_seconds_sum 2.65" in rendered)
+        self.assertTrue("test_seconds_count 4" in rendered)
+
+    def test_histogram_labels(self):
+        histogram = self.histogram("test_query_seconds", ("function",))
+        histogram.labels("query_db").observe(0.5)
+        self.assertTrue(
+            'test_query_seconds_bucket{function="query_db",le="1.0"} 1'
+            in histogram.render()
+        )
+
+    def test_timed(self):
+        histogram = self.histogram("test_timed_seconds")
+
+        @metrics.timed(histogram)
+        def fail():
+            raise KeyError
+
+        with self.assertRaises(KeyError):
+            fail()
+        self.assertTrue(histogram.buckets()[0] == (0.1, 1))
+
+    def test_clear_keeps_children(self):
+        counter = self.counter("test_cleared", ("result",))
+        hit = counter.labels("hit")
+        hit.inc()
+        metrics.clear()
+        hit.inc()
+        self.assertTrue(counter.labels("hit").value == 1)
+
+    def test_http_endpoint(self):
+        self.counter("test_served").inc()
+        server = metrics.serve_metrics(port=0)
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+            with urllib.request.urlopen(url) as response:
+                body = response.read().decode()
+                content_type = response.headers["Content-Type"]
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertTrue(server.server_address[0] == "127.0.0.1")
+        self.assertTrue("test_served_total 1" in body)
+        self.assertTrue(content_type.startswith("text/plain; version=0.0.4"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path  # if you haven't already done so
+
+file = Path(os.path.dirname(__file__)).resolve()
+parent, root = file.parent, file.parents[1]
+sys.path.append(str(root))
+
+# Additionally remove the current file's directory from sys.path
+try:
+    sys.path.remove(str(parent))
+except ValueError:  # Already removed
+    pass
+from SF_Tree_Identifier import profiler
+
+
+def busy_loop(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+class SamplingProfilerTestCase(unittest.TestCase):
+    def test_samples_running_thread(self):
+        with profiler.profile(interval=0.001) as sampling_profiler:
+            busy_loop(0.05)
+        self.assertTrue(sum(sampling_profiler.samples.values()) > 0)
+        self.assertTrue(
+            any("profiler_test:busy_loop" in stack for stack in sampling_profiler.samples)
+        )
+
+    def test_samples_other_threads(self):
+        thread = threading.Thread(target=busy_loop, args=(0.05,))
+        with profiler.profile(interval=0.001) as sampling_profiler:
+            thread.start()
+            thread.join()
+        stacks = [stack for stack in sampling_profiler.samples if "Thread._bootstrap" in stack]
+        self.assertTrue(any(stack.endswith("busy_loop") for stack in stacks))
+
+    def test_collapsed_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "test.collapsed")
+            with profiler.profile(path, interval=0.001):
+                busy_loop(0.02)
+            with open(path) as fp:
+                lines = fp.read().splitlines()
+        self.assertTrue(lines)
+        for line in lines:
+            stack, count = line.rsplit(" ", 1)
+            self.assertTrue(int(count) > 0)
+            self.assertTrue(stack.split(";")[0])
+
+    def test_stage_summary(self):
+        sampling_profiler = profiler.SamplingProfiler()
+        sampling_profiler.samples.update(
+            {
+                "main:<module>;identify_trees:main;Address:get_Address_for_query;"
+                "Address:match_closest_street_name;process:extractOne": 3,
+                "main:<module>;identify_trees:main;identify_trees:get_species_keys;"
+                "identify_trees:query_db": 1,
+                "main:<module>;identify_trees:main;identify_trees:check_db_connection": 1,
+                "main:<module>;identify_trees:get_trees_batch;threading:Condition.wait": 5,
+                "main:<module>;other_module:work": 5,
+            }
+        )
+        self.assertTrue(
+            sampling_profiler.stage_summary()
+            == {"street_match": 0.6, "db": 0.2, "other": 0.2}
+        )
+
+    def test_answer_store_stage(self):
+        sampling_profiler = profiler.SamplingProfiler()
+        sampling_profiler.samples.update(
+            {
+                "main:<module>;identify_trees:get_trees;identify_trees:get_stored_answer;"
+                "answer_store:AnswerStore.get;answer_store:AnswerStore._find;answer_store:AnswerStore._key": 2,
+                "main:<module>;identify_trees:get_trees;identify_trees:get_stored_answer;"
+                "answer_store:AnswerStore.get;__init__:loads": 1,
+                "main:<module>;identify_trees:get_trees;identify_trees:get_stored_answer;"
+                "Address:get_Address_for_query;Address:normalize_address_string": 1,
+            }
+        )
+        self.assertTrue(
+            sampling_profiler.stage_summary() == {"answer_store": 0.75, "normalize": 0.25}
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
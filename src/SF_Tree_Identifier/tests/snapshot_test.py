@@ -0,0 +1,167 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from pathlib import Path  # if you haven't already done so
+
+file = Path(os.path.dirname(__file__)).resolve()
+parent, root = file.parent, file.parents[1]
+sys.path.append(str(root))
+
+# Additionally remove the current file's directory from sys.path
+try:
+    sys.path.remove(str(parent))
+except ValueError:  # Already removed
+    pass
+from SF_Tree_Identifier import existence_index, identify_trees, snapshot
+
+
+class SnapshotFileTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "reference.snapshot")
+        self.source = os.path.join(self.tmp_dir.name, "source.json")
+        with open(self.source, "w") as fp:
+            fp.write("[]")
+        snapshot.clear()
+
+    def tearDown(self) -> None:
+        snapshot.clear()
+        self.tmp_dir.cleanup()
+
+    def test_round_trip(self):
+        bloom_filter = existence_index.AddressBloomFilter.for_capacity(10)
+        bloom_filter.add("1470 valencia st")
+        values = {
+            "names": (["valencia st"], ("source",)),
+            "existence_index": (bloom_filter, ()),
+        }
+        snapshot.write_snapshot(self.path, values, {"source": self.source})
+
+        loaded = snapshot.read_snapshot(self.path)
+        self.assertTrue(loaded["values"]["names"][0] == ["valencia st"])
+        loaded_filter = loaded["values"]["existence_index"][0]
+        self.assertTrue("1470 valencia st" in loaded_filter)
+        self.assertFalse("1466 valencia st" in loaded_filter)
+
+    def test_checksum(self):
+        snapshot.write_snapshot(self.path, {"names": ([1, 2, 3], ())}, {})
+        with open(self.path, "r+b") as fp:
+            fp.seek(-1, os.SEEK_END)
+            last_byte = fp.read(1)
+            fp.seek(-1, os.SEEK_END)
+            fp.write(bytes([last_byte[0] ^ 0xFF]))
+        with self.assertRaises(snapshot.SnapshotError):
+            snapshot.read_snapshot(self.path)
+
+    def test_fingerprint_whole_file(self):
+        # same size and header, as two deterministic builds of dbs with different rows
+        paths = [os.path.join(self.tmp_dir.name, f"SF_trees.{i}.db") for i in range(2)]
+        for i, path in enumerate(paths):
+            with open(path, "wb") as fp:
+                fp.write(b"\x00" * (2 << 20) + bytes([i]))
+        self.assertTrue(snapshot.file_fingerprint(paths[0]) != snapshot.file_fingerprint(paths[1]))
+
+    def test_fingerprint_file_rewritten(self):
+        fingerprint = snapshot.file_fingerprint(self.source)
+        with open(self.source, "w") as fp:
+            fp.write("{}")
+        stat = os.stat(self.source)
+        os.utime(self.source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        self.assertTrue(snapshot.file_fingerprint(self.source) != fingerprint)
+
+    def test_stored_fingerprint(self):
+        moved = os.path.join(self.tmp_dir.name, "moved.json")
+        fingerprint = snapshot.write_file_fingerprint(self.source, snapshot.get_fingerprint_location(moved))
+        os.replace(self.source, moved)
+        self.assertTrue(snapshot.file_fingerprint(moved) == fingerprint)
+
+        # the stored fingerprint is used without hashing the file
+        stat = os.stat(moved)
+        with open(snapshot.get_fingerprint_location(moved), "w") as fp:
+            fp.write(f"stored {stat.st_size} {stat.st_mtime_ns}\n")
+        snapshot.clear()
+        self.assertTrue(snapshot.file_fingerprint(moved) == "stored")
+
+    def test_stored_fingerprint_of_changed_file(self):
+        fingerprint = snapshot.write_file_fingerprint(self.source)
+        with open(self.source, "w") as fp:
+            fp.write("{}")
+        stat = os.stat(self.source)
+        os.utime(self.source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        self.assertTrue(snapshot.file_fingerprint(self.source) != fingerprint)
+
+    def test_not_a_snapshot(self):
+        with self.assertRaises(snapshot.SnapshotError):
+            snapshot.read_snapshot(self.source)
+
+    def test_stale_source(self):
+        snapshot.write_snapshot(
+            self.path, {"names": (["a"], ("source",))}, {"source": self.source}
+        )
+        with open(self.source, "w") as fp:
+            fp.write('["changed"]')
+        snapshot.clear()
+
+        location = snapshot.SNAPSHOT_LOCATION
+        snapshot.SNAPSHOT_LOCATION = self.path
+        try:
+            with self.assertRaises(KeyError):
+                snapshot.get_value("names", {"source": self.source})
+        finally:
+            snapshot.SNAPSHOT_LOCATION = location
+
+
+class BuildSnapshotTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_location = identify_trees.DB_LOCATION
+        self.snapshot_location = snapshot.SNAPSHOT_LOCATION
+        identify_trees.DB_LOCATION = os.path.join(self.tmp_dir.name, "SF_trees.db")
+        snapshot.SNAPSHOT_LOCATION = os.path.join(self.tmp_dir.name, "reference.snapshot")
+        snapshot.clear()
+
+        con = sqlite3.connect(identify_trees.DB_LOCATION)
+        con.execute(
+            'CREATE TABLE "species" ("index" INTEGER PRIMARY KEY, "qSpecies" TEXT, "urlPath" INTEGER)'
+        )
+        con.execute(
+            "INSERT INTO species VALUES (0, 'Ginkgo biloba :: Maidenhair Tree', 605)"
+        )
+        con.commit()
+        con.close()
+
+    def tearDown(self) -> None:
+        identify_trees.DB_LOCATION = self.db_location
+        snapshot.SNAPSHOT_LOCATION = self.snapshot_location
+        snapshot.clear()
+        self.tmp_dir.cleanup()
+
+    def test_snapshot_used(self):
+        identify_trees.build_snapshot()
+
+        def loader(db_location):
+            raise AssertionError("loader called although the snapshot is up to date")
+
+        choices = identify_trees.get_db_cached("species_name_choices", loader)
+        self.assertTrue(
+            choices[(0, "Ginkgo biloba :: Maidenhair Tree", "common_name")]
+            == "Maidenhair Tree"
+        )
+
+    def test_stale_snapshot_not_used(self):
+        identify_trees.build_snapshot()
+        con = sqlite3.connect(identify_trees.DB_LOCATION)
+        con.execute("INSERT INTO species VALUES (1, 'Pinus radiata :: Monterey Pine', 1071)")
+        con.commit()
+        con.close()
+        snapshot.clear()
+
+        choices = identify_trees.get_db_cached(
+            "species_name_choices", identify_trees._load_species_name_choices
+        )
+        self.assertTrue((1, "Pinus radiata :: Monterey Pine", "qSpecies") in choices)
+
+if __name__ == "__main__":
+    unittest.main()
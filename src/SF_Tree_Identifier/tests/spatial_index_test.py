@@ -0,0 +1,122 @@
+import math
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import unittest
+from pathlib import Path  # if you haven't already done so
+
+file = Path(os.path.dirname(__file__)).resolve()
+parent, root = file.parent, file.parents[1]
+sys.path.append(str(root))
+
+# Additionally remove the current file's directory from sys.path
+try:
+    sys.path.remove(str(parent))
+except ValueError:  # Already removed
+    pass
+from SF_Tree_Identifier import identify_trees, spatial_index
+
+
+def brute_force_distances(trees, latitude, longitude):
+    index = spatial_index.SpatialIndex([])
+    distances = []
+    for tree in trees:
+        dx = (tree[4] - longitude) * index.meters_per_degree_lon
+        dy = (tree[3] - latitude) * spatial_index.METERS_PER_DEGREE
+        distances.append((math.sqrt(dx * dx + dy * dy), tree[0]))
+    return sorted(distances)
+
+
+class SpatialIndexTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        rng = random.Random(7)
+        self.trees = [
+            (i, f"{i} test st", 0, 37.75 + rng.random() * 0.02, -122.43 + rng.random() * 0.02)
+            for i in range(2000)
+        ]
+        self.index = spatial_index.SpatialIndex(self.trees, cell_size_m=100)
+
+    def test_radius_query(self):
+        expected = [
+            tree_id
+            for distance, tree_id in brute_force_distances(self.trees, 37.76, -122.42)
+            if distance <= 150
+        ]
+        result = [record[0] for _, record in self.index.query(37.76, -122.42, 150)]
+        self.assertTrue(result == expected)
+
+    def test_nearest_query(self):
+        expected = [
+            tree_id
+            for _, tree_id in brute_force_distances(self.trees, 37.76, -122.42)[:10]
+        ]
+        result = [record[0] for _, record in self.index.query(37.76, -122.42, limit=10)]
+        self.assertTrue(result == expected)
+
+    def test_nearest_query_outside_grid(self):
+        result = self.index.query(37.70, -122.50, limit=3)
+        self.assertTrue(len(result) == 3)
+
+    def test_no_radius_or_limit(self):
+        with self.assertRaises(ValueError):
+            self.index.query(37.76, -122.42)
+
+
+class GetTreesNearTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_location = identify_trees.DB_LOCATION
+        identify_trees.DB_LOCATION = os.path.join(self.tmp_dir.name, "SF_trees.db")
+
+        con = sqlite3.connect(identify_trees.DB_LOCATION)
+        con.execute(
+            'CREATE TABLE "species" ("index" INTEGER PRIMARY KEY, "qSpecies" TEXT, "urlPath" INTEGER)'
+        )
+        con.execute(
+            'CREATE TABLE "addresses" ("TreeID" INTEGER PRIMARY KEY, "qAddress" TEXT, '
+            '"qSpecies" INTEGER, "Latitude" REAL, "Longitude" REAL)'
+        )
+        con.execute(
+            "INSERT INTO species VALUES (0, 'Lophostemon confertus :: Brisbane Box', 1425)"
+        )
+        con.executemany(
+            "INSERT INTO addresses VALUES (?, ?, 0, ?, ?)",
+            [
+                (1, "1470 valencia st", 37.7494, -122.4206),
+                (2, "1480 valencia st", 37.7492, -122.4206),
+                (3, "900 brotherhood way", 37.7167, -122.4745),
+            ],
+        )
+        con.commit()
+        con.close()
+
+    def tearDown(self) -> None:
+        identify_trees.close_connections()
+        identify_trees.DB_LOCATION = self.db_location
+        self.tmp_dir.cleanup()
+
+    def test_trees_near(self):
+        trees = identify_trees.get_trees_near(37.7494, -122.4206, radius_m=50)
+        self.assertTrue([tree["tree_id"] for tree in trees] == [1, 2])
+        self.assertTrue(trees[0]["address"] == "1470 Valencia St")
+        self.assertTrue(trees[0]["common_name"] == "Brisbane Box")
+        self.assertTrue(trees[0]["urlPath"] == "1425")
+
+    def test_nearest_tree(self):
+        trees = identify_trees.get_trees_near(37.72, -122.47, radius_m=None, limit=1)
+        self.assertTrue([tree["tree_id"] for tree in trees] == [3])
+
+    def test_missing_db(self):
+        identify_trees.DB_LOCATION = os.path.join(self.tmp_dir.name, "missing.db")
+        with self.assertRaises(FileNotFoundError):
+            identify_trees.get_trees_near(37.7494, -122.4206)
+        # the read-only connection never creates the db
+        with self.assertRaises(sqlite3.OperationalError):
+            identify_trees._load_spatial_index(identify_trees.DB_LOCATION)
+        self.assertFalse(os.path.exists(identify_trees.DB_LOCATION))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import sqlite3
+import sys
+import unittest
+from pathlib import Path  # if you haven't already done so
+
+file = Path(os.path.dirname(__file__)).resolve()
+parent, root = file.parent, file.parents[1]
+sys.path.append(str(root))
+
+# Additionally remove the current file's directory from sys.path
+try:
+    sys.path.remove(str(parent))
+except ValueError:  # Already removed
+    pass
+from SF_Tree_Identifier import species_dimension
+
+ROWS = [
+    (0, "Lophostemon confertus :: Brisbane Box", 1425),
+    (2, "Pinus radiata :: Monterey Pine", 1071),
+    (3, "Tree(s) ::", 0),
+]
+
+
+class DisplayFieldsTestCase(unittest.TestCase):
+    def test_common_name(self):
+        self.assertTrue(
+            species_dimension.display_fields("Ginkgo biloba :: Maidenhair Tree", 605)
+            == (
+                "Ginkgo biloba",
+                "Maidenhair Tree",
+                "Maidenhair Tree (Ginkgo Biloba)",
+                "https://selectree.calpoly.edu/tree-detail/605",
+            )
+        )
+
+    def test_no_common_name_or_url(self):
+        self.assertTrue(
+            species_dimension.display_fields("Tree(s) ::", "0")
+            == ("Tree(s)", "", "Tree(S)", "")
+        )
+
+
+class SpeciesDimensionTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.species = species_dimension.SpeciesDimension.from_rows(ROWS)
+
+    def test_get_by_key(self):
+        specie = self.species[2]
+        self.assertTrue(specie.common_name == "Monterey Pine")
+        self.assertTrue(specie.urlPath == "1071")
+
+    def test_unknown_key(self):
+        for key in (1, 4, -1):
+            with self.assertRaises(KeyError):
+                self.species[key]
+        self.assertTrue(self.species.get(1) is None)
+
+    def test_precomputed_columns_used(self):
+        species = species_dimension.SpeciesDimension.from_rows(
+            [(0, "Ginkgo biloba :: Maidenhair Tree", 605, "G", "M", "Display", "url")]
+        )
+        self.assertTrue(species[0].display_name == "Display")
+
+    def test_db_without_display_columns(self):
+        con = sqlite3.connect(":memory:")
+        con.execute('CREATE TABLE "species" ("index" INTEGER PRIMARY KEY, "qSpecies" TEXT, "urlPath" INTEGER)')
+        con.executemany("INSERT INTO species VALUES (?, ?, ?)", ROWS)
+        species = species_dimension.SpeciesDimension.from_db(con)
+        con.close()
+        self.assertTrue(species[2].display_name == self.species[2].display_name)
+        self.assertTrue(species[2].url == self.species[2].url)
+
+    def test_len(self):
+        self.assertTrue(len(self.species) == 3)
+        self.assertTrue([specie.key for specie in self.species] == [0, 2, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path  # if you haven't already done so
+
+file = Path(os.path.dirname(__file__)).resolve()
+parent, root = file.parent, file.parents[1]
+sys.path.append(str(root))
+
+# Additionally remove the current file's directory from sys.path
+try:
+    sys.path.remove(str(parent))
+except ValueError:  # Already removed
+    pass
+from SF_Tree_Identifier import Address, identify_trees, street_autocomplete
+
+STREET_NAMES = ["valencia st", "vallejo st", "van ness ave", "vicente st", "main st"]
+TREE_COUNTS = {"vallejo st": 50, "valencia st": 20, "van ness ave": 100}
+
+
+class StreetTrieTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.trie = street_autocomplete.StreetTrie(STREET_NAMES, TREE_COUNTS, top_k=2)
+
+    def test_prefix_ranked_by_tree_count(self):
+        self.assertTrue(self.trie.complete("val") == ["vallejo st", "valencia st"])
+
+    def test_limit_over_top_k(self):
+        self.assertTrue(
+            self.trie.complete("v", limit=4)
+            == ["van ness ave", "vallejo st", "valencia st", "vicente st"]
+        )
+
+    def test_no_completion(self):
+        self.assertTrue(self.trie.complete("xyz") == [])
+
+    def test_fuzzy_prefix(self):
+        completions = self.trie.complete_fuzzy("vale", limit=3)
+        self.assertTrue(completions[0] == ("valencia st", 0))
+        self.assertTrue(("vallejo st", 1) in completions)
+
+    def test_fuzzy_typo(self):
+        completions = self.trie.complete_fuzzy("vlencia", limit=1)
+        self.assertTrue(completions == [("valencia st", 1)])
+
+    def test_normalize_prefix(self):
+        self.assertTrue(street_autocomplete.normalize_prefix("Main  St.") == "main st")
+        self.assertTrue(street_autocomplete.normalize_prefix("Main ") == "main ")
+
+
+class CompleteStreetNameTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_location = identify_trees.DB_LOCATION
+        # no db: every street has a tree count of 0
+        identify_trees.DB_LOCATION = os.path.join(self.tmp_dir.name, "SF_trees.db")
+
+    def tearDown(self) -> None:
+        identify_trees.DB_LOCATION = self.db_location
+        self.tmp_dir.cleanup()
+
+    def test_complete_street_name(self):
+        completions = identify_trees.complete_street_name("Valenc", max_typos=0)
+        street_names = [completion["street_name"] for completion in completions]
+        self.assertTrue("valencia st" in street_names)
+        self.assertTrue(all(name.startswith("valenc") for name in street_names))
+
+    def test_complete_street_name_typo(self):
+        completions = identify_trees.complete_street_name("Vlencia St")
+        self.assertTrue(completions[0]["street_name"] == "valencia st")
+        self.assertTrue(completions[0]["typos"] == 1)
+
+    def test_all_streets_indexed(self):
+        trie = street_autocomplete.StreetTrie(Address.load_street_names())
+        for street_name in Address.load_street_names():
+            self.assertTrue(street_name in trie.complete(street_name, limit=100))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from pathlib import Path  # if you haven't already done so
+
+file = Path(os.path.dirname(__file__)).resolve()
+parent, root = file.parent, file.parents[1]
+sys.path.append(str(root))
+
+# Additionally remove the current file's directory from sys.path
+try:
+    sys.path.remove(str(parent))
+except ValueError:  # Already removed
+    pass
+from SF_Tree_Identifier import Address
+from SF_Tree_Identifier.street_match_cache import StreetMatchCache
+
+
+class StreetMatchCacheTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "cache.sqlite")
+        self.street_names_path = os.path.join(self.tmp_dir.name, "street_names.json")
+        with open(self.street_names_path, "w") as fp:
+            fp.write('["valencia st"]')
+        self.cache = StreetMatchCache(self.path, self.street_names_path, max_size=2)
+
+    def tearDown(self) -> None:
+        self.cache.close()
+        self.tmp_dir.cleanup()
+
+    def test_put_get(self):
+        self.cache.put("valenci st", "valencia st", 95)
+        self.assertTrue(self.cache.get("valenci st") == ("valencia st", 95))
+        self.assertIsNone(self.cache.get("guerero st"))
+
+    def test_persistent(self):
+        self.cache.put("valenci st", "valencia st", 95)
+        self.cache.close()
+        self.cache = StreetMatchCache(self.path, self.street_names_path)
+        self.assertTrue(self.cache.get("valenci st") == ("valencia st", 95))
+
+    def test_lru_eviction(self):
+        self.cache.put("a st", "valencia st", 10)
+        self.cache.put("b st", "valencia st", 10)
+        self.cache.get("a st")
+        self.cache.put("c st", "valencia st", 10)
+        self.assertTrue(len(self.cache) == 2)
+        self.assertIsNone(self.cache.get("b st"))
+        self.assertIsNotNone(self.cache.get("a st"))
+
+    def test_hits_written_in_batches(self):
+        self.cache.put("valenci st", "valencia st", 95)
+        last_used = self.cache._con.execute("SELECT last_used FROM matches").fetchone()
+        self.cache.get("valenci st")
+        self.assertTrue(self.cache._con.execute("SELECT last_used FROM matches").fetchone() == last_used)
+        self.cache.close()
+        self.cache = StreetMatchCache(self.path, self.street_names_path)
+        self.assertTrue(self.cache._con.execute("SELECT last_used FROM matches").fetchone() > last_used)
+
+    def test_locked_cache_not_written(self):
+        self.cache.close()
+        self.cache = StreetMatchCache(self.path, self.street_names_path, timeout=0.01)
+        con = sqlite3.connect(self.path)
+        con.execute("BEGIN EXCLUSIVE")
+        try:
+            with self.assertLogs(level="WARNING"):
+                self.cache.put("valenci st", "valencia st", 95)
+        finally:
+            con.rollback()
+            con.close()
+        self.assertIsNone(self.cache.get("valenci st"))
+        self.cache.put("valenci st", "valencia st", 95)
+        self.assertTrue(len(self.cache) == 1)
+
+    def test_unreadable_cache_is_miss(self):
+        self.cache._con.close()
+        with self.assertLogs(level="WARNING"):
+            self.assertIsNone(self.cache.get("valenci st"))
+        self.cache._con = sqlite3.connect(self.path)
+
+    def test_invalidated_by_street_names(self):
+        self.cache.put("valenci st", "valencia st", 95)
+        self.cache.close()
+        with open(self.street_names_path, "w") as fp:
+            fp.write('["valencia st", "guerrero st"]')
+        self.cache = StreetMatchCache(self.path, self.street_names_path)
+        self.assertTrue(len(self.cache) == 0)
+
+
+class CachedMatchTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = StreetMatchCache(
+            os.path.join(self.tmp_dir.name, "cache.sqlite"),
+            Address.STREET_NAMES_LOCATION,
+        )
+        self.street_names = Address.load_street_names()
+
+    def tearDown(self) -> None:
+        self.cache.close()
+        self.tmp_dir.cleanup()
+
+    def test_match_cached(self):
+        address = Address.Address("1468 vaelncia st")
+        Address.match_closest_street_name(address, self.street_names, cache=self.cache)
+        self.assertTrue(self.cache.get("vaelncia st")[0] == "valencia st")
+
+    def test_cached_match_used(self):
+        self.cache.put("vaelncia st", "valencia st", 95)
+        address = Address.Address("1468 vaelncia st")
+        closest_match = Address.match_closest_street_name(
+            address, [], cache=self.cache
+        )
+        self.assertTrue(closest_match.street_name == "valencia st")
+
+    def test_cached_no_close_match(self):
+        address = Address.Address("1468 vaelnci st")
+        for _ in range(2):
+            with self.assertRaises(Address.NoCloseMatchError):
+                Address.match_closest_street_name(
+                    address, self.street_names, cache=self.cache
+                )
+
+
+class GetStreetMatchCacheTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.location = Address.STREET_MATCH_CACHE_LOCATION
+        self.street_match_cache = Address._street_match_cache
+        Address._street_match_cache = None
+
+    def tearDown(self) -> None:
+        if Address._street_match_cache not in (None, False):
+            Address._street_match_cache.close()
+        Address.STREET_MATCH_CACHE_LOCATION = self.location
+        Address._street_match_cache = self.street_match_cache
+        self.tmp_dir.cleanup()
+
+    def test_empty_cache_used(self):
+        Address.STREET_MATCH_CACHE_LOCATION = os.path.join(
+            self.tmp_dir.name, "cache.sqlite"
+        )
+        self.assertIsNotNone(Address.get_street_match_cache())
+
+    def test_disabled(self):
+        Address.STREET_MATCH_CACHE_LOCATION = ""
+        self.assertIsNone(Address.get_street_match_cache())
+
+
+if __name__ == "__main__":
+    unittest.main()
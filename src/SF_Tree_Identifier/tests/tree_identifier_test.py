@@ -15,6 +15,7 @@ try:
 except ValueError:  # Already removed
     pass
 from SF_Tree_Identifier import identify_trees
+from helpers import setUpModule, tearDownModule
 
 
 class DataTestCase(unittest.TestCase):
@@ -76,6 +77,8 @@ class GetTreesTestCase(unittest.TestCase):
                     "count": 1,
                     "scientific_name": "Lophostemon confertus",
                     "common_name": "Brisbane Box",
+                    "display_name": "Brisbane Box (Lophostemon Confertus)",
+                    "url": "https://selectree.calpoly.edu/tree-detail/1425",
                 }
             ]
         }
@@ -90,18 +93,24 @@ class GetTreesTestCase(unittest.TestCase):
                     "count": 4,
                     "scientific_name": "Cupressus macrocarpa",
                     "common_name": "Monterey Cypress",
+                    "display_name": "Monterey Cypress (Cupressus Macrocarpa)",
+                    "url": "https://selectree.calpoly.edu/tree-detail/476",
                 },
                 {
                     "urlPath": "1035",
                     "count": 2,
                     "scientific_name": "Pinus canariensis",
                     "common_name": "Canary Island Pine",
+                    "display_name": "Canary Island Pine (Pinus Canariensis)",
+                    "url": "https://selectree.calpoly.edu/tree-detail/1035",
                 },
                 {
                     "urlPath": "1071",
                     "count": 12,
                     "scientific_name": "Pinus radiata",
                     "common_name": "Monterey Pine",
+                    "display_name": "Monterey Pine (Pinus Radiata)",
+                    "url": "https://selectree.calpoly.edu/tree-detail/1071",
                 },
             ]
         }
@@ -133,7 +142,7 @@ class GetTreesTestCase(unittest.TestCase):
     def test_no_tree_address(self):
         user_input = "1466 Valencia St"
         with self.assertRaises(identify_trees.NoTreeFoundError):
-            identify_trees.get_trees(user_input)
+            identify_trees.main(user_input, check_nearby=False)
 
 
 if __name__ == "__main__":